@@ -0,0 +1,180 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Benchmark regression gate. Compares a run_bench.py results file against a
+    baseline (benchmarks/baseline.json) per scenario, table and stage:
+        - seconds:      wall time may not grow by more than the threshold
+        - rows_per_sec: throughput may not drop by more than the threshold
+        - api_calls:    calls per API endpoint may not grow
+        - rss_bytes:    process memory (RSS) at the end of each stage may not
+                        grow by more than the threshold
+    Time based checks ignore differences below min_seconds (timer noise).
+
+    python benchmarks/gate.py benchmarks/baseline.json bench_results.json
+"""
+
+# library imports
+import argparse
+import json
+import sys
+
+DEFAULT_THRESHOLDS = {
+    "seconds": 0.5,  # +50% wall time
+    "rows_per_sec": 0.33,  # -33% throughput
+    "api_calls": 0.0,  # any extra call
+    "rss_bytes": 0.5,  # +50% RSS
+    "min_seconds": 0.25,  # noise floor for the time checks
+}
+METRICS = ["seconds", "rows_per_sec", "api_calls", "rss_bytes"]
+
+
+def scenario_key(run):
+    return f"{run.get('cassette') or run.get('symbols')}/{run['phase']}"
+
+
+def _grew(base, cur, threshold):
+    return cur > base * (1 + threshold)
+
+
+def compare(baseline, current, thresholds=None, metrics=None):
+    """
+    Compare benchmark results against a baseline
+
+    args:
+        baseline:          baseline results (run_bench.py JSON)
+        current:           current results (run_bench.py JSON)
+        thresholds:        (optional) overrides of DEFAULT_THRESHOLDS
+        metrics:           (optional) metrics to check. Defaults to METRICS
+
+    returns:
+        regressions:       list of regression messages (empty when passing)
+        checked:           number of checks performed
+    """
+    limits = {**DEFAULT_THRESHOLDS, **(baseline.get("thresholds") or {})}
+    limits.update(thresholds or {})
+    metrics = metrics or METRICS
+    floor = limits["min_seconds"]
+    cur_runs = {scenario_key(run): run for run in current["runs"]}
+    regressions = []
+    checked = 0
+
+    for base_run in baseline["runs"]:
+        scenario = scenario_key(base_run)
+        cur_run = cur_runs.get(scenario)
+        if cur_run is None:
+            continue
+        for table, stages in base_run["tables"].items():
+            for stage, base in stages.items():
+                cur = cur_run["tables"].get(table, {}).get(stage)
+                if cur is None:
+                    continue
+                where = f"{scenario} {table}.{stage}"
+                if "seconds" in metrics:
+                    checked += 1
+                    delta = cur["seconds"] - base["seconds"]
+                    if delta > floor and _grew(
+                        base["seconds"], cur["seconds"], limits["seconds"]
+                    ):
+                        regressions.append(
+                            f"{where}: {cur['seconds']:.2f}s vs "
+                            f"{base['seconds']:.2f}s baseline"
+                        )
+                if (
+                    "rows_per_sec" in metrics
+                    and base["rows_per_sec"] > 0
+                    and max(cur["seconds"], base["seconds"]) > floor
+                ):
+                    checked += 1
+                    if cur["rows_per_sec"] < base["rows_per_sec"] * (
+                        1 - limits["rows_per_sec"]
+                    ):
+                        regressions.append(
+                            f"{where}: {cur['rows_per_sec']:.0f} rows/s vs "
+                            f"{base['rows_per_sec']:.0f} rows/s baseline"
+                        )
+                if "rss_bytes" in metrics and base.get("max_rss_bytes"):
+                    checked += 1
+                    if _grew(
+                        base["max_rss_bytes"],
+                        cur.get("max_rss_bytes", 0),
+                        limits["rss_bytes"],
+                    ):
+                        regressions.append(
+                            f"{where}: RSS {cur['max_rss_bytes'] / 2**20:.0f} MiB vs "
+                            f"{base['max_rss_bytes'] / 2**20:.0f} MiB baseline"
+                        )
+        if "api_calls" in metrics:
+            for endpoint, base in (base_run.get("api") or {}).items():
+                checked += 1
+                cur = (cur_run.get("api") or {}).get(endpoint, {"calls": 0})
+                if _grew(base["calls"], cur["calls"], limits["api_calls"]):
+                    regressions.append(
+                        f"{scenario} api.{endpoint}: {cur['calls']} calls vs "
+                        f"{base['calls']} baseline"
+                    )
+    return (regressions, checked)
+
+
+def parse_thresholds(items):
+    """
+    Parse ["seconds=1.0", ...] threshold overrides
+    """
+    thresholds = {}
+    for item in items or []:
+        (name, _, value) = item.partition("=")
+        if name not in DEFAULT_THRESHOLDS or not value:
+            raise ValueError(f"Bad threshold '{item}' (use {list(DEFAULT_THRESHOLDS)})")
+        thresholds[name] = float(value)
+    return thresholds
+
+
+def check(baseline_file, current, thresholds=None, metrics=None):
+    """
+    Gate current results against a baseline file, printing the outcome
+
+    returns:
+        status:            process exit status (0 pass, 1 regression)
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    (regressions, checked) = compare(baseline, current, thresholds, metrics)
+    print(
+        f"Benchmark gate: {checked} check(s) against {baseline_file} "
+        f"(baseline commit {baseline.get('commit')})"
+    )
+    for msg in regressions:
+        print(f"  REGRESSION {msg}")
+    if regressions:
+        print(f"Benchmark gate FAILED: {len(regressions)} regression(s)")
+        return 1
+    print("Benchmark gate passed")
+    return 0
+
+
+def add_gate_args(parser):
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        metavar="NAME=VALUE",
+        help=f"override a threshold ({', '.join(DEFAULT_THRESHOLDS)})",
+    )
+    parser.add_argument(
+        "--metrics", nargs="+", choices=METRICS, help="metrics to check (default: all)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark regression gate")
+    parser.add_argument("baseline", help="baseline results JSON")
+    parser.add_argument("current", help="current results JSON")
+    add_gate_args(parser)
+    args = parser.parse_args(argv)
+    with open(args.current) as f:
+        current = json.load(f)
+    return check(args.baseline, current, parse_thresholds(args.threshold), args.metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Offline stand-ins for the benchmark suite. LocalBackend is a PFinBackend
+    on the embedded SQLite backend (PFIN_DB_BACKEND=sqlite, pfin tables from
+    pfin_back_etl.schema) whose FMP and BLS calls are answered by the
+    synthetic payload generator (pfin_back_etl.synth)... no network or
+    SupaBase access needed.
+"""
+
+# library imports
+import contextlib
+import json
+import os
+from unittest import mock
+
+import requests
+
+from pfin_back_etl import PFinBackend, PFinFMP, synth, utils
+
+OFFLINE_ENV = {
+    "FMP_API_KEY": "offline",
+    "BLS_API_KEY": "offline",
+}
+
+
+def _response(url, status, content_type, body):
+    resp = requests.Response()
+    resp.url = url
+    resp.status_code = status
+    resp.headers["Content-Type"] = content_type
+    resp._content = body
+    return resp
+
+
+class SynthSession:
+    """
+    Drop-in for the fmpstab Session: answers GETs with SynthFMP payloads
+    """
+
+    def __init__(self, synth_fmp, base_url):
+        self.synth_fmp = synth_fmp
+        self.base_url = base_url
+
+    def get(self, url, params=None):
+        path = url.removeprefix(self.base_url)
+        (status, content_type, body) = self.synth_fmp.respond(path, params or {})
+        resp = _response(url, status, content_type, body)
+        resp.raise_for_status()
+        return resp
+
+
+class LocalBackend(PFinBackend):
+    """
+    PFinBackend with synthetic API data. Run it inside offline_env(), which
+    points the database at the embedded SQLite backend.
+    """
+
+    def __init__(self, synth_fmp, base_url=None, calls_per_minute=280):
+        """
+        Class initializer...
+
+        args:
+            synth_fmp:     SynthFMP instance answering the FMP calls in-process
+            base_url:      (optional) FMP API URL to call instead (ie: a
+                           mock_fmp.MockFMPServer serving synth_fmp over HTTP)
+            calls_per_minute: client side rate limit when calling base_url
+        """
+        super().__init__()
+        if base_url:
+            self.fmp_client = PFinFMP(
+                self._params["FMP_API_KEY"],
+                base_url=base_url,
+                max_calls_per_minute=calls_per_minute,
+            )
+            self._setup_fmp_client(self.fmp_client)
+        else:
+            session = SynthSession(synth_fmp, self.fmp_client.base_url)
+            self.fmp_client.session = session
+
+
+@contextlib.contextmanager
+def offline_env(
+    db_dir,
+    seed=0,
+    mirror=False,
+    server_diff=False,
+    pipeline_batch=None,
+    decode_workers=None,
+    fmp_concurrency=None,
+):
+    """
+    Context with the env variables the backend needs (dummy API keys, SQLite
+    database, state file and key index in db_dir) and the BLS API answered by
+    synth.bls_cpi_payload
+
+    args:
+        db_dir:            directory for the database and refresh state files
+        seed:              seed for the synthetic CPI data
+        mirror:            mirror the tables to Parquet files (db_dir/mirror)
+        server_diff:       sync the large tables with the server side diff
+        pipeline_batch:    (optional) symbols per batch of the pipelined syncs
+        decode_workers:    (optional) processes decoding the JSON responses
+        fmp_concurrency:   (optional) FMP requests in flight (asyncio client,
+                           only with a base_url... see LocalBackend)
+    """
+
+    def bls_post(url, data=None, headers=None, **kwargs):
+        req = json.loads(data)
+        payload = synth.bls_cpi_payload(
+            req["seriesid"], req["startyear"], req["endyear"], seed=seed
+        )
+        return _response(url, 200, "application/json", json.dumps(payload).encode())
+
+    env = dict(OFFLINE_ENV)
+    env["PFIN_DB_BACKEND"] = "sqlite"
+    env["PFIN_DB_PATH"] = db_dir
+    env["PFIN_STATE_FILE"] = os.path.join(db_dir, "pfin_back_etl_state.json")
+    env["PFIN_KEY_INDEX_DIR"] = os.path.join(db_dir, "keys")
+    if mirror:
+        env["PFIN_MIRROR_DIR"] = os.path.join(db_dir, "mirror")
+    if server_diff:
+        env["PFIN_SERVER_DIFF"] = "all"
+    if pipeline_batch:
+        env["PFIN_PIPELINE_BATCH"] = str(pipeline_batch)
+    if decode_workers:
+        env["PFIN_DECODE_WORKERS"] = str(decode_workers)
+    if fmp_concurrency:
+        env["PFIN_FMP_CONCURRENCY"] = str(fmp_concurrency)
+    with (
+        mock.patch.dict(os.environ, env),
+        mock.patch.object(utils.http_session(), "post", bls_post),
+    ):
+        yield
@@ -0,0 +1,269 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Offline ETL benchmark. Runs every table sync against a local SQLite
+    database fed by synthetic FMP/BLS payloads, for a few universe sizes.
+    Each size gets a cold pass (empty tables... inserts) and a warm pass one
+    day later (mostly unchanged rows... diff and updates). The per-stage run
+    reports are written to a JSON file to compare across commits.
+
+    By default the FMP calls are answered in-process. With --mock-server they
+    go over HTTP to a local mock_fmp.MockFMPServer, with the configured
+    latency, jitter, rate limit and failure rate.
+
+    With --cassette the recorded API responses of a real run (main.py --record)
+    are replayed instead, through a full update_table_all.
+
+    With --baseline the results are also gated against a baseline results
+    file (see gate.py), and the exit status is 1 on a regression.
+
+    python benchmarks/run_bench.py --symbols 100 1000 --output bench.json
+    python benchmarks/run_bench.py --symbols 100 --baseline baseline.json
+    python benchmarks/run_bench.py --symbols 100 --mock-server --latency 0.05
+"""
+
+# library imports
+import argparse
+import importlib.metadata
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+import gate
+from harness import LocalBackend, offline_env
+from pfin_back_etl import cassette, perf, synth
+from pfin_back_etl.mock_fmp import MockFMPServer
+
+logger = logging.getLogger("pfin_etl")
+
+TABLES = [
+    "cpi",
+    "asset",
+    "equity_profile",
+    "reporting_period",
+    "income_statement",
+    "balance_sheet_statement",
+    "cash_flow_statement",
+    "earning",
+    "eod_price",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pfin_back_etl benchmark")
+    parser.add_argument(
+        "--symbols",
+        type=int,
+        nargs="+",
+        default=[100, 1000],
+        help="universe sizes to benchmark (ie: 100 1000 5000)",
+    )
+    parser.add_argument("--years", type=int, default=5, help="years of history")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument(
+        "--tables", nargs="+", default=TABLES, choices=TABLES, help="tables to sync"
+    )
+    parser.add_argument(
+        "--output", default="bench_results.json", help="JSON results file"
+    )
+    parser.add_argument(
+        "--baseline", help="fail on regressions against this results file"
+    )
+    gate.add_gate_args(parser)
+    parser.add_argument(
+        "--cassette", help="replay a recorded cassette instead of synthetic data"
+    )
+    parser.add_argument(
+        "--mirror", action="store_true", help="read tables from a Parquet mirror"
+    )
+    parser.add_argument(
+        "--server-diff",
+        action="store_true",
+        help="sync the large tables with the server side diff",
+    )
+    parser.add_argument(
+        "--pipeline-batch",
+        type=int,
+        default=None,
+        help="overlap the API fetch and DB writes of eod_price in N symbol batches",
+    )
+    parser.add_argument(
+        "--decode-workers",
+        type=int,
+        default=None,
+        help="decode the JSON responses in N worker processes",
+    )
+    parser.add_argument(
+        "--fmp-concurrency",
+        type=int,
+        default=None,
+        help="fan out the FMP list fetches, N requests in flight (--mock-server)",
+    )
+    parser.add_argument(
+        "--mock-server", action="store_true", help="call FMP over a mock server"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--rate-limit", type=int, default=None, help="server calls/min (429s)"
+    )
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="0-1")
+    parser.add_argument(
+        "--client-rate",
+        type=int,
+        default=100000,
+        help="client side calls/min limit (production uses 280)",
+    )
+    args = parser.parse_args(argv)
+    if args.fmp_concurrency and not args.mock_server:
+        parser.error("--fmp-concurrency needs --mock-server (the calls go over HTTP)")
+    return args
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def run_pass(pfb, tables):
+    """
+    Sync each table once and return the run report of the pass
+    """
+    perf.run_report.reset()
+    perf.api_stats.reset()
+    try:
+        for table in tables:
+            with perf.sync(table):
+                getattr(pfb, f"update_table_{table}")()
+        return perf.run_report.to_dict()
+    finally:
+        pfb.close()
+
+
+def run_size(n_symbols, args):
+    """
+    Cold and warm pass for one universe size (fresh database)
+    """
+    runs = []
+    as_of = date.today()
+    with (
+        tempfile.TemporaryDirectory() as db_dir,
+        offline_env(
+            db_dir,
+            args.seed,
+            args.mirror,
+            args.server_diff,
+            args.pipeline_batch,
+            args.decode_workers,
+            args.fmp_concurrency,
+        ),
+    ):
+        for phase, day in (("cold", as_of), ("warm", as_of + timedelta(days=1))):
+            synth_fmp = synth.SynthFMP(n_symbols, args.years, args.seed, as_of=day)
+            logger.info(f"Benchmark: {n_symbols} symbol(s), {phase} pass...")
+            if args.mock_server:
+                server = MockFMPServer(
+                    synth_fmp,
+                    latency=args.latency,
+                    jitter=args.jitter,
+                    rate_limit=args.rate_limit,
+                    failure_rate=args.failure_rate,
+                    seed=args.seed,
+                )
+                with server:
+                    pfb = LocalBackend(synth_fmp, server.base_url, args.client_rate)
+                    report = run_pass(pfb, args.tables)
+                report["mock_server"] = dict(server.stats)
+            else:
+                pfb = LocalBackend(synth_fmp)
+                report = run_pass(pfb, args.tables)
+            runs.append({"symbols": n_symbols, "phase": phase, **report})
+            logger.info(f"  {phase} pass took {report['elapsed_seconds']:.1f}s")
+    return runs
+
+
+def run_cassette(args):
+    """
+    Cold and warm update_table_all passes replaying a cassette (fresh database)
+    """
+    runs = []
+    with (
+        tempfile.TemporaryDirectory() as db_dir,
+        offline_env(
+            db_dir,
+            args.seed,
+            args.mirror,
+            args.server_diff,
+            args.pipeline_batch,
+            args.decode_workers,
+            args.fmp_concurrency,
+        ),
+    ):
+        tape = cassette.use(args.cassette, "replay")
+        try:
+            for phase in ("cold", "warm"):
+                pfb = LocalBackend(None)
+                logger.info(f"Benchmark: {args.cassette}, {phase} pass...")
+                perf.run_report.reset()
+                perf.api_stats.reset()
+                try:
+                    pfb.update_table_all(force=True, full_sweep=True)
+                    report = perf.run_report.to_dict()
+                finally:
+                    pfb.close()
+                runs.append({"cassette": args.cassette, "phase": phase, **report})
+                logger.info(f"  {phase} pass took {report['elapsed_seconds']:.1f}s")
+            logger.info(f"Cassette hits: {tape.hits}, misses: {tape.misses}")
+        finally:
+            cassette.eject()
+    return runs
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "polars": importlib.metadata.version("polars"),
+        "sqlalchemy": importlib.metadata.version("sqlalchemy"),
+        "years": args.years,
+        "seed": args.seed,
+        "mock_server": args.mock_server,
+        "mirror": args.mirror,
+        "server_diff": args.server_diff,
+        "pipeline_batch": args.pipeline_batch,
+        "decode_workers": args.decode_workers,
+        "fmp_concurrency": args.fmp_concurrency,
+        "cassette": args.cassette,
+        "runs": [],
+    }
+    if args.cassette:
+        results["runs"] = run_cassette(args)
+    else:
+        for n_symbols in args.symbols:
+            results["runs"].extend(run_size(n_symbols, args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    logger.info(f"Benchmark results written to {args.output}")
+    if args.baseline:
+        thresholds = gate.parse_thresholds(args.threshold)
+        return gate.check(args.baseline, results, thresholds, args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,16 @@ Author:        Rich Mosko
 Description:
     Production entry point for the Personal Finance Backend ETL.
     Creates a PFinBackend instance, runs a full stock screener,
-    and updates all tables in the SupaBase database.
+    and updates all tables in the SupaBase database. With --backfill, loads
+    the history of some tables over a date range instead.
 """
 
+import argparse
 import logging
 import os
 import sys
-from datetime import datetime, timezone
-from pfin_back_etl import PFinBackend
+from datetime import date, datetime, timezone
+from pfin_back_etl import PFinBackend, cassette, perf
 
 LOG_FILE = os.path.join(os.getcwd(), "pfin_back_etl.log")
 
@@ -39,14 +41,80 @@ def setup_logging():
     return logger
 
 
+def parse_args():
+    """Command line options (also settable with PFIN_PROFILE, PFIN_CASSETTE)."""
+    parser = argparse.ArgumentParser(description="Personal Finance Backend ETL")
+    parser.add_argument(
+        "--profile",
+        choices=["cpu", "mem"],
+        help="profile the table syncs with cProfile (cpu) or tracemalloc (mem)",
+    )
+    parser.add_argument(
+        "--profile-tables",
+        help="comma separated list of tables to profile (default: all)",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        help="directory for the profiles (default: pfin_profile_<timestamp>)",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="CASSETTE",
+        help="record the FMP and BLS responses to a cassette (zip) file",
+    )
+    parser.add_argument(
+        "--backfill",
+        metavar="TABLES",
+        help="deep historical load of these (comma separated) tables instead of "
+        "the nightly refresh, ie: eod_price or cpi,reporting_period,eod_price",
+    )
+    parser.add_argument(
+        "--symbols",
+        help="comma separated list of symbols to backfill (default: all assets)",
+    )
+    parser.add_argument(
+        "--start",
+        type=date.fromisoformat,
+        help="first date to backfill (yyyy-mm-dd)",
+    )
+    parser.add_argument(
+        "--end",
+        type=date.fromisoformat,
+        help="last date to backfill (yyyy-mm-dd, default: today)",
+    )
+    args = parser.parse_args()
+    if args.backfill and args.start is None:
+        parser.error("--backfill needs a --start date")
+    return args
+
+
 def main():
+    args = parse_args()
     logger = setup_logging()
+    if args.profile:
+        tables = args.profile_tables.split(",") if args.profile_tables else None
+        perf.enable_profiling(args.profile, run_dir=args.profile_dir, tables=tables)
+    if args.record:
+        cassette.use(args.record, "record")
 
     t_start = datetime.now(timezone.utc)
     logger.info(f"Starting ETL run at {t_start.isoformat()}")
 
     pfb = PFinBackend()
-    pfb.update_table_all()
+    try:
+        if args.backfill:
+            pfb.backfill(
+                args.backfill.split(","),
+                args.start,
+                end_date=args.end,
+                sym_list=args.symbols.split(",") if args.symbols else None,
+            )
+        else:
+            pfb.update_table_all()
+    finally:
+        pfb.write_run_report()
+        pfb.close()
+        cassette.eject()
 
     t_end = datetime.now(timezone.utc)
     elapsed = t_end - t_start
@@ -6,5 +6,7 @@ Personal Finance ETL Backend
 from .core import PFinFMP
 from .core import SBaseConn
 from .core import PFinBackend
+from .schedule import RefreshTracker
+from .perf import RunReport
 
-__all__ = ["PFinFMP", "SBaseConn", "PFinBackend"]
+__all__ = ["PFinFMP", "SBaseConn", "PFinBackend", "RefreshTracker", "RunReport"]
@@ -0,0 +1,267 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Asyncio FMP client, alongside the synchronous (requests based) PFinFMP.
+    It exposes the same endpoint functions (from the fmpstab endpoint config),
+    over one httpx connection pool with keep-alive (HTTP/2 when the h2 package
+    is installed), with an async rate limiter and the same 429 retry policy.
+
+    fetch_fmp_list_df fans out one request per item (ie: per symbol) from a
+    single thread, with a semaphore bounding the requests in flight. Needs the
+    optional httpx dependency: pip install 'pfin_back_etl[async]'
+"""
+
+# library imports
+import asyncio
+import importlib.util
+import logging
+import threading
+import time
+import urllib.parse
+
+import polars as pl
+from fmpstab.config_manager import ConfigManager
+
+from pfin_back_etl import cassette, decode, perf, utils
+
+try:
+    import httpx
+except ImportError:  # [richmosko]: optional dependency
+    httpx = None
+
+logger = logging.getLogger("pfin_etl")
+
+# [richmosko]: fmpstab renames these python-friendly args to the FMP ones
+_PARAM_RENAMES = {
+    "start_date": "from",
+    "from_": "from",
+    "end_date": "to",
+    "to_": "to",
+}
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out calls to at most per_minute per minute. Can be shared by
+    several event loops (and threads).
+    """
+
+    def __init__(self, per_minute):
+        """
+        Class initializer...
+
+        args:
+            per_minute:    max number of calls per minute
+        """
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        """
+        Wait for the next free call slot
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncPFinFMP:
+    """
+    Asyncio Personal Finance Financial Modeling Prep Connection. Use as an
+    async context manager (the connection pool is closed on exit).
+    """
+
+    # [richmosko]: same retry policy as PFinFMP
+    _max_retries = 3
+    _retry_backoff = 2.0  # seconds
+
+    def __init__(
+        self,
+        api_key,
+        base_url=None,
+        max_calls_per_minute=280,
+        max_concurrency=32,
+        limiter=None,
+        extra_endpoints=None,
+        transport=None,
+    ):
+        """
+        Class initializer...
+
+        args:
+            api_key:       FMP API key
+            base_url:      (optional) API base URL, ie: a local mock server.
+                           Defaults to the fmpstab config (FMP stable API)
+            max_calls_per_minute: client side rate limit
+            max_concurrency: max number of requests in flight
+            limiter:       (optional) AsyncRateLimiter to share with other
+                           clients. Overrides max_calls_per_minute
+            extra_endpoints: (optional) endpoints to add to the fmpstab config
+            transport:     (optional) httpx transport (ie: for tests)
+        """
+        if httpx is None:
+            raise ImportError(
+                "AsyncPFinFMP needs httpx: pip install 'pfin_back_etl[async]'"
+            )
+        config = ConfigManager(None).get()
+        self.api_key = api_key
+        self.base_url = base_url or config.get("base_url")
+        if not self.base_url.endswith("/"):
+            self.base_url += "/"  # [richmosko]: endpoint paths are joined relative
+        self.endpoints = {**config.get("endpoints", {}), **(extra_endpoints or {})}
+        self._functions = {ep.replace("-", "_"): ep for ep in self.endpoints}
+        self.limiter = limiter or AsyncRateLimiter(max_calls_per_minute)
+        self.max_concurrency = max_concurrency
+        self._client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            timeout=httpx.Timeout(utils.HTTP_TIMEOUT),
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Close the connection pool
+        """
+        await self._client.aclose()
+
+    def __getattr__(self, name):
+        # [richmosko]: endpoint functions (ie: self.historical_full), named
+        #              like the PFinFMP ones for the logs, stats and cassettes
+        functions = self.__dict__.get("_functions", {})
+        if name not in functions:
+            raise AttributeError(name)
+        ep = functions[name]
+
+        async def method(**kwargs):
+            return await self.call(ep, **kwargs)
+
+        method.__name__ = name
+        return method
+
+    async def call(self, endpoint_name, **kwargs):
+        """
+        GET an FMP endpoint (rate limited)
+
+        args:
+            endpoint_name: endpoint from the fmpstab config (ie: historical-full)
+            kwargs:        endpoint params
+
+        returns:
+            rsp:           httpx response (raises httpx.HTTPStatusError on errors)
+        """
+        if endpoint_name not in self.endpoints:
+            raise ValueError(f"Endpoint '{endpoint_name}' not found in configuration.")
+        endpoint_info = self.endpoints[endpoint_name]
+        url = urllib.parse.urljoin(self.base_url, endpoint_info["path"])
+        kwargs = {_PARAM_RENAMES.get(k, k): v for k, v in kwargs.items()}
+        allowed = endpoint_info.get("params", {}).keys()
+        params = {k: v for k, v in kwargs.items() if k in allowed}
+        params["apikey"] = self.api_key
+        await self.limiter.acquire()
+        rsp = await self._client.get(url, params=params)
+        rsp.raise_for_status()
+        return rsp
+
+    async def _call_fmp(self, fmp_func, **kwargs):
+        """
+        Call an FMP endpoint function, retrying rate limited (HTTP 429) calls
+        with a backoff. Every attempt is recorded in perf.api_stats.
+
+        returns: rsp (httpx response, or requests response from a cassette)
+        """
+        fmp_api_name = fmp_func.__name__
+        retries = 0
+        while True:
+            t_start = time.perf_counter()
+            try:
+                rsp = await cassette.acall(
+                    "fmp", fmp_api_name, kwargs, lambda: fmp_func(**kwargs)
+                )
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                perf.api_stats.record(
+                    fmp_api_name,
+                    time.perf_counter() - t_start,
+                    error=True,
+                    rate_limited=(status == 429),
+                )
+                if status != 429 or retries >= self._max_retries:
+                    raise
+                wait = self._retry_backoff * 2**retries
+                retries += 1
+                perf.api_stats.record_retry(fmp_api_name)
+                logger.info(f"FMP ({fmp_api_name}): rate limited, retry in {wait}s")
+                await asyncio.sleep(wait)
+                continue
+            perf.api_stats.record(
+                fmp_api_name, time.perf_counter() - t_start, nbytes=len(rsp.content)
+            )
+            return rsp
+
+    async def fetch_fmp_df(self, fmp_func, columns=None, **kwargs):
+        """
+        Async version of PFinFMP.fetch_fmp_df
+
+        returns: df (polars dataframe of query results)
+        """
+        with perf.span("fetch") as rec:
+            (df, nbytes) = await self._fetch_decode(fmp_func, columns, kwargs)
+            rec["rows"] = len(df)
+            rec["bytes"] = nbytes
+        return df
+
+    async def fetch_fmp_list_df(self, fmp_func, key, columns=None, **kwargs):
+        """
+        Async version of PFinFMP.fetch_fmp_list_df: one request per item in
+        key(list), at most max_concurrency in flight. Concatenates the results
+        (in the order of key) into a single polars dataframe
+
+        returns: df_fmp (polars dataframe of query results)
+        """
+        key_list = kwargs.pop(key)
+        if not isinstance(key_list, list):
+            key_list = [key_list]
+        sem = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_item(item):
+            async with sem:
+                return await self._fetch_decode(
+                    fmp_func, columns, {**kwargs, key: item}
+                )
+
+        # [richmosko]: one span for the whole fan out... the requests overlap
+        with perf.span("fetch") as rec:
+            # [richmosko]: a failed request cancels the rest (like the sync version)
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(fetch_item(item)) for item in key_list]
+            results = [task.result() for task in tasks]
+            df_list = [df for (df, _) in results if not df.is_empty()]
+            rec["rows"] = sum(len(df) for df in df_list)
+            rec["bytes"] = sum(nbytes for (_, nbytes) in results)
+        if not df_list:
+            return pl.DataFrame()
+        return pl.concat(df_list, how="vertical_relaxed")
+
+    async def _fetch_decode(self, fmp_func, columns, kwargs):
+        fmp_api_name = fmp_func.__name__
+        logger.info(f"FMP ({fmp_api_name}): Fetching {kwargs} ...")
+        rsp = await self._call_fmp(fmp_func, **kwargs)
+        df = decode.json_to_df(rsp.json(), columns)
+        logger.info(f"FMP ({fmp_api_name}): Got {len(df)} row(s)")
+        return (df, len(rsp.content))
@@ -0,0 +1,242 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Deep historical backfill, separate from the nightly incremental refresh.
+    A backfill (ie: 20 years of eod_price for a new universe) is split into
+    symbol/date chunks. The chunks are fetched on a few threads (the FMP
+    client side rate limit is shared by all of them) and written one at a
+    time, in order, by the calling thread.
+
+    Every written chunk is recorded in a JSON checkpoint file, so a backfill
+    that stops (a failure, or the API call budget) picks up where it left off
+    when run again with the same range. A range without an end date runs up
+    to today, and its chunks are keyed on their date boundaries (aligned to
+    the start date) instead of today, so the same command resumes on a later
+    day. Failed chunks are logged and skipped,
+    and raised together once the others ran (like pipeline.Pipeline).
+"""
+
+# library imports
+import collections
+import json
+import logging
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+logger = logging.getLogger("pfin_etl")
+
+
+class Chunk(
+    collections.namedtuple(
+        "Chunk", ["symbols", "start", "end", "key_end"], defaults=[None]
+    )
+):
+    """
+    Symbols and date range (datetime.date, inclusive) of one backfill chunk.
+    key_end is the end used in the key of a chunk cut at today (no end date
+    given): the end of its full date range ('' for a single open range)
+    """
+
+    @property
+    def key(self):
+        """
+        Stable id of the chunk in a checkpoint file
+        """
+        syms = ",".join(self.symbols)
+        end = self.end if self.key_end is None else self.key_end
+        return (
+            f"{self.start}..{end}:{len(self.symbols)}:{zlib.crc32(syms.encode()):08x}"
+        )
+
+
+def plan_chunks(
+    sym_list, start_date, end_date=None, symbols_per_chunk=50, days_per_chunk=None
+):
+    """
+    Split a backfill into symbol/date chunks, oldest dates first
+
+    args:
+        sym_list:          list of symbols (None: one chunk of no symbols per
+                           date range, ie: for cpi)
+        start_date:        first date (datetime.date)
+        end_date:          (optional) last date (datetime.date). Defaults to
+                           today, with the chunks keyed on their full date
+                           range (see Chunk)
+        symbols_per_chunk: max symbols per chunk
+        days_per_chunk:    (optional) max days per chunk. One date range
+                           when None
+
+    returns:
+        chunks:            list of Chunk
+    """
+    open_end = end_date is None
+    end_date = end_date or date.today()
+    ranges = []
+    step = timedelta(days=days_per_chunk or (end_date - start_date).days + 1)
+    day = start_date
+    while day <= end_date:
+        span_end = day + step - timedelta(days=1)
+        # [richmosko]: a chunk cut at today keeps the key of its full range,
+        #              so crossing a chunk boundary doesn't rename it
+        key_end = None
+        if open_end and span_end >= end_date:
+            key_end = span_end.isoformat() if days_per_chunk else ""
+        ranges.append((day, min(span_end, end_date), key_end))
+        day += step
+    sym_list = sorted(sym_list) if sym_list is not None else [None]
+    size = max(int(symbols_per_chunk), 1)
+    chunks = []
+    for start, end, key_end in ranges:
+        for idx in range(0, len(sym_list), size):
+            symbols = tuple(sym for sym in sym_list[idx : idx + size] if sym)
+            chunks.append(Chunk(symbols, start, end, key_end))
+    return chunks
+
+
+class Checkpoint:
+    """
+    Written chunks of the backfill runs, kept in a local JSON file
+    """
+
+    def __init__(self, checkpoint_file):
+        """
+        Class initializer...
+
+        args:
+            checkpoint_file: path of the JSON checkpoint file
+        """
+        self._checkpoint_file = checkpoint_file
+        self._state = {}
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file, "r") as f:
+                self._state = json.load(f)
+
+    def is_done(self, run, chunk):
+        """
+        Whether a chunk of a backfill run (ie: 'eod_price:1990-01-01..') was
+        already written
+        """
+        return chunk.key in self._state.get(run, [])
+
+    def mark_done(self, run, chunk):
+        """
+        Record a written chunk (saved right away)
+        """
+        self._state.setdefault(run, []).append(chunk.key)
+        tmp_file = self._checkpoint_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_file, self._checkpoint_file)
+
+
+class Backfill:
+    """
+    Runs the chunks of backfill runs: fetched in parallel, written in order
+    """
+
+    def __init__(self, checkpoint_file, workers=4):
+        """
+        Class initializer...
+
+        args:
+            checkpoint_file: path of the JSON checkpoint file
+            workers:       number of chunks fetched at the same time
+        """
+        self.checkpoint = Checkpoint(checkpoint_file)
+        self.workers = max(int(workers), 1)
+        self.stats = collections.Counter()
+
+    def run(self, run, chunks, fetch_func, write_func, call_budget=None):
+        """
+        Fetch and write the chunks of a backfill run not checkpointed yet
+
+        args:
+            run:           name of the run (table and date range)
+            chunks:        list of Chunk
+            fetch_func:    function(chunk) -> fetched data (network side)
+            write_func:    function(chunk, data) writing it (database side).
+                           May return how it wrote (ie: 'copy'), for the stats
+            call_budget:   (optional) max number of API calls (one per symbol
+                           of a chunk). The chunks past it are left for the
+                           next run
+
+        returns:
+            call_budget:   what is left of call_budget (None without one)
+
+        raises:
+            RuntimeError:  after all chunks ran, if any of them failed
+        """
+        todo = [chunk for chunk in chunks if not self.checkpoint.is_done(run, chunk)]
+        self.stats["checkpointed"] += len(chunks) - len(todo)
+        if call_budget is not None:
+            for idx, chunk in enumerate(todo):
+                calls = max(len(chunk.symbols), 1)
+                if calls > call_budget:
+                    logger.info(
+                        f"Backfill {run}: API call budget used up, "
+                        f"{len(todo) - idx} chunk(s) left for the next run"
+                    )
+                    self.stats["deferred"] += len(todo) - idx
+                    todo = todo[:idx]
+                    break
+                call_budget -= calls
+        logger.info(f"Backfill {run}: {len(todo)} of {len(chunks)} chunk(s) to run")
+
+        failed = []
+        with ThreadPoolExecutor(
+            self.workers, thread_name_prefix="pfin-backfill"
+        ) as pool:
+            # [richmosko]: at most `workers` chunks fetched ahead of the writes
+            pending = collections.deque()
+            chunk_iter = iter(todo)
+
+            def submit_next():
+                chunk = next(chunk_iter, None)
+                if chunk is not None:
+                    pending.append((chunk, pool.submit(fetch_func, chunk)))
+
+            for _ in range(self.workers):
+                submit_next()
+            while pending:
+                (chunk, future) = pending.popleft()
+                submit_next()
+                try:
+                    mode = write_func(chunk, future.result())
+                except Exception as exc:
+                    logger.exception(
+                        f"Backfill {run}: chunk {chunk.key} failed ({exc})"
+                    )
+                    failed.append((chunk, exc))
+                    continue
+                self.checkpoint.mark_done(run, chunk)
+                self.stats["chunks"] += 1
+                if mode:
+                    self.stats[f"chunks_{mode}"] += 1
+        if failed:
+            self.stats["failed"] += len(failed)
+            detail = "; ".join(f"{chunk.key}: {exc}" for (chunk, exc) in failed)
+            raise RuntimeError(
+                f"Backfill {run}: {len(failed)} of {len(todo)} chunk(s) failed ({detail})"
+            )
+        return call_budget
+
+    def summary(self):
+        """
+        Backfill statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        return {"workers": self.workers, **dict(self.stats)}
+
+
+def run_name(table, start_date, end_date=None):
+    """
+    Name of a backfill run in the checkpoint file. Without an end date the run
+    goes up to today, and keeps its name from one day to the next
+    """
+    return f"{table}:{start_date}..{end_date or ''}"
@@ -0,0 +1,233 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Windowed BLS CPI fetcher. A BLS v2 request covers at most 20 years and 50
+    series (registered key), so a longer history or more series (core CPI,
+    regional, SA/NSA) takes several requests. CpiFetcher splits the series
+    and years into windows within those limits, fetches the windows
+    concurrently (utils.fetch_cpi_df) and merges them, one row per series
+    and month.
+
+    Closed years are cached (in memory, and in local Parquet files when a
+    cache directory is set) and never fetched again. Only the revisable years
+    are: the current year for the not seasonally adjusted series, and the last
+    5 years for the seasonally adjusted ones (BLS revises their seasonal
+    factors every February).
+"""
+
+# library imports
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import polars as pl
+
+from pfin_back_etl import utils
+
+logger = logging.getLogger("pfin_etl")
+
+BLS_MAX_YEARS = 20  # years per request (registered v2 key)
+BLS_MAX_SERIES = 50  # series per request (registered v2 key)
+_SA_REVISE_YEARS = 5
+
+# [richmosko]: series_name of the well known series (others keep their id)
+SERIES_NAMES = {
+    "CUUR0000SA0": "cpi-u",
+    "CUSR0000SA0": "cpi-u-sa",
+    "CUUR0000SA0L1E": "cpi-u-core",
+    "CUSR0000SA0L1E": "cpi-u-core-sa",
+}
+
+_KEY_COLS = ["series_id", "year", "month"]
+
+
+def series_name(series_id):
+    """
+    Name of a CPI series for the cpi table (ie: 'cpi-u' for CUUR0000SA0)
+    """
+    return SERIES_NAMES.get(series_id, series_id)
+
+
+def revise_years(series_id):
+    """
+    Number of recent years (the current one included) BLS may still revise
+    """
+    # [richmosko]: CPI series ids: CU + S(easonally adjusted) or U(nadjusted) ...
+    return _SA_REVISE_YEARS if series_id[2:3] == "S" else 1
+
+
+def plan_windows(years_by_series, max_years=BLS_MAX_YEARS, max_series=BLS_MAX_SERIES):
+    """
+    Split the years to fetch per series into BLS request windows
+
+    args:
+        years_by_series:   dictionary of series id -> list of years to fetch
+        max_years:         max years per request
+        max_series:        max series per request
+
+    returns:
+        windows:           list of (series id list, startyear, endyear)
+    """
+    runs = {}  # [richmosko]: (startyear, endyear) -> series ids
+    for series_id, years in years_by_series.items():
+        years = sorted(set(years))
+        start = None
+        for idx, year in enumerate(years):
+            start = year if start is None else start
+            if idx + 1 < len(years) and years[idx + 1] == year + 1:
+                continue
+            for y0 in range(start, year + 1, max_years):
+                y1 = min(y0 + max_years - 1, year)
+                runs.setdefault((y0, y1), []).append(series_id)
+            start = None
+    windows = []
+    for (y0, y1), series_lst in sorted(runs.items()):
+        for idx in range(0, len(series_lst), max_series):
+            windows.append((series_lst[idx : idx + max_series], y0, y1))
+    return windows
+
+
+class CpiFetcher:
+    """
+    Fetches BLS CPI series over any range of years, caching the closed years
+    """
+
+    def __init__(
+        self,
+        api_key,
+        cache_dir=None,
+        workers=4,
+        max_years=BLS_MAX_YEARS,
+        max_series=BLS_MAX_SERIES,
+    ):
+        """
+        Class initializer...
+
+        args:
+            api_key:       BLS API key
+            cache_dir:     (optional) directory to keep the closed years across
+                           runs. In memory only (this process) when None
+            workers:       max number of requests in flight
+            max_years:     max years per request
+            max_series:    max series per request
+        """
+        self.api_key = api_key
+        self.cache_dir = cache_dir
+        self.workers = max(int(workers), 1)
+        self.max_years = max_years
+        self.max_series = max_series
+        self.stats = Counter()
+        self._closed = {}  # series id -> polars dataframe of its closed years
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def fetch(self, startyear, endyear, series_id_lst, today=None):
+        """
+        Fetch CPI data from the BLS, only requesting the years not cached
+
+        args:
+            startyear:     starting year to fetch
+            endyear:       ending year to fetch
+            series_id_lst: list of series IDs to fetch. id: ['CUUR0000SA0']
+            today:         (optional) date deciding the closed years
+
+        returns:
+            df_cpi:        polars dataframe of CPI index data (utils.CPI_SCHEMA),
+                           sorted by series, year and month
+        """
+        today = today or date.today()
+        (startyear, endyear) = (int(startyear), int(endyear))
+        df_list = []
+        years_by_series = {}
+        with self._lock:
+            for series_id in series_id_lst:
+                df_closed = self._cached(series_id).filter(
+                    pl.col("year").is_between(startyear, endyear)
+                )
+                have = set(df_closed["year"].to_list())
+                years_by_series[series_id] = [
+                    year for year in range(startyear, endyear + 1) if year not in have
+                ]
+                self.stats["cached_years"] += len(have)
+                df_list.append(df_closed)
+        windows = plan_windows(years_by_series, self.max_years, self.max_series)
+        logger.info(f"BLS: fetching {len(windows)} window(s): {windows}")
+        if windows:
+            with ThreadPoolExecutor(
+                min(self.workers, len(windows)), thread_name_prefix="pfin-bls"
+            ) as pool:
+                df_fetched = list(pool.map(self._fetch_window, windows))
+            self.stats["windows"] += len(windows)
+            self.stats["fetched_years"] += sum(
+                len(series_lst) * (y1 - y0 + 1) for (series_lst, y0, y1) in windows
+            )
+            df_list += df_fetched
+            self._cache_closed(pl.concat(df_fetched, how="vertical_relaxed"), today)
+        df_cpi = (
+            pl.concat(df_list, how="vertical_relaxed")
+            .unique(subset=_KEY_COLS, keep="last", maintain_order=True)
+            .sort(_KEY_COLS)
+        )
+        return df_cpi
+
+    def summary(self):
+        """
+        Fetcher statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        with self._lock:
+            cached = {sid: len(df) for sid, df in self._closed.items() if len(df)}
+            return {"workers": self.workers, **dict(self.stats), "cached_rows": cached}
+
+    def _fetch_window(self, window):
+        (series_lst, y0, y1) = window
+        df = utils.fetch_cpi_df(self.api_key, y0, y1, series_lst)
+        return df.select(
+            [pl.col(col).cast(dtype) for col, dtype in utils.CPI_SCHEMA.items()]
+        )
+
+    def _cache_closed(self, df_fetched, today):
+        # [richmosko]: a year is closed once all its months are out, and it is
+        #              past the revision window of its series
+        df_months = df_fetched.group_by(["series_id", "year"]).agg(
+            pl.col("month").n_unique().alias("months")
+        )
+        with self._lock:
+            for series_id in df_fetched["series_id"].unique().to_list():
+                last_closed = today.year - revise_years(series_id)
+                years = df_months.filter(
+                    (pl.col("series_id") == series_id)
+                    & (pl.col("months") == 12)
+                    & (pl.col("year") <= last_closed)
+                )["year"].to_list()
+                if not years:
+                    continue
+                df_new = df_fetched.filter(
+                    (pl.col("series_id") == series_id) & pl.col("year").is_in(years)
+                )
+                df_closed = pl.concat([self._cached(series_id), df_new]).sort(_KEY_COLS)
+                self._closed[series_id] = df_closed
+                if self.cache_dir:
+                    path = self._path(series_id)
+                    df_closed.write_parquet(f"{path}.tmp")
+                    os.replace(f"{path}.tmp", path)
+
+    def _cached(self, series_id):
+        if series_id not in self._closed:
+            path = self._path(series_id) if self.cache_dir else None
+            if path and os.path.exists(path):
+                self._closed[series_id] = pl.read_parquet(path)
+            else:
+                self._closed[series_id] = pl.DataFrame(schema=utils.CPI_SCHEMA)
+        return self._closed[series_id]
+
+    def _path(self, series_id):
+        return os.path.join(self.cache_dir, f"{series_id}.parquet")
@@ -0,0 +1,113 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Run-scoped cache of database reads. One update_table_all run reads the
+    same snapshots several times (pfin.reporting_period for every statement
+    table and the earnings, the asset maps for every table sync), and they
+    only change when the ETL writes to one of the tables they came from.
+    Entries remember the tables they depend on, and are dropped when
+    insert_table_df/update_table_df writes to any of them.
+"""
+
+# library imports
+import logging
+import threading
+from collections import Counter
+
+from sqlalchemy.sql import util as sqla_util
+
+logger = logging.getLogger("pfin_etl")
+
+
+def stmt_key(stmt):
+    """
+    Cache key and table dependencies of a sqlalchemy select statement
+
+    args:
+        stmt:              sqlalchemy select statement
+
+    returns:
+        key:               hashable key (SQL text and bound parameter values)
+        tables:            set of the full table names the statement reads
+    """
+    compiled = stmt.compile()
+    params = tuple(sorted((k, repr(v)) for k, v in compiled.params.items()))
+    tables = {tab.fullname for tab in sqla_util.find_tables(stmt)}
+    return ((str(compiled), params), tables)
+
+
+class SnapshotCache:
+    """
+    In-memory cache of query results, invalidated by table writes. Thread safe.
+    """
+
+    def __init__(self):
+        """
+        Class initializer...
+        """
+        self._entries = {}  # key -> (set of table names, value)
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        self.table_hits = Counter()
+
+    def get_or_fetch(self, key, tables, fetch_func):
+        """
+        Serve a cached value, or fetch and cache it
+
+        args:
+            key:           hashable cache key
+            tables:        set of the full table names the value depends on
+            fetch_func:    function returning the value on a miss
+
+        returns:
+            value:         the cached (or fetched) value. Shared between
+                           callers... don't modify it in place
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.stats["hits"] += 1
+                for name in tables:
+                    self.table_hits[name] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        value = fetch_func()
+        with self._lock:
+            self._entries[key] = (set(tables), value)
+        return value
+
+    def invalidate(self, table):
+        """
+        Drop the entries that depend on a table (after writing to it)
+
+        args:
+            table:         full table name (ie: pfin.reporting_period)
+        """
+        with self._lock:
+            keys = [key for key, (deps, _) in self._entries.items() if table in deps]
+            for key in keys:
+                del self._entries[key]
+            self.stats["invalidations"] += len(keys)
+
+    def clear(self):
+        """
+        Drop every entry (ie: at the start of a run)
+        """
+        with self._lock:
+            self._entries = {}
+
+    def summary(self):
+        """
+        Cache statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        with self._lock:
+            return {
+                **dict(self.stats),
+                "entries": len(self._entries),
+                "table_hits": dict(self.table_hits),
+            }
@@ -0,0 +1,216 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Record/replay of the FMP and BLS API responses of a run ("cassettes").
+    In record mode every successful response is stored in a zip file (one
+    deflate compressed member per request, keyed by the endpoint and its args).
+    In replay mode the responses are served back from the zip without any
+    network access, so a full update_table_all can be re-run against a local
+    database to benchmark and bisect regressions on real-shaped data.
+
+    The date window args (from/to, start/end date, start/end year) are keyed
+    relative to the day the cassette was opened: the nightly ETL derives them
+    from today's date, so a replay on a later day still finds the recorded
+    responses, while different windows of the same run (ie: BLS year windows,
+    backfill date chunks) keep their own responses.
+"""
+
+# library imports
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import zipfile
+from datetime import date
+
+import requests
+
+logger = logging.getLogger("pfin_etl")
+
+MODES = ("record", "replay")
+# [richmosko]: args that never select different data
+IGNORED_ARGS = {"apikey", "registrationkey"}
+# [richmosko]: date window args, keyed relative to the cassette's day
+WINDOW_ARGS = {"start_date", "end_date", "from", "to", "startyear", "endyear"}
+
+
+class CassetteMiss(KeyError):
+    """
+    Raised in replay mode for a request that was never recorded
+    """
+
+
+class Cassette:
+    """
+    Zip file of recorded API responses. Thread safe.
+    """
+
+    def __init__(self, path, mode="replay"):
+        """
+        Class initializer...
+
+        args:
+            path:          cassette (zip) file path
+            mode:          'record' (append new responses) or 'replay'
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}' (use {MODES})")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.today = date.today()
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(
+            path, "a" if mode == "record" else "r", zipfile.ZIP_DEFLATED
+        )
+        self._names = set(self._zip.namelist())
+
+    def key(self, source, endpoint, args):
+        """
+        Member name of a request: <source>/<endpoint>/<args hash>
+
+        args:
+            source:        API source ('fmp' or 'bls')
+            endpoint:      endpoint name (ie: income_statement)
+            args:          dictionary of the request args
+        """
+        key_args = {}
+        for arg, value in args.items():
+            if arg in IGNORED_ARGS:
+                continue
+            if arg in WINDOW_ARGS:
+                value = self._window_offset(value)
+            key_args[arg] = value
+        blob = json.dumps(key_args, sort_keys=True, default=str)
+        digest = hashlib.sha1(blob.encode()).hexdigest()[:20]
+        return f"{source}/{endpoint}/{digest}"
+
+    def _window_offset(self, value):
+        """
+        Key of a window bound relative to self.today: days for dates
+        ('yyyy-mm-dd'), years for years (yyyy), anything else as is
+        """
+        text = str(value)
+        if len(text) == 4 and text.isdigit():
+            return f"year{int(text) - self.today.year:+d}"
+        try:
+            day = date.fromisoformat(text[:10])
+        except ValueError:
+            return text
+        return f"day{(day - self.today).days:+d}"
+
+    def record(self, source, endpoint, args, rsp):
+        """
+        Store the body of a (successful) response. The first recording of a
+        request wins.
+        """
+        name = self.key(source, endpoint, args)
+        with self._lock:
+            if name in self._names:
+                return
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.comment = json.dumps(args, sort_keys=True, default=str).encode()
+            self._zip.writestr(info, rsp.content)
+            self._names.add(name)
+
+    def replay(self, source, endpoint, args):
+        """
+        Serve a recorded response
+
+        returns:
+            rsp:           requests response (status 200) with the recorded body
+        """
+        name = self.key(source, endpoint, args)
+        with self._lock:
+            if name not in self._names:
+                self.misses += 1
+                raise CassetteMiss(f"{name} not recorded in {self.path} ({args})")
+            self.hits += 1
+            body = self._zip.read(name)
+        rsp = requests.Response()
+        rsp.status_code = 200
+        rsp.url = f"cassette://{name}"
+        rsp._content = body
+        return rsp
+
+    def close(self):
+        with self._lock:
+            if self._zip.fp is not None:
+                logger.info(
+                    f"Cassette {self.path} ({self.mode}): {len(self._names)} "
+                    f"response(s), {self.hits} hit(s), {self.misses} miss(es)"
+                )
+            self._zip.close()
+
+
+current = None
+
+
+def use(path, mode="replay"):
+    """
+    Activate a cassette for the FMP and BLS calls of this process (the
+    previous one is closed). Closed automatically at exit.
+
+    returns:
+        cassette:          the active Cassette
+    """
+    global current
+    eject()
+    current = Cassette(path, mode)
+    atexit.register(current.close)
+    return current
+
+
+def eject():
+    """
+    Close and deactivate the active cassette (if any)
+    """
+    global current
+    if current is not None:
+        current.close()
+        current = None
+
+
+def call(source, endpoint, args, func):
+    """
+    Run an API call through the active cassette: func() is called (and its
+    response recorded) unless a cassette is replaying.
+
+    args:
+        source:            API source ('fmp' or 'bls')
+        endpoint:          endpoint name
+        args:              dictionary of the request args (the cassette key)
+        func:              function making the live call, returns a response
+
+    returns:
+        rsp:               requests response
+    """
+    active = current
+    if active is not None and active.mode == "replay":
+        return active.replay(source, endpoint, args)
+    rsp = func()
+    if active is not None and rsp.ok:
+        active.record(source, endpoint, args, rsp)
+    return rsp
+
+
+async def acall(source, endpoint, args, func):
+    """
+    Async version of call(): func() returns the awaitable making the live call,
+    which raises on an unsuccessful response.
+
+    returns:
+        rsp:               httpx response (requests response when replaying)
+    """
+    active = current
+    if active is not None and active.mode == "replay":
+        return active.replay(source, endpoint, args)
+    rsp = await func()
+    if active is not None:
+        active.record(source, endpoint, args, rsp)
+    return rsp
@@ -11,16 +11,44 @@ Description:
 """
 
 # library imports
+import asyncio
+import collections
+import io
 import logging
+import os
+import threading
+import time
 from datetime import date, datetime, timezone, timedelta
 import sqlalchemy as sqla
 import sqlalchemy.ext.automap as sqla_automap
 import polars as pl
 import fmpstab
-from pfin_back_etl import utils
+import requests
+from pfin_back_etl import (
+    asyncfmp,
+    backfill,
+    bls,
+    cache,
+    cassette,
+    decode,
+    keyindex,
+    mirror,
+    perf,
+    pipeline,
+    schedule,
+    utils,
+)
+from pfin_back_etl import schema as pfin_schema
 
 logger = logging.getLogger("pfin_etl")
 
+# [richmosko]: PFIN_DB_BACKEND options... 'sqlite' is embedded (no server)
+DB_BACKENDS = ("supabase", "postgres", "sqlite")
+# [richmosko]: FMP date / timestamp formats... parsed with an explicit format,
+#              since polars can't infer one from a column with no valid value
+FMP_DATE_FORMAT = "%Y-%m-%d"
+FMP_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 
 class PFinFMP(fmpstab.FMPStab):
     """
@@ -29,15 +57,101 @@ class PFinFMP(fmpstab.FMPStab):
     PFin project.
     """
 
-    def __init__(self, api_key: str) -> None:
-        max_calls_per_minute = 280
+    # [richmosko]: rate limited (HTTP 429) calls are retried with a doubling backoff
+    _max_retries = 3
+    _retry_backoff = 2.0  # seconds
+    # [richmosko]: HTTP status codes FMP answers when the plan has no access
+    _plan_reject_status = (402, 403)
+    decode_pool = None  # [richmosko]: optional decode.DecodePool
+    async_concurrency = None  # [richmosko]: fan out list fetches with asyncfmp
+    _async_client = None  # [richmosko]: asyncfmp.AsyncPFinFMP, on _async_loop
+    _async_loop = None
+    # [richmosko]: not part of the fmpstab endpoint config (yet)
+    extra_endpoints = {
+        "balance-sheet-statement-bulk": {
+            "path": "balance-sheet-statement-bulk",
+            "params": {
+                "year": {"required": True, "type": "string"},
+                "period": {"required": True, "type": "string"},
+            },
+        },
+    }
+
+    def __init__(
+        self, api_key: str, base_url: str = None, max_calls_per_minute: int = 280
+    ) -> None:
+        """
+        Class initializer...
+
+        args:
+            api_key:       FMP API key
+            base_url:      (optional) API base URL, ie: a local mock server.
+                           Defaults to the fmpstab config (FMP stable API)
+            max_calls_per_minute: client side rate limit
+        """
+        if base_url and not base_url.endswith("/"):
+            base_url += "/"  # [richmosko]: endpoint paths are joined relative
         config_file = None
-        base_url = None
         logger = None
         log_enabled = False
         super().__init__(
             api_key, max_calls_per_minute, config_file, base_url, logger, log_enabled
         )
+        for ep, ep_info in self.extra_endpoints.items():
+            self.endpoints.setdefault(ep, ep_info)
+        fmpstab.attach_dynamic_functions(self)
+        # [richmosko]: the dynamic endpoint functions are all named 'method'...
+        #              name them after the endpoint so the logs, API stats and
+        #              bulk lookups (ie: income_statement_bulk) can tell them apart
+        for ep in self.endpoints:
+            func_name = ep.replace("-", "_")
+            getattr(type(self), func_name).__name__ = func_name
+        self._batch_size = 100
+        self._bulk_min_symbols = 500
+        self._max_calls_per_minute = max_calls_per_minute
+        self._unsupported = set()  # endpoints rejected by the FMP plan
+
+    def enable_async(self, concurrency):
+        """
+        Fan out the list fetches (fetch_fmp_list_df) from one thread with the
+        asyncio client (asyncfmp.AsyncPFinFMP) instead of one call at a time
+
+        args:
+            concurrency:   max number of requests in flight
+        """
+        self.close_async()
+        self.async_concurrency = int(concurrency)
+        # [richmosko]: one client (connection pool) and event loop for the whole
+        #              run... the loop runs on its own thread, so the backfill
+        #              fetch workers can all submit to it
+        self._async_client = asyncfmp.AsyncPFinFMP(
+            self.api_key,
+            base_url=self.base_url,
+            max_calls_per_minute=self._max_calls_per_minute,
+            max_concurrency=self.async_concurrency,
+            extra_endpoints=self.extra_endpoints,
+        )
+        self._async_loop = asyncio.new_event_loop()
+        self._async_thread = threading.Thread(
+            target=self._async_loop.run_forever, name="fmp-async", daemon=True
+        )
+        self._async_thread.start()
+
+    def close_async(self):
+        """
+        Close the async client (connection pool) and stop its event loop
+        """
+        if self._async_loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(
+            self._async_client.aclose(), self._async_loop
+        ).result()
+        self._async_loop.call_soon_threadsafe(self._async_loop.stop)
+        self._async_thread.join()
+        self._async_loop.close()
+        self._async_client = None
+        self._async_loop = None
+        self.async_concurrency = None
 
     def get_screened_stocks(self, min_mkt_cap, result_limit):
         """
@@ -57,42 +171,389 @@ class PFinFMP(fmpstab.FMPStab):
         )
         return df_slist
 
-    def fetch_fmp_list_df(self, fmp_func, key, **kwargs):
+    def get_earnings_calendar(self, start_date, end_date):
+        """
+        Run FMP earnings-calendar API to get the companies that reported (or are
+        scheduled to report) between start_date and end_date...
+
+        args:
+            start_date:    first date of the window in 'yyyy-mm-dd' format
+            end_date:      last date of the window in 'yyyy-mm-dd' format
+
+        returns:
+            df_cal:        polars dataframe of calendar entries (symbol, date, ...)
+        """
+        df_cal = self.fetch_fmp_df(
+            self.calendar_earnings,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        return df_cal
+
+    def get_profiles(self, sym_list):
+        """
+        Fetch company profiles for a list of symbols with as few calls as the FMP
+        plan allows: the profile-bulk endpoint for large lists, otherwise
+        comma-separated batch requests, falling back to one call per symbol.
+
+        args:
+            sym_list:      list of symbols to fetch
+
+        returns:
+            df_fmp:        polars dataframe of profiles (one row per symbol)
+        """
+        if len(sym_list) >= self._bulk_min_symbols:
+            df_fmp = self.fetch_fmp_bulk_parts_df(self.profile_bulk)
+            if df_fmp is not None and not df_fmp.is_empty():
+                df_fmp = df_fmp.filter(pl.col("symbol").is_in(sym_list))
+                # [richmosko]: a failed part leaves some symbols to fetch by batch
+                found = set(df_fmp["symbol"].to_list())
+                miss_list = [sym for sym in sym_list if sym not in found]
+                if not miss_list:
+                    return df_fmp
+                df_miss = self.fetch_fmp_batch_df(
+                    self.profile, "symbol", symbol=miss_list
+                )
+                return pl.concat([df_fmp, df_miss], how="diagonal_relaxed")
+        return self.fetch_fmp_batch_df(self.profile, "symbol", symbol=sym_list)
+
+    def get_statements(self, fmp_func, sym_list, limit, columns=None):
+        """
+        Fetch quarterly financial statements (income, balance sheet, or cash flow)
+        for a list of symbols. Large lists use the FMP bulk endpoint (one call per
+        fiscal quarter for all companies), otherwise one call per symbol.
+
+        args:
+            fmp_func:      per-symbol statement function (ie: self.income_statement)
+            sym_list:      list of symbols to fetch
+            limit:         number of (most recent) quarters to fetch per symbol
+            columns:       (optional) snake_case FMP fields to keep. The fields
+                           that identify a statement are always kept
+
+        returns:
+            df_fmp:        polars dataframe of statements
+        """
+        if columns is not None:
+            columns = set(columns) | {"symbol", "date", "fiscal_year", "period"}
+        bulk_func = getattr(self, f"{fmp_func.__name__}_bulk", None)
+        if bulk_func is not None and len(sym_list) >= self._bulk_min_symbols:
+            df_fmp = self._fetch_statements_bulk_df(
+                bulk_func, sym_list, limit, columns=columns
+            )
+            if df_fmp is not None:
+                return df_fmp
+        return self.fetch_fmp_list_df(
+            fmp_func,
+            "symbol",
+            columns=columns,
+            symbol=sym_list,
+            limit=limit,
+            period="quarter",
+        )
+
+    def _fetch_statements_bulk_df(self, bulk_func, sym_list, limit, columns=None):
+        """
+        Fetch the latest {limit} quarterly statements for the symbols in sym_list
+        from a bulk statement endpoint (one call per fiscal year and quarter).
+
+        returns: df_fmp (polars dataframe, or None if the plan has no access)
+        """
+        df_list = []
+        current_year = date.today().year
+        # [richmosko]: fiscal years can run up to a year ahead of calendar years
+        for year in range(current_year - limit // 4, current_year + 2):
+            for period in ["Q1", "Q2", "Q3", "Q4"]:
+                df_tmp = self.fetch_fmp_bulk_df(
+                    bulk_func, columns=columns, year=year, period=period
+                )
+                if df_tmp is None:
+                    return None
+                if not df_tmp.is_empty():
+                    df_list.append(df_tmp.filter(pl.col("symbol").is_in(sym_list)))
+        if not df_list:
+            return pl.DataFrame()
+        df_fmp = pl.concat(df_list, how="diagonal_relaxed")
+        # [richmosko]: match the JSON endpoint, which returns fiscal_year as a string
+        df_fmp = df_fmp.with_columns(pl.col("fiscal_year").cast(pl.String))
+        df_fmp = (
+            df_fmp.sort("date", descending=True)
+            .group_by("symbol", maintain_order=True)
+            .head(limit)
+        )
+        return df_fmp
+
+    def fetch_fmp_batch_df(self, fmp_func, key, **kwargs):
+        """
+        Calls self.fetch_fmp_df with comma-separated batches of the items in
+        key(list). Items missing from a batch response are fetched one at a time,
+        and if the plan rejects batch requests (see self._is_plan_rejection) the
+        remaining calls go straight to one call per item (self.fetch_fmp_list_df).
+
+        returns: df_fmp (polars dataframe of query results)
+        """
+        key_list = kwargs.pop(key)
+        if not isinstance(key_list, list):
+            key_list = [key_list]
+        fmp_api_name = fmp_func.__name__
+
+        df_list = []
+        miss_list = []
+        for idx in range(0, len(key_list), self._batch_size):
+            batch = key_list[idx : idx + self._batch_size]
+            if fmp_api_name in self._unsupported or len(batch) == 1:
+                miss_list.extend(batch)
+                continue
+            kwargs[key] = ",".join(batch)
+            try:
+                df_tmp = self.fetch_fmp_df(fmp_func, **kwargs)
+            except requests.HTTPError as e:
+                if not self._is_plan_rejection(e):
+                    raise
+                logger.info(f"FMP ({fmp_api_name}): batch request rejected ({e})")
+                df_tmp = None
+            if df_tmp is None or self._is_error_payload(df_tmp.columns):
+                logger.info(f"FMP ({fmp_api_name}): batching not supported...")
+                self._unsupported.add(fmp_api_name)
+                miss_list.extend(batch)
+                continue
+            if df_tmp.is_empty() or key not in df_tmp.columns:
+                # [richmosko]: nothing found in this batch... one at a time
+                miss_list.extend(batch)
+                continue
+            df_list.append(df_tmp)
+            found = set(df_tmp[key].to_list())
+            miss_list.extend([item for item in batch if item not in found])
+
+        if miss_list:
+            kwargs[key] = miss_list
+            df_list.append(self.fetch_fmp_list_df(fmp_func, key, **kwargs))
+        df_list = [df for df in df_list if not df.is_empty()]
+        if not df_list:
+            return pl.DataFrame()
+        return pl.concat(df_list, how="diagonal_relaxed")
+
+    def fetch_fmp_bulk_parts_df(self, fmp_func, **kwargs):
+        """
+        Fetch every part of a paginated FMP bulk endpoint (part=0,1,2,...) until
+        an empty part is returned. A part that fails ends the fetch, but keeps the
+        parts already fetched (the caller fills in what's missing).
+
+        returns: df_fmp (polars dataframe, or None if the plan has no access)
+        """
+        fmp_api_name = fmp_func.__name__
+        df_list = []
+        part = 0
+        while True:
+            try:
+                df_tmp = self.fetch_fmp_bulk_df(fmp_func, part=part, **kwargs)
+            except requests.HTTPError as e:
+                if not df_list:
+                    raise
+                logger.info(f"FMP ({fmp_api_name}): bulk part {part} failed ({e})")
+                break
+            if df_tmp is None:
+                if not df_list:
+                    return None
+                break
+            if df_tmp.is_empty():
+                break
+            df_list.append(df_tmp)
+            part += 1
+        if not df_list:
+            return pl.DataFrame()
+        return pl.concat(df_list, how="diagonal_relaxed")
+
+    def fetch_fmp_bulk_df(self, fmp_func, columns=None, **kwargs):
+        """
+        fetch data from a Financial Modeling Prep bulk endpoint (CSV response)
+        using the access function fmp_func(). Bulk access depends on the FMP plan,
+        so a rejected request (see self._is_plan_rejection) disables the endpoint
+        for the rest of the run. Other HTTP errors are raised.
+        When columns is given, only those (snake_case) fields are parsed.
+
+        returns: df (polars dataframe, or None if the plan has no access)
+        """
+        fmp_api_name = fmp_func.__name__
+        if fmp_api_name in self._unsupported:
+            return None
+        logger.info(f"FMP ({fmp_api_name}): Fetching bulk {kwargs} ...")
+        with perf.span("fetch") as rec:
+            try:
+                rsp = self._call_fmp(fmp_func, **kwargs)
+            except requests.HTTPError as e:
+                if not self._is_plan_rejection(e):
+                    raise
+                logger.info(f"FMP ({fmp_api_name}): bulk not available ({e})")
+                self._unsupported.add(fmp_api_name)
+                return None
+            rec["bytes"] = len(rsp.content)
+            if rsp.content.lstrip().startswith(b"{"):
+                # [richmosko]: a JSON error payload instead of the CSV
+                logger.info(f"FMP ({fmp_api_name}): bulk not available")
+                self._unsupported.add(fmp_api_name)
+                return None
+            if not rsp.content.strip():
+                return pl.DataFrame()
+            raw_cols = None
+            if columns is not None:
+                header = pl.read_csv(io.BytesIO(rsp.content), n_rows=0).columns
+                col_dict = utils.col_to_snake(header)
+                raw_cols = [col for col, snake in col_dict.items() if snake in columns]
+            df = pl.read_csv(
+                io.BytesIO(rsp.content), columns=raw_cols, infer_schema_length=None
+            )
+            df = df.rename(utils.col_to_snake(df.columns))
+            rec["rows"] = len(df)
+        logger.info(f"FMP ({fmp_api_name}): Got {len(df)} row(s)")
+        return df
+
+    def _is_plan_rejection(self, err):
+        """
+        Whether an FMP HTTP error means the plan has no access to the endpoint
+        (402/403), as opposed to a transient error (ie: 500, or a 429 left
+        after the retries) that says nothing about the plan.
+        """
+        status = err.response.status_code if err.response is not None else None
+        return status in self._plan_reject_status
+
+    @staticmethod
+    def _is_error_payload(columns):
+        """
+        Whether a decoded FMP response is an error payload ({"Error Message": })
+        """
+        return any(col.lower() in ("error message", "error_message") for col in columns)
+
+    def fetch_fmp_list_df(self, fmp_func, key, columns=None, **kwargs):
         """
         Calls self.fetch_fmp_df multiple times for each item in key(list).
         Concatenates each result into a single polars dataframe
 
         returns: df_fmp (polars dataframe of query results)
         """
+        if self.async_concurrency:
+            return self._fetch_fmp_list_async(fmp_func, key, columns, **kwargs)
         key_list = kwargs.pop(key)
         if not isinstance(key_list, list):
             key_list = [key_list]
 
-        df_fmp = pl.DataFrame()
+        # [richmosko]: with a decode pool, keep fetching while the workers
+        #              decode the previous responses (a few in flight)
+        df_list = []
+        pending = collections.deque()
         for item in key_list:
             kwargs[key] = item
-            df_tmp = self.fetch_fmp_df(fmp_func, **kwargs)
-            if df_fmp.is_empty():
-                df_fmp = df_tmp
-            elif not df_tmp.is_empty():
-                df_fmp = pl.concat([df_fmp, df_tmp], how="vertical_relaxed")
-        return df_fmp
+            if self.decode_pool is None:
+                df_list.append(self.fetch_fmp_df(fmp_func, columns=columns, **kwargs))
+                continue
+            pending.append(
+                self._fetch_fmp_deferred(fmp_func, columns=columns, **kwargs)
+            )
+            if len(pending) >= self.decode_pool.workers * 2:
+                df_list.append(pending.popleft()())
+        df_list.extend(result() for result in pending)
+        df_list = [df for df in df_list if not df.is_empty()]
+        if not df_list:
+            return pl.DataFrame()
+        return pl.concat(df_list, how="vertical_relaxed")
+
+    def _fetch_fmp_list_async(self, fmp_func, key, columns=None, **kwargs):
+        """
+        fetch_fmp_list_df on the async client (see enable_async), with
+        async_concurrency requests in flight
 
-    def fetch_fmp_df(self, fmp_func, **kwargs):
+        returns: df_fmp (polars dataframe of query results)
+        """
+        client = self._async_client
+        func = getattr(client, fmp_func.__name__)
+        fetch = client.fetch_fmp_list_df(func, key, columns=columns, **kwargs)
+        return asyncio.run_coroutine_threadsafe(fetch, self._async_loop).result()
+
+    def _call_fmp(self, fmp_func, **kwargs):
+        """
+        Call an FMP endpoint function, retrying rate limited (HTTP 429) calls
+        with a backoff. Every attempt is recorded in perf.api_stats.
+
+        returns: rsp (requests response)
+        """
+        fmp_api_name = fmp_func.__name__
+        retries = 0
+        while True:
+            t_start = time.perf_counter()
+            try:
+                rsp = cassette.call(
+                    "fmp", fmp_api_name, kwargs, lambda: fmp_func(**kwargs)
+                )
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                perf.api_stats.record(
+                    fmp_api_name,
+                    time.perf_counter() - t_start,
+                    error=True,
+                    rate_limited=(status == 429),
+                )
+                if status != 429 or retries >= self._max_retries:
+                    raise
+                wait = self._retry_backoff * 2**retries
+                retries += 1
+                perf.api_stats.record_retry(fmp_api_name)
+                logger.info(f"FMP ({fmp_api_name}): rate limited, retry in {wait}s")
+                time.sleep(wait)
+                continue
+            perf.api_stats.record(
+                fmp_api_name, time.perf_counter() - t_start, nbytes=len(rsp.content)
+            )
+            return rsp
+
+    def fetch_fmp_df(self, fmp_func, columns=None, **kwargs):
         """
         fetch data from the Financial Modeling Prep API using the access function
         fmp_func(). specific arguments to that function are passed through kwargs.
+        When columns is given, only those (snake_case) fields are decoded into
+        the dataframe, and the rest of the response is never materialized.
 
         returns: df (polars dataframe of query results)
         """
+        if self.decode_pool is not None:
+            return self._fetch_fmp_deferred(fmp_func, columns=columns, **kwargs)()
         fmp_api_name = fmp_func.__name__
         logger.info(f"FMP ({fmp_api_name}): Fetching {kwargs} ...")
-        rsp = fmp_func(**kwargs)
-        df = pl.DataFrame(rsp.json())
-        df = df.rename(utils.col_to_snake(df.columns))
+        with perf.span("fetch") as rec:
+            rsp = self._call_fmp(fmp_func, **kwargs)
+            df = decode.json_to_df(rsp.json(), columns)
+            rec["rows"] = len(df)
+            rec["bytes"] = len(rsp.content)
         logger.info(f"FMP ({fmp_api_name}): Got {len(df)} row(s)")
         return df
 
+    def _fetch_fmp_deferred(self, fmp_func, columns=None, **kwargs):
+        """
+        Same as fetch_fmp_df, but large responses are decoded by the decode pool
+        in the background (see decode.DecodePool)
+
+        returns: function returning the polars dataframe of query results
+        """
+        fmp_api_name = fmp_func.__name__
+        logger.info(f"FMP ({fmp_api_name}): Fetching {kwargs} ...")
+        with perf.span("fetch") as rec:
+            rsp = self._call_fmp(fmp_func, **kwargs)
+            rec["bytes"] = len(rsp.content)
+            if self.decode_pool.wants(rsp.content):
+                decoded = self.decode_pool.submit(rsp.content, columns)
+            else:
+                df = decode.json_to_df(rsp.json(), columns)
+                rec["rows"] = len(df)
+
+                def decoded():
+                    return df
+
+        def result():
+            df = decoded()
+            rec["rows"] = len(df)  # [richmosko]: may be decoded after the span
+            logger.info(f"FMP ({fmp_api_name}): Got {len(df)} row(s)")
+            return df
+
+        return result
+
 
 class SBaseConn:
     """
@@ -102,6 +563,10 @@ class SBaseConn:
     methods to query, insert, and update data.
     """
 
+    mirror = None  # optional local Parquet mirror (mirror.TableMirror)
+    snapshot_cache = None  # optional run-scoped read cache (cache.SnapshotCache)
+    key_index = None  # optional key-only index for routing (keyindex.KeyIndex)
+
     def __init__(self, env_prefix, schema_list):
         """
         Class initializer...
@@ -110,17 +575,76 @@ class SBaseConn:
         self._schema_list = schema_list
         self._params = utils.load_env_variables(env_prefix)
         (self.engine, self.metadata, self.base) = self._sbase_setup()
+        key_index = (self._params["KEY_INDEX"] or "").lower() in ("1", "true", "yes")
+        if key_index or self._params["KEY_INDEX_DIR"]:
+            self.key_index = keyindex.KeyIndex(
+                self.engine, self._params["KEY_INDEX_DIR"]
+            )
+            perf.run_report.add_section("key_index", self.key_index.summary)
+        if self._params["MIRROR_DIR"]:
+            self.mirror = mirror.TableMirror(self._params["MIRROR_DIR"], self.engine)
+            perf.run_report.add_section("mirror", self.mirror.summary)
 
-    def fetch_table_df(self, table):
+    @perf.timed("read")
+    def fetch_table_df(self, table, where=None):
         """
         Fetch what's already in {table}
         Args:    table (sqlalchemy ORM table object)
-        Returns: df_tab (pandas dataframe of table entries)
+                 where (optional sqlalchemy condition to only fetch some rows)
+        Returns: df_tab (polars dataframe of table entries)
         """
         tab = table.__table__
+        if where is None and self.snapshot_cache is not None:
+            return self.snapshot_cache.get_or_fetch(
+                ("table", tab.fullname),
+                {tab.fullname},
+                lambda: self._read_table_df(table),
+            )
+        return self._read_table_df(table, where)
+
+    @perf.timed("read")
+    def fetch_table_keys_df(self, table, key_list, where=None):
+        """
+        Fetch only the key columns (and id) of {table}... all that routing rows
+        to inserts or updates needs (see _isolate_new_rows_df). Served by
+        the key index when there is one (PFIN_KEY_INDEX).
+
+        args:
+            table:         sqlalchemy ORM table object
+            key_list:      list of key columns
+            where:         (optional) sqlalchemy condition to only fetch some rows
+
+        returns:
+            df_keys:       polars dataframe of the key columns (and id)
+        """
+        tab = table.__table__
+        schema = self.get_table_schema(table)
+        if self.key_index is not None:
+            expr = None if where is None else mirror.where_to_expr(where)
+            return self.key_index.lookup(tab, key_list, schema, where, expr)
+        cols = keyindex.KeyIndex.index_columns(tab, key_list)
+        stmt = sqla.select(*[tab.c[col] for col in cols])
+        if where is not None:
+            stmt = stmt.where(where)
+        overrides = {col: schema[col] for col in cols if col in schema}
+        with sqla.orm.Session(self.engine) as session:
+            return pl.read_database(stmt, session, schema_overrides=overrides)
+
+    def _read_table_df(self, table, where=None):
+        """
+        Read {table} from the mirror or the database (see fetch_table_df)
+        """
+        tab = table.__table__
+        schema = self.get_table_schema(table)
+        if self.mirror is not None:
+            df_tab = self.mirror.fetch(tab, schema, where)
+            if df_tab is not None:
+                return df_tab
         stmt = sqla.select(tab)
+        if where is not None:
+            stmt = stmt.where(where)
         with sqla.orm.Session(self.engine) as session:
-            df_tab = pl.read_database(stmt, session)
+            df_tab = pl.read_database(stmt, session, schema_overrides=schema)
         # print(f"self.fetch_table_df():\n {df_tab}")
         return df_tab
 
@@ -129,17 +653,69 @@ class SBaseConn:
         Insert new row entries into table tab_sbase from
         polars dataframe df_insert
         """
-        with sqla.orm.Session(self.engine) as session:
+        with perf.span("insert") as rec, sqla.orm.Session(self.engine) as session:
             s_name = tab_sbase.__table__.schema
             t_name = tab_sbase.__table__.name
             logger.info(
                 f"Inserting {len(df_insert)} new entries in {s_name}.{t_name}..."
             )
+            rec["rows"] = len(df_insert)
+            rec["bytes"] = df_insert.estimated_size()
             ldict_insert = df_insert.to_dicts()
             if ldict_insert:
                 stmt = sqla.insert(tab_sbase)
                 session.execute(stmt, ldict_insert)
                 session.commit()
+                if self.snapshot_cache is not None:
+                    self.snapshot_cache.invalidate(tab_sbase.__table__.fullname)
+                if self.mirror is not None:
+                    schema = self.get_table_schema(tab_sbase)
+                    self.mirror.apply_insert(tab_sbase.__table__, schema, df_insert)
+
+    def copy_table_df(self, tab_sbase, df_insert):
+        """
+        Bulk load new row entries into table tab_sbase from polars dataframe
+        df_insert, without any diff: COPY FROM STDIN on postgresql, a plain
+        insert otherwise. Only for rows known not to be in the table yet (ie:
+        a backfill of an empty date range).
+
+        args:
+            tab_sbase:     The sqlalchemy table instance to target
+            df_insert:     polars dataframe of the new rows. Columns that aren't
+                           in the table are ignored
+        """
+        tab = tab_sbase.__table__
+        common_cols = [col for col in tab.columns.keys() if col in df_insert.columns]
+        df_new = self._set_dtype_df(tab_sbase, df_insert.select(common_cols))
+        if self.engine.dialect.name != "postgresql":
+            self.insert_table_df(tab_sbase, df_new)
+            return
+
+        with perf.span("copy") as rec:
+            logger.info(f"Copying {len(df_new)} new entries into {tab.fullname}...")
+            rec["rows"] = len(df_new)
+            rec["bytes"] = df_new.estimated_size()
+            if df_new.is_empty():
+                return
+            prep = self.engine.dialect.identifier_preparer
+            cols = ", ".join(prep.quote(col) for col in common_cols)
+            stmt = (
+                f"COPY {prep.format_table(tab)} ({cols}) FROM STDIN WITH (FORMAT csv)"
+            )
+            buf = io.BytesIO()
+            df_new.write_csv(buf, include_header=False)
+            buf.seek(0)
+            raw_conn = self.engine.raw_connection()
+            try:
+                with raw_conn.cursor() as cursor:
+                    cursor.copy_expert(stmt, buf)  # [richmosko]: psycopg2
+                raw_conn.commit()
+            finally:
+                raw_conn.close()
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.invalidate(tab.fullname)
+        if self.mirror is not None:
+            self.mirror.apply_insert(tab, self.get_table_schema(tab_sbase), df_new)
 
     def update_table_df(self, tab_sbase, key_list, df_update):
         """
@@ -149,16 +725,123 @@ class SBaseConn:
         temp table. It then updates the data locally in the database
         which executes much faster than a sqlalchemy update command.
         """
-        with sqla.orm.Session(self.engine) as session:
+        with perf.span("update") as rec, sqla.orm.Session(self.engine) as session:
             s_name = tab_sbase.__table__.schema
             t_name = tab_sbase.__table__.name
             logger.info(
                 f"Updating {len(df_update)} existing entries in {s_name}.{t_name}..."
             )
+            rec["rows"] = len(df_update)
+            rec["bytes"] = df_update.estimated_size()
             ldict_update = df_update.to_dicts()
             if ldict_update:
                 self._staging_update(session, tab_sbase, key_list, ldict_update)
                 session.commit()
+                if self.snapshot_cache is not None:
+                    self.snapshot_cache.invalidate(tab_sbase.__table__.fullname)
+                if self.mirror is not None:
+                    self.mirror.apply_update(tab_sbase.__table__, key_list, df_update)
+
+    def sync_table_df(self, tab_sbase, key_list, df_api, sample=0):
+        """
+        Server side diff... insert new and update changed rows of table
+        tab_sbase from polars dataframe df_api without reading the table. The
+        rows are bulk loaded into a temp table, and the database classifies
+        them against the table (matched on key_list) and applies them with set
+        based SQL. Only the counts (and optional samples) come back.
+
+        args:
+            tab_sbase:     The sqlalchemy table instance to target
+            key_list:      list of columns that are unique to key off of
+            df_api:        polars dataframe of the rows (API data). Columns that
+                           aren't in the table are ignored
+            sample:        number of inserted/updated rows to log
+
+        returns:
+            counts:        dictionary of 'insert', 'update' and 'unchanged' row
+                           counts
+        """
+        if not isinstance(key_list, list):
+            key_list = [key_list]
+        tab = tab_sbase.__table__
+        common_cols = [col for col in tab.columns.keys() if col in df_api.columns]
+        df_new = self._set_dtype_df(tab_sbase, df_api.select(common_cols))
+        counts = {"insert": 0, "update": 0, "unchanged": 0}
+        if df_new.is_empty():
+            return counts
+
+        with perf.span("sync") as rec, sqla.orm.Session(self.engine) as session:
+            logger.info(
+                f"Syncing {len(df_new)} entries into {tab.fullname} (server side)..."
+            )
+            rec["rows"] = len(df_new)
+            rec["bytes"] = df_new.estimated_size()
+            # [richmosko]: qualified, so a real table_sync is never dropped
+            tmp_sch = "pg_temp" if self.engine.dialect.name == "postgresql" else "temp"
+            session.execute(sqla.text(f"DROP TABLE IF EXISTS {tmp_sch}.table_sync"))
+            tab_sync = sqla.Table(
+                "table_sync",
+                sqla.MetaData(),
+                *[sqla.Column(col, tab.c[col].type) for col in common_cols],
+                sqla.Column("sync_op", sqla.String(6)),
+                prefixes=["TEMP"],
+            )
+            tab_sync.create(session.connection())
+            session.execute(sqla.insert(tab_sync), df_new.to_dicts())
+
+            # [richmosko]: classify... null safe comparisons of the value columns
+            key_match = sqla.and_(*[tab.c[k] == tab_sync.c[k] for k in key_list])
+            val_cols = [col for col in common_cols if col not in key_list]
+            changed = sqla.or_(
+                sqla.false(),
+                *[tab.c[col].is_distinct_from(tab_sync.c[col]) for col in val_cols],
+            )
+            session.execute(
+                sqla.update(tab_sync)
+                .where(sqla.exists().where(key_match, changed))
+                .values(sync_op="update")
+            )
+            session.execute(
+                sqla.update(tab_sync)
+                .where(~sqla.exists().where(key_match))
+                .values(sync_op="insert")
+            )
+            stmt = sqla.select(tab_sync.c.sync_op, sqla.func.count()).group_by(
+                tab_sync.c.sync_op
+            )
+            for op, count in session.execute(stmt):
+                counts[op or "unchanged"] = count
+            for op in ("insert", "update"):
+                if sample and counts[op]:
+                    stmt = sqla.select(tab_sync).where(tab_sync.c.sync_op == op)
+                    df_sample = pl.read_database(stmt.limit(sample), session)
+                    logger.info(f"Sample of the rows to {op}:\n{df_sample}")
+
+            # apply... update the changed rows, then insert the new ones
+            if counts["update"] and val_cols:
+                session.execute(
+                    sqla.update(tab)
+                    .where(key_match, tab_sync.c.sync_op == "update")
+                    .values({col: tab_sync.c[col] for col in val_cols})
+                )
+            if counts["insert"]:
+                stmt = sqla.select(*[tab_sync.c[col] for col in common_cols]).where(
+                    tab_sync.c.sync_op == "insert"
+                )
+                session.execute(sqla.insert(tab).from_select(common_cols, stmt))
+            session.execute(sqla.text(f"DROP TABLE {tmp_sch}.table_sync"))
+            session.commit()
+        logger.info(
+            f"  {tab.fullname}: {counts['insert']} inserted, {counts['update']} "
+            f"updated, {counts['unchanged']} unchanged"
+        )
+        if counts["insert"] or counts["update"]:
+            if self.snapshot_cache is not None:
+                self.snapshot_cache.invalidate(tab.fullname)
+            if self.mirror is not None and counts["update"]:
+                # [richmosko]: the changed rows never come back to write through
+                self.mirror.invalidate(tab, "server side sync updated rows")
+        return counts
 
     def print_schema_info(self):
         """
@@ -206,6 +889,63 @@ class SBaseConn:
             )
         return c_dict
 
+    def get_table_schema(self, tab_obj):
+        """
+        Get the polars schema matching the reflected column types of a table
+
+        args:
+            tab_obj:       sqlalchemy ORM Table object
+
+        returns:
+            schema:        dictionary of column names -> polars data types
+                           (columns without a direct mapping are left out)
+        """
+        schema = {}
+        for column in tab_obj.__table__.columns:
+            dtype = utils.sqla_to_pl_dtype(column.type)
+            if dtype is not None:
+                schema[column.name] = dtype
+        return schema
+
+    def _set_dtype_df(self, tab_sbase, df_sbase):
+        """
+        Set the datatypes for columns in a polars dataframe from the
+        sqlalchemy reflected table. Only columns that exist in both (with a
+        different data type) are cast. Values that can't be cast become null,
+        the same as the database would reject them.
+
+        args:
+            tab_sbase:     reflected sqlalchemy table
+            df_sbase:      polars dataframe of  ^^^^^ table
+
+        returns:
+            df_dtype:      schema corrected polars dataframe
+        """
+        schema = self.get_table_schema(tab_sbase)
+        df_schema = df_sbase.schema
+        expr_list = []
+        for col, dtype in schema.items():
+            if col not in df_schema or df_schema[col] == dtype:
+                continue
+            expr = pl.col(col)
+            if df_schema[col] == pl.String and dtype == pl.Date:
+                # [richmosko]: polars won't cast strings to temporal types
+                expr = expr.str.to_date(FMP_DATE_FORMAT, strict=False)
+            elif df_schema[col] == pl.String and isinstance(dtype, pl.Datetime):
+                expr = expr.str.to_datetime(
+                    FMP_DATETIME_FORMAT,
+                    time_unit=dtype.time_unit,
+                    time_zone=dtype.time_zone,
+                    strict=False,
+                )
+            elif df_schema[col] == pl.String and dtype == pl.Time:
+                expr = expr.str.to_time(strict=False)
+            else:
+                expr = expr.cast(dtype, strict=False)
+            expr_list.append(expr.alias(col))
+        df_dtype = df_sbase.with_columns(expr_list)
+        return df_dtype
+
     def _sbase_setup(self):
         """
         Sets up the sqlalchemy engine connection and reflects the database
@@ -216,20 +956,15 @@ class SBaseConn:
             metadata:      The database table metadata to define the fields
             base:          The base instance containing the reflected tables
         """
-        # SBASE:: Try to establish a connection to the postgresql database
-        DB_NAME = self._params["DB_NAME"]
-        DB_HOST = self._params["DB_HOST"]
-        DB_PORT = self._params["DB_PORT"]
-        DB_USER = self._params["DB_USER"]
-        DB_PASSWORD = self._params["DB_PASSWORD"]
-        DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@"
-        DATABASE_URL += f"{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        DATABASE_URL += "?sslmode=require"
-
         # 1. Construct the SQLAlchemy connection string and setup the engine
         logger.info("Setting up sqlalchemy engine...")
-        engine = sqla.create_engine(DATABASE_URL, poolclass=sqla.pool.NullPool)
-        # engine = sqla.create_engine(DATABASE_URL, poolclass=sqla.pool.NullPool, echo=True)
+        engine = self._create_engine()
+        if (self._params["SQL_TRACE"] or "").lower() in ("1", "true", "yes"):
+            # [richmosko]: opt-in... attached before reflection to see those too
+            if self._params["SQL_SLOW_MS"]:
+                perf.sql_tracer.slow_seconds = float(self._params["SQL_SLOW_MS"]) / 1000
+            perf.sql_tracer.attach(engine)
+            perf.run_report.add_section("sql", perf.sql_tracer.summary)
 
         # 2. Create the Automap Base, linking to your engine's metadata
         logger.info("Initializing sqlalchemy MetaData object...")
@@ -247,8 +982,86 @@ class SBaseConn:
         base.prepare(
             autoload_with=engine, modulename_for_table=utils.sqla_modulename_for_table
         )
+        if engine.dialect.name == "sqlite":
+            # [richmosko]: SQLite reflection drops details like
+            #              DateTime(timezone=True)... so put back the column
+            #              types of the schema snapshot the tables came from
+            snapshot = pfin_schema.build_metadata()
+            for key, tab in metadata.tables.items():
+                if key in snapshot.tables:
+                    for col in tab.columns:
+                        col.type = snapshot.tables[key].c[col.name].type
         return (engine, metadata, base)
 
+    def _create_engine(self):
+        """
+        Create the sqlalchemy engine for the database backend picked by the
+        DB_BACKEND env variable:
+            - supabase:    SupaBase postgresql (SSL required). The default
+            - postgres:    a local/self-hosted postgresql. DB_URL, or the DB_*
+                           variables with sslmode DB_SSLMODE (default: disable)
+            - sqlite:      embedded database files in DB_PATH, with the pfin
+                           tables created from the bundled schema snapshot
+
+        returns:
+            engine:        The connection engine
+        """
+        backend = (self._params["DB_BACKEND"] or "supabase").lower()
+        if backend not in DB_BACKENDS:
+            raise ValueError(f"Unknown DB_BACKEND '{backend}' (use {DB_BACKENDS})")
+        logger.info(f"Database backend: {backend}")
+        if backend == "sqlite":
+            return self._create_sqlite_engine()
+
+        # SBASE:: Try to establish a connection to the postgresql database
+        DATABASE_URL = self._params["DB_URL"] if backend == "postgres" else None
+        if not DATABASE_URL:
+            DB_NAME = self._params["DB_NAME"]
+            DB_HOST = self._params["DB_HOST"]
+            DB_PORT = self._params["DB_PORT"]
+            DB_USER = self._params["DB_USER"]
+            DB_PASSWORD = self._params["DB_PASSWORD"]
+            SSL_MODE = "require"
+            if backend == "postgres":
+                SSL_MODE = self._params["DB_SSLMODE"] or "disable"
+            DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@"
+            DATABASE_URL += f"{DB_HOST}:{DB_PORT}/{DB_NAME}"
+            DATABASE_URL += f"?sslmode={SSL_MODE}"
+        engine = sqla.create_engine(DATABASE_URL, poolclass=sqla.pool.NullPool)
+        # engine = sqla.create_engine(DATABASE_URL, poolclass=sqla.pool.NullPool, echo=True)
+        return engine
+
+    def _create_sqlite_engine(self):
+        """
+        Create the sqlalchemy engine for an embedded SQLite database. Each
+        schema is a database file (DB_PATH/<schema>.db) attached under its
+        name, so the schema qualified table names work unchanged. Only the
+        schemas of the bundled snapshot (pfin) exist here.
+
+        returns:
+            engine:        The connection engine
+        """
+        db_dir = self._params["DB_PATH"] or "pfin_db"
+        os.makedirs(db_dir, exist_ok=True)
+        self._schema_list = [
+            sch for sch in self._schema_list if sch == pfin_schema.SCHEMA
+        ]
+        main_file = os.path.join(db_dir, "main.db")
+        schema_files = {
+            sch: os.path.join(db_dir, f"{sch}.db") for sch in self._schema_list
+        }
+        engine = sqla.create_engine(
+            f"sqlite:///{main_file}", poolclass=sqla.pool.NullPool
+        )
+
+        @sqla.event.listens_for(engine, "connect")
+        def attach_schemas(dbapi_conn, conn_record):
+            for sch, sch_file in schema_files.items():
+                dbapi_conn.execute(f"ATTACH DATABASE '{sch_file}' AS {sch}")
+
+        pfin_schema.create_pfin_schema(engine)
+        return engine
+
     def _staging_update(self, session, tab_sbase, key_list, ldict_update):
         """
         Create a temp staging table, and insert data into table. Updates from temp
@@ -266,7 +1079,19 @@ class SBaseConn:
         if not isinstance(key_list, list):
             key_list = [key_list]
 
-        session.execute(sqla.text("DISCARD TEMPORARY"))
+        set_list = []
+        for column in tab_sbase.__table__.columns:
+            if column.name not in key_list and column.name in ldict_update[0]:
+                set_list.append(f"""\n{column.name} = ST.{column.name}""")
+        if not set_list:
+            # [richmosko]: only key columns given... nothing to SET
+            logger.info(f"No columns to update in {tab_sbase.__table__.name}")
+            return
+
+        if self.engine.dialect.name == "postgresql":
+            session.execute(sqla.text("DISCARD TEMPORARY"))
+        else:
+            session.execute(sqla.text("DROP TABLE IF EXISTS table_staging"))
         session.commit()
 
         tab_stag = tab_sbase.__table__.to_metadata(
@@ -282,8 +1107,11 @@ class SBaseConn:
         tg_sch_name = tab_sbase.__table__.schema
         tg_name = tab_sbase.__table__.name
         st_name = tab_stag.name
+        # [richmosko]: only copy the column types... a copy of the rows would
+        #              cost a full table scan per call, and match the target
+        #              rows a second time in the update below
         stmt = sqla.text(f"""CREATE TEMP TABLE {st_name} AS
-                             SELECT * FROM {tg_sch_name}.{tg_name};""")
+                             SELECT * FROM {tg_sch_name}.{tg_name} LIMIT 0;""")
         session.execute(stmt)
 
         stmt = sqla.insert(tab_stag)
@@ -292,10 +1120,6 @@ class SBaseConn:
         # SQL statement to update from staging table
         ud_stmt = f"""UPDATE {tg_sch_name}.{tg_name} as TG"""
         ud_stmt += """\nSET"""
-        set_list = []
-        for column in tab_sbase.__table__.columns:
-            if column.name not in key_list:
-                set_list.append(f"""\n{column.name} = ST.{column.name}""")
         ud_stmt += ", ".join(set_list)
         ud_stmt += f"""\nFROM {st_name} as ST"""
         ud_stmt += """\nWHERE """
@@ -310,6 +1134,7 @@ class SBaseConn:
         session.commit()
         self.metadata.remove(tab_stag)
 
+    @perf.timed("diff")
     def _calc_common_cols_df(self, tab_sbase, df_sbase, df_api):
         """
         Find the common columns to populate in the DB table.
@@ -327,10 +1152,14 @@ class SBaseConn:
         common_cols = [item for item in sb_cols if item in api_cols]
         # df_new = pd.DataFrame(columns=common_cols) # initialze empty DF
         # df_old = pd.DataFrame(columns=common_cols) # initialze empty DF
-        df_new = df_api.select(common_cols)
-        df_old = df_sbase.select(common_cols)
+        df_new = self._set_dtype_df(tab_sbase, df_api.select(common_cols))
+        # [richmosko]: df_sbase may only hold the keys (see fetch_table_keys_df)
+        df_old = df_sbase.select(
+            [col for col in common_cols if col in df_sbase.columns]
+        )
         return (common_cols, df_old, df_new)
 
+    @perf.timed("diff")
     def _isolate_new_rows_df(self, on_key, df_old, df_new):
         """
         Compare the existing and new pandas dataframs, and isolate which
@@ -343,15 +1172,10 @@ class SBaseConn:
             df_mrg:        polars dataframe with only the new entries to insert
                            (can be empty dataframe)
         """
-        if len(df_old) == 0:
-            # special handling of empty table... as data types were not inferred
-            # insert all rows
-            return df_new
-
         df_mrg = df_new.join(df_old, on=on_key, how="anti")
-        df_mrg = utils.apply_schema_df(df_old, df_mrg)
         return df_mrg
 
+    @perf.timed("diff")
     def _isolate_updated_rows_df(self, on_key, df_old, df_new):
         """
         Compare the existing and new pandas dataframs, and isolate which
@@ -364,15 +1188,10 @@ class SBaseConn:
             df_mrg:        polars dataframe with only the updated entries to
                            update (can be empty dataframe)
         """
-        if len(df_old) == 0:
-            # special handling of empty table... as data types were not inferred
-            # update no rows
-            return df_old
-
         df_mrg = df_new.join(df_old, on=on_key, how="semi")
-        df_mrg = utils.apply_schema_df(df_old, df_mrg)
         return df_mrg
 
+    @perf.timed("read")
     def _fetch_sbase_ldict(self, stmt):
         """
         Run a select query (stmt) on the database.
@@ -381,8 +1200,17 @@ class SBaseConn:
             stmt:          sqlalchemy (select) statement to execute
 
         returns:
-            ldict:         List of dictionaries, one dict per row
+            ldict:         List of dictionaries, one dict per row. Shared with
+                           the snapshot cache... don't modify it in place
         """
+        if self.snapshot_cache is not None:
+            (key, tables) = cache.stmt_key(stmt)
+            return self.snapshot_cache.get_or_fetch(
+                key, tables, lambda: self._read_sbase_ldict(stmt)
+            )
+        return self._read_sbase_ldict(stmt)
+
+    def _read_sbase_ldict(self, stmt):
         with sqla.orm.Session(self.engine) as session:
             result = session.execute(stmt)
             ldict = []
@@ -401,33 +1229,402 @@ class PFinBackend(SBaseConn):
     pulling from the various API data sources.
     """
 
+    # [richmosko]: the large tables whose syncs can run the server side diff
+    _server_diff_capable = (
+        "income_statement",
+        "balance_sheet_statement",
+        "cash_flow_statement",
+        "earning",
+        "eod_price",
+    )
+    _server_diff_tables = set()
+    _years_to_fetch = 5  # [richmosko]: nightly history depth (deeper: backfill)
+    _backfill_tables = (
+        "cpi",
+        "reporting_period",
+        "income_statement",
+        "balance_sheet_statement",
+        "cash_flow_statement",
+        "earning",
+        "eod_price",
+    )
+    # [richmosko]: FMP statement endpoint (and column renames) of each table
+    _fmp_table_endpoints = {
+        "reporting_period": (
+            "income_statement",
+            {"symbol": "asset_id", "date": "end_date"},
+        ),
+        "income_statement": ("income_statement", None),
+        "balance_sheet_statement": ("balance_sheet_statement", None),
+        "cash_flow_statement": ("cash_flow_statement", None),
+    }
+    backfill_runner = None
+    decode_pool = None
+    cpi_fetcher = None
+    pipeline = None
+    _pipeline_batch = None
+
     def __init__(self):
         env_prefix = "PFIN_"
         schema_list = ["auth", "pfin"]
         super().__init__(env_prefix, schema_list)
-        self.fmp_client = PFinFMP(api_key=self._params["FMP_API_KEY"])
+        self.fmp_client = PFinFMP(
+            api_key=self._params["FMP_API_KEY"],
+            base_url=self._params["FMP_BASE_URL"],
+        )
         self._stock_screener_min_mkt_cap = 1000000000
         self._stock_screener_result_limit = 5000
         self._tmp_date_fut = "4000-12-31"
         self._tmp_year_fut = 4000
         self._tmp_period_fut = "NA"
+        self._refresh_lookback_days = 7
+        self._refresh_lookahead_days = 1
+        self._refresh_overdue_days = 100
+        self._refresh_full_sweep_weekday = 6  # Sunday
+        state_file = self._params["STATE_FILE"] or "pfin_back_etl_state.json"
+        self.refresh_tracker = schedule.RefreshTracker(state_file)
+        mem_budget_mb = self._params["MEM_BUDGET_MB"]
+        self._mem_budget_bytes = float(mem_budget_mb) * 2**20 if mem_budget_mb else None
+        self._mem_frame_copies = 4  # snapshot, API frame, diff projections, joins
+        if (self._params["SNAPSHOT_CACHE"] or "1").lower() not in ("0", "false", "no"):
+            self.snapshot_cache = cache.SnapshotCache()
+            perf.run_report.add_section("snapshot_cache", self.snapshot_cache.summary)
+        server_diff = (self._params["SERVER_DIFF"] or "").lower()
+        if server_diff in ("1", "true", "yes", "all"):
+            self._server_diff_tables = set(self._server_diff_capable)
+        elif server_diff:
+            self._server_diff_tables = set(server_diff.split(","))
+        if self._params["HTTP_POOL_SIZE"] or self._params["HTTP_TIMEOUT"]:
+            utils.configure_http(
+                self._params["HTTP_POOL_SIZE"], self._params["HTTP_TIMEOUT"]
+            )
+        self.cpi_fetcher = bls.CpiFetcher(
+            self._params["BLS_API_KEY"],
+            cache_dir=self._params["BLS_CACHE_DIR"],
+            workers=self._params["BLS_WORKERS"] or 4,
+        )
+        perf.run_report.add_section("bls", self.cpi_fetcher.summary)
+        if self._params["DECODE_WORKERS"]:
+            self.decode_pool = decode.DecodePool(self._params["DECODE_WORKERS"])
+            perf.run_report.add_section("decode_pool", self.decode_pool.summary)
+        self._setup_fmp_client(self.fmp_client)
+        if self._params["PIPELINE_BATCH"]:
+            self._pipeline_batch = int(self._params["PIPELINE_BATCH"])
+            self.pipeline = pipeline.Pipeline(self._params["PIPELINE_DEPTH"] or 2)
+            perf.run_report.add_section("pipeline", self.pipeline.summary)
+        if self._params["CASSETTE"] and cassette.current is None:
+            cassette.use(self._params["CASSETTE"], self._params["CASSETTE_MODE"])
+        if self._params["PROFILE"] and perf.run_report.profiler is None:
+            tables = self._params["PROFILE_TABLES"]
+            perf.enable_profiling(
+                self._params["PROFILE"],
+                run_dir=self._params["PROFILE_DIR"],
+                tables=tables.split(",") if tables else None,
+            )
 
-    def update_table_all(self, sym_list=None):
+    def _setup_fmp_client(self, fmp_client):
+        """
+        Apply the FMP client options of the env variables (shared connection
+        pool, decode pool, async list fetches) to fmp_client
+        """
+        session = getattr(fmp_client.session, "session", None)
+        if isinstance(session, requests.Session):
+            utils.mount_http(session)  # [richmosko]: the fmpstab LimiterSession
+        fmp_client.decode_pool = self.decode_pool
+        if self._params["FMP_CONCURRENCY"]:
+            fmp_client.enable_async(self._params["FMP_CONCURRENCY"])
+
+    def update_table_all(
+        self,
+        sym_list=None,
+        full_sweep=None,
+        force=False,
+        time_budget=None,
+        call_budget=None,
+    ):
         """
         Update all tables that get data from external API services... Meant to
         be run as a scheduled job nightly.
+
+        Only stale work is scheduled (see schedule.DEFAULT_REFRESH_POLICY), most
+        stale first, within the time and API-call budgets.
+
+        args:
+            sym_list:      (optional) list of symbols to fetch and update
+            full_sweep:    (optional) force (True) or skip (False) a refresh of the
+                           financial statements for every symbol. When set to None,
+                           the full sweep only runs on the configured weekday.
+            force:         refresh everything, ignoring the staleness policies
+            time_budget:   (optional) seconds after which no new table update is
+                           started. Defaults to the PFIN_TIME_BUDGET env variable
+            call_budget:   (optional) max number of FMP API calls to schedule.
+                           Defaults to the PFIN_CALL_BUDGET env variable
         """
-        self.update_table_cpi()
-        self.update_table_asset(sym_list=sym_list)
-        self.update_table_equity_profile(sym_list=sym_list)
-        self.update_table_reporting_period(sym_list=sym_list)
-        self.update_table_income_statement(sym_list=sym_list)
-        self.update_table_balance_sheet_statement(sym_list=sym_list)
-        self.update_table_cash_flow_statement(sym_list=sym_list)
-        self.update_table_earning(sym_list=sym_list)
-        self.update_table_eod_price(sym_list=sym_list)
+        tracker = self.refresh_tracker
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.clear()  # [richmosko]: scoped to one run
+        if time_budget is None and self._params["TIME_BUDGET"]:
+            time_budget = float(self._params["TIME_BUDGET"])
+        if call_budget is None and self._params["CALL_BUDGET"]:
+            call_budget = int(self._params["CALL_BUDGET"])
+        t_start = time.monotonic()
+
+        def within_time_budget(table):
+            elapsed = time.monotonic() - t_start
+            if time_budget is not None and elapsed > time_budget:
+                logger.info(f"Time budget exhausted, skipping pfin.{table}...")
+                return False
+            return True
+
+        # [richmosko]: table level refreshes (one shot for the whole table)
+        if force or tracker.is_stale("cpi"):
+            with perf.sync("cpi"):
+                self.update_table_cpi()
+            tracker.mark_refreshed("cpi")
+        asset_calls = len(sym_list) if sym_list else self._stock_screener_result_limit
+        if call_budget is not None and asset_calls > call_budget:
+            logger.info("API call budget too small, skipping pfin.asset...")
+        elif within_time_budget("asset") and (force or tracker.is_stale("asset")):
+            with perf.sync("asset"):
+                self.update_table_asset(sym_list=sym_list)
+            tracker.mark_refreshed("asset")
+            if call_budget is not None:
+                call_budget -= asset_calls
+
+        # [richmosko]: asset level refreshes (most stale assets first)
+        asset_fin = self._fetch_asset_map_financials()
+        asset_chart = self._fetch_asset_map_chart()
+        if sym_list:
+            # [richmosko]: Only use subset of symbols
+            asset_fin = {sym: asset_fin[sym] for sym in sym_list if sym in asset_fin}
+            asset_chart = {
+                sym: asset_chart[sym] for sym in sym_list if sym in asset_chart
+            }
+        stmt_sym_list = []
+        if asset_fin:
+            stmt_sym_list = self.plan_statement_refresh(
+                full_sweep=full_sweep, asset_map=asset_fin
+            )
+        candidates = {
+            "equity_profile": (list(asset_fin.keys()), 1),
+            "reporting_period": (stmt_sym_list, 4),
+            "earning": (list(asset_fin.keys()), 1),
+            "eod_price": (list(asset_chart.keys()), 1),
+        }
+        sched = tracker.schedule(candidates, call_budget=call_budget, force=force)
+
+        # [richmosko]: the statement tables are scheduled (and tracked) as one
+        #              group under reporting_period
+        sync_groups = [
+            ("equity_profile", [("equity_profile", self.update_table_equity_profile)]),
+            (
+                "reporting_period",
+                [
+                    ("reporting_period", self.update_table_reporting_period),
+                    ("income_statement", self.update_table_income_statement),
+                    (
+                        "balance_sheet_statement",
+                        self.update_table_balance_sheet_statement,
+                    ),
+                    ("cash_flow_statement", self.update_table_cash_flow_statement),
+                ],
+            ),
+            ("earning", [("earning", self.update_table_earning)]),
+            ("eod_price", [("eod_price", self.update_table_eod_price)]),
+        ]
+        for sched_name, sync_list in sync_groups:
+            sched_syms = sched[sched_name]
+            if not sched_syms:
+                logger.info(f"Nothing stale in pfin.{sched_name}...")
+                continue
+            synced = True
+            for table, update_func in sync_list:
+                if not within_time_budget(table):
+                    synced = False
+                    break
+                with perf.sync(table):
+                    update_func(sym_list=sched_syms)
+            if synced:
+                tracker.mark_refreshed(sched_name, sched_syms)
         return
 
+    def write_run_report(self):
+        """
+        Log the per-stage timing and API call summaries of the run, and save them
+        as a JSON run report (PFIN_RUN_REPORT) and optionally as a Prometheus
+        textfile (PFIN_PROM_FILE).
+        """
+        perf.run_report.log_summary()
+        perf.api_stats.log_summary()
+        report_file = self._params["RUN_REPORT"] or "pfin_back_etl_report.json"
+        perf.run_report.write_json(report_file)
+        if self._params["PROM_FILE"]:
+            perf.run_report.write_prometheus(self._params["PROM_FILE"])
+
+    def close(self):
+        """
+        Release the worker processes of the backend (the decode pool) and the
+        async FMP client. Call it once the run report is written.
+        """
+        self.fmp_client.close_async()
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+            self.decode_pool = None
+            self.fmp_client.decode_pool = None
+
+    def backfill(
+        self,
+        tables,
+        start_date,
+        end_date=None,
+        sym_list=None,
+        symbols_per_chunk=50,
+        days_per_chunk=5 * 365,
+        call_budget=None,
+    ):
+        """
+        Deep historical load of tables (ie: 20 years for a new symbol set),
+        separate from the nightly refresh. The work is split into symbol/date
+        chunks, fetched in parallel and checkpointed as they are written (see
+        backfill.Backfill), so an interrupted backfill resumes where it left
+        off. eod_price chunks whose date range is empty in the table are bulk
+        loaded (copy_table_df) without any diff.
+
+        args:
+            tables:        list of tables (cpi, reporting_period, the statement
+                           tables, earning and eod_price). Run in that order
+            start_date:    first date to load (datetime.date)
+            end_date:      (optional) last date to load. Defaults to today. The
+                           statement tables, earning and cpi are fetched by
+                           depth from today, so they always load up to today
+            sym_list:      (optional) list of symbols. Defaults to every asset
+            symbols_per_chunk: max symbols per chunk
+            days_per_chunk: max days per eod_price chunk
+            call_budget:   (optional) max number of FMP API calls. Defaults to
+                           the PFIN_CALL_BUDGET env variable
+        """
+        if call_budget is None and self._params["CALL_BUDGET"]:
+            call_budget = int(self._params["CALL_BUDGET"])
+        if self.backfill_runner is None:
+            checkpoint_file = (
+                self._params["BACKFILL_CHECKPOINT"] or "pfin_backfill_checkpoint.json"
+            )
+            self.backfill_runner = backfill.Backfill(
+                checkpoint_file, self._params["BACKFILL_WORKERS"] or 4
+            )
+            perf.run_report.add_section("backfill", self.backfill_runner.summary)
+        unknown = set(tables) - set(self._backfill_tables)
+        if unknown:
+            raise ValueError(f"Tables {sorted(unknown)} can't be backfilled")
+        # [richmosko]: statements are fetched by count of (most recent) quarters,
+        #              so reaching back to start_date takes the depth from today
+        years = -(-(date.today() - start_date).days // 365)
+
+        for table in [t for t in self._backfill_tables if t in tables]:
+            run = backfill.run_name(table, start_date, end_date)
+            with perf.sync(table):
+                if table == "cpi":
+                    # [richmosko]: one chunk (one BLS request for every series),
+                    #              so there is no fetch to overlap with a write
+                    chunks = backfill.plan_chunks(None, start_date, end_date)
+                    self.backfill_runner.run(
+                        run,
+                        chunks,
+                        lambda chunk: None,
+                        lambda chunk, _: self.update_table_cpi(
+                            num_years=date.today().year - start_date.year + 1
+                        ),
+                    )
+                    continue
+                if table == "eod_price":
+                    call_budget = self._backfill_eod_price(
+                        run,
+                        sym_list,
+                        start_date,
+                        end_date,
+                        symbols_per_chunk,
+                        days_per_chunk,
+                        call_budget,
+                    )
+                    continue
+                asset_map = self._fetch_asset_map_financials()
+                syms = [sym for sym in (sym_list or asset_map) if sym in asset_map]
+                update_func = getattr(self, f"update_table_{table}")
+                chunks = backfill.plan_chunks(
+                    syms, start_date, end_date, symbols_per_chunk
+                )
+                call_budget = self.backfill_runner.run(
+                    run,
+                    chunks,
+                    lambda chunk: self._fetch_fmp_table_df(
+                        table, list(chunk.symbols), years * 4
+                    ),
+                    lambda chunk, df_fmp: update_func(
+                        sym_list=list(chunk.symbols), years=years, df_fmp=df_fmp
+                    ),
+                    call_budget=call_budget,
+                )
+        return
+
+    def _backfill_eod_price(
+        self,
+        run,
+        sym_list,
+        start_date,
+        end_date,
+        symbols_per_chunk,
+        days_per_chunk,
+        call_budget,
+    ):
+        """
+        Backfill of pfin.eod_price (see backfill): chunks fetched in parallel,
+        and copied into the table when their date range is empty there
+
+        returns: what is left of call_budget
+        """
+        tab_sbase = self.base.by_module.pfin.eod_price
+        tab = tab_sbase.__table__
+        asset_map = self._fetch_asset_map_chart()
+        missing = [sym for sym in (sym_list or []) if sym not in asset_map]
+        if missing:
+            logger.info(f"Backfill: no charted asset for {missing}, skipping them...")
+        syms = [sym for sym in (sym_list or asset_map) if sym in asset_map]
+        chunks = backfill.plan_chunks(
+            syms, start_date, end_date, symbols_per_chunk, days_per_chunk
+        )
+
+        def fetch_chunk(chunk):
+            df_fmp = self._fetch_eod_price_batch(
+                tab_sbase,
+                {sym: asset_map[sym] for sym in chunk.symbols},
+                chunk.start.isoformat(),
+                chunk.end.isoformat(),
+            )
+            if df_fmp.is_empty():
+                return df_fmp
+            return df_fmp.filter(pl.col("end_date").is_between(chunk.start, chunk.end))
+
+        def write_chunk(chunk, df_fmp):
+            id_list = [asset_map[sym] for sym in chunk.symbols]
+            stmt = (
+                sqla.select(sqla.func.count())
+                .select_from(tab)
+                .where(tab.c.asset_id.in_(id_list))
+                .where(tab.c.end_date.between(chunk.start, chunk.end))
+            )
+            with self.engine.connect() as conn:
+                rows = conn.execute(stmt).scalar()
+            if rows == 0:
+                self.copy_table_df(tab_sbase, df_fmp)
+                return "copy"
+            chunk_map = {sym: asset_map[sym] for sym in chunk.symbols}
+            self._write_eod_price_batch(tab_sbase, chunk_map, df_fmp)
+            return "diff"
+
+        return self.backfill_runner.run(
+            run, chunks, fetch_chunk, write_chunk, call_budget=call_budget
+        )
+
     def update_table_cpi(self, num_years=10):
         """
         Fetch CPI data from the BLS. Insert new data into SupaBase... otherwise
@@ -437,17 +1634,26 @@ class PFinBackend(SBaseConn):
         logger.info("==== Updating pfin.cpi Table")
         api_key = self._params["BLS_API_KEY"]
 
+        series_id_lst = (self._params["BLS_SERIES_ID"] or "CUUR0000SA0").split(",")
+        series_id_lst = [series_id.strip() for series_id in series_id_lst]
+        cpi_fetcher = self.cpi_fetcher or bls.CpiFetcher(api_key)
+
         logger.info("Fetch current CPI data from the BLS...")
         current_year = date.today().year
         starting_year = current_year - num_years + 1  # includes current year
         logger.info(f"Fetching years {starting_year} to {current_year}:")
 
-        # [richmosko]: FIXME... Get Series Name(s) from .env
-        df_api = utils.fetch_cpi_df(
-            api_key, starting_year, current_year, ["CUUR0000SA0"]
+        with perf.span("fetch") as rec:
+            df_api = cpi_fetcher.fetch(starting_year, current_year, series_id_lst)
+            rec["rows"] = len(df_api)
+        df_api = df_api.with_columns(
+            pl.col("series_id")
+            .replace_strict(
+                {sid: bls.series_name(sid) for sid in series_id_lst},
+                return_dtype=pl.String,
+            )
+            .alias("series_name")
         )
-        # df_api = fetch_cpi(api_key, '2022', '2026', ['CUUR0000SA0','SUUR0000SA0'])
-        df_api = df_api.with_columns(pl.lit("cpi-u").alias("series_name"))
         df_api = utils.clean_empty_str_df(df_api)
         # print(df_api)
 
@@ -463,8 +1669,7 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        # [richmosko]: FIXME... key_list should inclue Series Name
-        key_list = ["year", "month"]
+        key_list = ["series_id", "year", "month"]
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -515,9 +1720,16 @@ class PFinBackend(SBaseConn):
             )
             sym_list = df_slist["symbol"].to_list()
 
+        # [richmosko]: pfin.asset is insert only... skip symbols already present
+        old_syms = set(df_sbase["symbol"].to_list())
+        new_sym_list = [sym for sym in sym_list if sym not in old_syms]
+        if not new_sym_list:
+            logger.info("No new symbols to insert...")
+            return
+
         logger.info("Fetching data from Financial Modeling Prep...")
         df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.search_symbol, "query", query=sym_list, limit=1
+            self.fmp_client.search_symbol, "query", query=new_sym_list, limit=1
         )
         df_fmp = df_fmp.rename({"name": "description"})
         df_fmp = df_fmp.with_columns(
@@ -562,17 +1774,19 @@ class PFinBackend(SBaseConn):
         if sym_list:
             # [richmosko]: Only use subset of symbols
             asset_map = {sym: asset_map[sym] for sym in sym_list}
-        id_list = list(asset_map.values())
+        # id_list = list(asset_map.values())
         sym_list = list(asset_map.keys())
         # print(sym_list)
 
         logger.info("Fetching data from Financial Modeling Prep...")
-        key_list = ["symbol"]
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.profile, "symbol", symbol=sym_list, limit=1
-        )
+        df_fmp = self.fmp_client.get_profiles(sym_list)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
-        df_fmp = df_fmp.with_columns(pl.Series("asset_id", id_list))
+        df_fmp = df_fmp.with_columns(
+            pl.col("asset_id")
+            .replace(asset_map)
+            .str.to_integer(strict=False)
+            .alias("asset_id")
+        )
         df_fmp = utils.clean_empty_str_df(df_fmp)
         # print(df_fmp['asset_id'].to_list())
 
@@ -596,13 +1810,14 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, key_list, df_update)
         return
 
-    def update_table_reporting_period(self, sym_list=None):
+    def update_table_reporting_period(self, sym_list=None, years=None, df_fmp=None):
         """
         Fetch reporting-period data from FMP using the income-statement API.
         Insert new entries into SupaBase, otherwise update existing entries with
-        fresh data.
+        fresh data. df_fmp is the FMP data of sym_list when it was already
+        fetched (see _fetch_fmp_table_df).
         """
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         PERIODS_TO_FETCH = YEARS_TO_FETCH * 4
 
         logger.info("==== " * 16)
@@ -610,7 +1825,8 @@ class PFinBackend(SBaseConn):
 
         logger.info("Figure out what's already in pfin.reporting_period..")
         tab_sbase = self.base.by_module.pfin.reporting_period
-        df_sbase = self.fetch_table_df(tab_sbase)
+        key_list = ["asset_id", "fiscal_year", "period"]
+        df_sbase = self.fetch_table_keys_df(tab_sbase, key_list)
         # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
@@ -622,37 +1838,21 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info("Fetching data from Financial Modeling Prep...")
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.income_statement,
-            "symbol",
-            symbol=sym_list,
-            limit=PERIODS_TO_FETCH,
-            period="quarter",
-        )
+        if df_fmp is None:
+            logger.info("Fetching data from Financial Modeling Prep...")
+            df_fmp = self._fetch_fmp_table_df(
+                "reporting_period", sym_list, PERIODS_TO_FETCH
+            )
+        (_, fmp_rename) = self._fmp_table_endpoints["reporting_period"]
         df_fmp = utils.clean_empty_str_df(df_fmp)
-        df_fmp = df_fmp.rename({"symbol": "asset_id"})
+        df_fmp = df_fmp.rename(fmp_rename)
         df_fmp = df_fmp.with_columns(
             pl.col("asset_id")
             .replace(asset_map)
             .str.to_integer(strict=False)
             .alias("asset_id")
         )
-        df_fmp = df_fmp.with_columns(
-            pl.col("fiscal_year").str.to_integer(strict=False).alias("fiscal_year")
-        )
-        df_fmp = df_fmp.rename({"date": "end_date"})
-        df_fmp = df_fmp.with_columns(
-            pl.col("end_date").str.to_date(strict=False).alias("end_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("filing_date").str.to_date(strict=False).alias("filing_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date")
-            .str.to_datetime(strict=False, time_zone="UTC")
-            .alias("accepted_date")
-        )
+        df_fmp = self._set_dtype_df(tab_sbase, df_fmp)
 
         logger.info(
             "Create generic 'future' reporting periods for EPS & Rev estimates..."
@@ -663,6 +1863,7 @@ class PFinBackend(SBaseConn):
         )
         tmp_year_fut = self._tmp_year_fut
         tmp_period_fut = self._tmp_period_fut
+        fut_rows = []
         for asset_id in id_list:
             new_row = {
                 "asset_id": asset_id,
@@ -671,8 +1872,10 @@ class PFinBackend(SBaseConn):
                 "fiscal_year": tmp_year_fut,
                 "period": tmp_period_fut,
             }
-            df_row = pl.DataFrame(new_row)
-            df_fmp = pl.concat([df_fmp, df_row], how="diagonal")
+            fut_rows.append(new_row)
+        if fut_rows:
+            df_fut = self._set_dtype_df(tab_sbase, pl.DataFrame(fut_rows))
+            df_fmp = pl.concat([df_fmp, df_fut], how="diagonal_relaxed")
         # print(df_fmp)
 
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
@@ -682,7 +1885,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = ["asset_id", "fiscal_year", "period"]
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -697,13 +1899,14 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, "id", df_update)
         return
 
-    def update_table_income_statement(self, sym_list=None):
+    def update_table_income_statement(self, sym_list=None, years=None, df_fmp=None):
         """
         Fetch income-statement data from the FMP API.
         Insert new entries into SupaBase, otherwise update existing entries with
-        fresh data.
+        fresh data. df_fmp is the FMP data of sym_list when it was already
+        fetched (see _fetch_fmp_table_df).
         """
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         PERIODS_TO_FETCH = YEARS_TO_FETCH * 4
 
         logger.info("==== " * 16)
@@ -716,7 +1919,11 @@ class PFinBackend(SBaseConn):
         # print(df_rp_map)
 
         tab_sbase = self.base.by_module.pfin.income_statement
-        df_sbase = self.fetch_table_df(tab_sbase)
+        server_diff = self._use_server_diff(tab_sbase)
+        key_list = "reporting_period_id"
+        df_sbase = (
+            None if server_diff else self.fetch_table_keys_df(tab_sbase, key_list)
+        )
         # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
@@ -728,14 +1935,13 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info("Fetching income_statement data from Financial Modeling Prep...")
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.income_statement,
-            "symbol",
-            symbol=sym_list,
-            limit=PERIODS_TO_FETCH,
-            period="quarter",
-        )
+        if df_fmp is None:
+            logger.info(
+                "Fetching income_statement data from Financial Modeling Prep..."
+            )
+            df_fmp = self._fetch_fmp_table_df(
+                "income_statement", sym_list, PERIODS_TO_FETCH
+            )
         df_fmp = utils.clean_empty_str_df(df_fmp)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
         df_fmp = df_fmp.with_columns(
@@ -744,27 +1950,18 @@ class PFinBackend(SBaseConn):
             .str.to_integer(strict=False)
             .alias("asset_id")
         )
-        df_fmp = df_fmp.with_columns(
-            pl.col("fiscal_year").str.to_integer(strict=False).alias("fiscal_year")
-        )
         df_fmp = df_fmp.rename({"date": "end_date"})
-        df_fmp = df_fmp.with_columns(
-            pl.col("end_date").str.to_date(strict=False).alias("end_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("filing_date").str.to_date(strict=False).alias("filing_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date")
-            .str.to_datetime(strict=False, time_zone="UTC")
-            .alias("accepted_date")
-        )
+        df_fmp = self._set_dtype_df(tab_rp, df_fmp)
         uq_cols = ["asset_id", "fiscal_year", "period"]
         df_fmp = df_rp_map.join(df_fmp, on=uq_cols, how="inner")
         df_fmp = df_fmp.drop(uq_cols)
         df_fmp = df_fmp.rename({"id": "reporting_period_id"})
         # print(df_fmp['reporting_period_id'].to_list())
 
+        if server_diff:
+            self.sync_table_df(tab_sbase, key_list, df_fmp)
+            return
+
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
         (common_cols, df_old, df_new) = self._calc_common_cols_df(
             tab_sbase, df_sbase, df_fmp
@@ -772,7 +1969,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = "reporting_period_id"
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -785,13 +1981,16 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, key_list, df_update)
         return
 
-    def update_table_balance_sheet_statement(self, sym_list=None):
+    def update_table_balance_sheet_statement(
+        self, sym_list=None, years=None, df_fmp=None
+    ):
         """
         Fetch balance-sheet-statement data from the FMP API.
         Insert new entries into SupaBase, otherwise update existing entries with
-        fresh data.
+        fresh data. df_fmp is the FMP data of sym_list when it was already
+        fetched (see _fetch_fmp_table_df).
         """
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         PERIODS_TO_FETCH = YEARS_TO_FETCH * 4
 
         logger.info("==== " * 16)
@@ -805,7 +2004,11 @@ class PFinBackend(SBaseConn):
 
         logger.info("Figure out what's already in pfin.balance_sheet_statement..")
         tab_sbase = self.base.by_module.pfin.balance_sheet_statement
-        df_sbase = self.fetch_table_df(tab_sbase)
+        server_diff = self._use_server_diff(tab_sbase)
+        key_list = "reporting_period_id"
+        df_sbase = (
+            None if server_diff else self.fetch_table_keys_df(tab_sbase, key_list)
+        )
         # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
@@ -817,16 +2020,13 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info(
-            "Fetching balance_sheet_statement data from Financial Modeling Prep..."
-        )
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.balance_sheet_statement,
-            "symbol",
-            symbol=sym_list,
-            limit=PERIODS_TO_FETCH,
-            period="quarter",
-        )
+        if df_fmp is None:
+            logger.info(
+                "Fetching balance_sheet_statement data from Financial Modeling Prep..."
+            )
+            df_fmp = self._fetch_fmp_table_df(
+                "balance_sheet_statement", sym_list, PERIODS_TO_FETCH
+            )
         df_fmp = utils.clean_empty_str_df(df_fmp)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
         df_fmp = df_fmp.with_columns(
@@ -835,27 +2035,18 @@ class PFinBackend(SBaseConn):
             .str.to_integer(strict=False)
             .alias("asset_id")
         )
-        df_fmp = df_fmp.with_columns(
-            pl.col("fiscal_year").str.to_integer(strict=False).alias("fiscal_year")
-        )
         df_fmp = df_fmp.rename({"date": "end_date"})
-        df_fmp = df_fmp.with_columns(
-            pl.col("end_date").str.to_date(strict=False).alias("end_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("filing_date").str.to_date(strict=False).alias("filing_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date")
-            .str.to_datetime(strict=False, time_zone="UTC")
-            .alias("accepted_date")
-        )
+        df_fmp = self._set_dtype_df(tab_rp, df_fmp)
         uq_cols = ["asset_id", "fiscal_year", "period"]
         df_fmp = df_rp_map.join(df_fmp, on=uq_cols, how="inner")
         df_fmp = df_fmp.drop(uq_cols)
         df_fmp = df_fmp.rename({"id": "reporting_period_id"})
         # print(df_fmp['reporting_period_id'].to_list())
 
+        if server_diff:
+            self.sync_table_df(tab_sbase, key_list, df_fmp)
+            return
+
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
         (common_cols, df_old, df_new) = self._calc_common_cols_df(
             tab_sbase, df_sbase, df_fmp
@@ -863,7 +2054,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = "reporting_period_id"
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -876,13 +2066,14 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, key_list, df_update)
         return
 
-    def update_table_cash_flow_statement(self, sym_list=None):
+    def update_table_cash_flow_statement(self, sym_list=None, years=None, df_fmp=None):
         """
         Fetch cash-flow-statement data from the FMP API.
         Insert new entries into SupaBase, otherwise update existing entries with
-        fresh data.
+        fresh data. df_fmp is the FMP data of sym_list when it was already
+        fetched (see _fetch_fmp_table_df).
         """
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         PERIODS_TO_FETCH = YEARS_TO_FETCH * 4
 
         logger.info("==== " * 16)
@@ -896,7 +2087,11 @@ class PFinBackend(SBaseConn):
 
         logger.info("Figure out what's already in pfin.cash_flow_statement..")
         tab_sbase = self.base.by_module.pfin.cash_flow_statement
-        df_sbase = self.fetch_table_df(tab_sbase)
+        server_diff = self._use_server_diff(tab_sbase)
+        key_list = "reporting_period_id"
+        df_sbase = (
+            None if server_diff else self.fetch_table_keys_df(tab_sbase, key_list)
+        )
         # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
@@ -908,14 +2103,13 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info("Fetching cash_flow_statement data from Financial Modeling Prep...")
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.cash_flow_statement,
-            "symbol",
-            symbol=sym_list,
-            limit=PERIODS_TO_FETCH,
-            period="quarter",
-        )
+        if df_fmp is None:
+            logger.info(
+                "Fetching cash_flow_statement data from Financial Modeling Prep..."
+            )
+            df_fmp = self._fetch_fmp_table_df(
+                "cash_flow_statement", sym_list, PERIODS_TO_FETCH
+            )
         df_fmp = utils.clean_empty_str_df(df_fmp)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
         df_fmp = df_fmp.with_columns(
@@ -924,27 +2118,18 @@ class PFinBackend(SBaseConn):
             .str.to_integer(strict=False)
             .alias("asset_id")
         )
-        df_fmp = df_fmp.with_columns(
-            pl.col("fiscal_year").str.to_integer(strict=False).alias("fiscal_year")
-        )
         df_fmp = df_fmp.rename({"date": "end_date"})
-        df_fmp = df_fmp.with_columns(
-            pl.col("end_date").str.to_date(strict=False).alias("end_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("filing_date").str.to_date(strict=False).alias("filing_date")
-        )
-        df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date")
-            .str.to_datetime(strict=False, time_zone="UTC")
-            .alias("accepted_date")
-        )
+        df_fmp = self._set_dtype_df(tab_rp, df_fmp)
         uq_cols = ["asset_id", "fiscal_year", "period"]
         df_fmp = df_rp_map.join(df_fmp, on=uq_cols, how="inner")
         df_fmp = df_fmp.drop(uq_cols)
         df_fmp = df_fmp.rename({"id": "reporting_period_id"})
         # print(df_fmp['reporting_period_id'].to_list())
 
+        if server_diff:
+            self.sync_table_df(tab_sbase, key_list, df_fmp)
+            return
+
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
         (common_cols, df_old, df_new) = self._calc_common_cols_df(
             tab_sbase, df_sbase, df_fmp
@@ -952,7 +2137,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = "reporting_period_id"
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -965,11 +2149,12 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, key_list, df_update)
         return
 
-    def update_table_earning(self, sym_list=None):
+    def update_table_earning(self, sym_list=None, years=None, df_fmp=None):
         """
         Fetch earnings data from the FMP API.
         Insert new entries into SupaBase, otherwise update existing entries with
-        fresh data.
+        fresh data. df_fmp is the FMP data of sym_list when it was already
+        fetched (see _fetch_fmp_table_df).
 
         The alignment with reporting_period(s) needs to be handled uniquely, as the
         reference dates in earnings do not match the filing or accepted dates in
@@ -980,7 +2165,7 @@ class PFinBackend(SBaseConn):
         refernece dates.
         """
 
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         PERIODS_TO_FETCH = YEARS_TO_FETCH * 4
 
         logger.info("==== " * 16)
@@ -1010,7 +2195,11 @@ class PFinBackend(SBaseConn):
 
         logger.info("Figure out what's already in pfin.earning...")
         tab_sbase = self.base.by_module.pfin.earning
-        df_sbase = self.fetch_table_df(tab_sbase)
+        server_diff = self._use_server_diff(tab_sbase)
+        key_list = "reporting_period_id"
+        df_sbase = (
+            None if server_diff else self.fetch_table_keys_df(tab_sbase, key_list)
+        )
         # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
@@ -1022,13 +2211,9 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info("Fetching earning data from Financial Modeling Prep...")
-        df_fmp = self.fmp_client.fetch_fmp_list_df(
-            self.fmp_client.earnings,
-            "symbol",
-            symbol=sym_list,
-            limit=(PERIODS_TO_FETCH + 2),
-        )
+        if df_fmp is None:
+            logger.info("Fetching earning data from Financial Modeling Prep...")
+            df_fmp = self._fetch_fmp_table_df("earning", sym_list, PERIODS_TO_FETCH)
         df_fmp = utils.clean_empty_str_df(df_fmp)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
         df_fmp = df_fmp.rename({"date": "accepted_date"})
@@ -1038,12 +2223,16 @@ class PFinBackend(SBaseConn):
             .str.to_integer(strict=False)
             .alias("asset_id")
         )
+        # [richmosko]: the earnings date has no time of day
         df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date").str.to_date(strict=False).alias("ref_date")
+            pl.col("accepted_date")
+            .str.to_date(FMP_DATE_FORMAT, strict=False)
+            .alias("ref_date")
         )
         df_fmp = df_fmp.with_columns(
-            pl.col("accepted_date")
-            .str.to_datetime(strict=False, time_zone="UTC")
+            pl.col("ref_date")
+            .cast(pl.Datetime("us"))
+            .dt.replace_time_zone("UTC")
             .alias("accepted_date")
         )
         df_fmp = df_fmp.with_columns(pl.lit(None).alias("reporting_period_id"))
@@ -1122,6 +2311,10 @@ class PFinBackend(SBaseConn):
         )
         # print(df_fmp)
 
+        if server_diff:
+            self.sync_table_df(tab_sbase, key_list, df_fmp)
+            return
+
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
         (common_cols, df_old, df_new) = self._calc_common_cols_df(
             tab_sbase, df_sbase, df_fmp
@@ -1129,7 +2322,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = "reporting_period_id"
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -1142,23 +2334,20 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, key_list, df_update)
         return
 
-    def update_table_eod_price(self, sym_list=None):
+    def update_table_eod_price(self, sym_list=None, years=None):
         """
         Fetch end of day price data from the FMP API.
         Insert new entries into SupaBase, otherwise update existing entries with
         fresh data in case the historical data was revised.
         """
 
-        YEARS_TO_FETCH = 5
+        YEARS_TO_FETCH = years or self._years_to_fetch
         DAYS_TO_FETCH = YEARS_TO_FETCH * 365
+        TRADING_DAYS_TO_FETCH = YEARS_TO_FETCH * 252
 
         logger.info("==== " * 16)
         logger.info("==== Updating pfin.eod_price Table")
-
-        logger.info("Figure out what's already in pfin.eod_price...")
         tab_sbase = self.base.by_module.pfin.eod_price
-        df_sbase = self.fetch_table_df(tab_sbase)
-        # print(df_sbase)
 
         logger.info("Generating a set of symbols to fetch from FMP...")
         asset_map = self._fetch_asset_map_chart()
@@ -1169,14 +2358,51 @@ class PFinBackend(SBaseConn):
         sym_list = list(asset_map.keys())
         # print(asset_map)
 
-        logger.info("Fetching EOD historical data from Financial Modeling Prep...")
         date_5y_ago = datetime.now() - timedelta(days=DAYS_TO_FETCH)
         date_5y_ago = date_5y_ago.strftime("%Y-%m-%d")
+        batches = self._plan_mem_batches(tab_sbase, sym_list, TRADING_DAYS_TO_FETCH)
+        batches = [{sym: asset_map[sym] for sym in batch} for batch in batches]
+
+        def fetch_batch(batch_map):
+            return self._fetch_eod_price_batch(tab_sbase, batch_map, date_5y_ago)
+
+        def write_batch(batch_map, df_fmp):
+            self._write_eod_price_batch(tab_sbase, batch_map, df_fmp)
+
+        if self.pipeline is not None:
+            self.pipeline.run(batches, fetch_batch, write_batch)
+            return
+        for batch_map in batches:
+            write_batch(batch_map, fetch_batch(batch_map))
+        return
+
+    def _fetch_eod_price_batch(self, tab_sbase, asset_map, start_date, end_date=None):
+        """
+        Fetch stage of a pfin.eod_price batch (see update_table_eod_price):
+        the FMP rows of the batch's symbols, keyed and typed like the table.
+
+        args:
+            tab_sbase:     reflected pfin.eod_price table
+            asset_map:     dictionary of symbol -> asset_id for the batch
+            start_date:    first date to fetch ('yyyy-mm-dd')
+            end_date:      (optional) last date to fetch ('yyyy-mm-dd')
+
+        returns:
+            df_fmp:        polars dataframe of the batch's FMP rows
+        """
+        sym_list = list(asset_map.keys())
+
+        logger.info("Fetching EOD historical data from Financial Modeling Prep...")
+        fmp_rename = {"symbol": "asset_id", "date": "end_date"}
+        date_range = {"start_date": start_date}
+        if end_date is not None:
+            date_range["end_date"] = end_date
         df_fmp = self.fmp_client.fetch_fmp_list_df(
             self.fmp_client.historical_full,
             "symbol",
+            columns=self._fmp_columns(tab_sbase, fmp_rename),
             symbol=sym_list,
-            start_date=date_5y_ago,
+            **date_range,
         )
         df_fmp = utils.clean_empty_str_df(df_fmp)
         df_fmp = df_fmp.rename({"symbol": "asset_id"})
@@ -1188,9 +2414,35 @@ class PFinBackend(SBaseConn):
         )
         df_fmp = df_fmp.rename({"date": "end_date"})
         df_fmp = df_fmp.with_columns(
-            pl.col("end_date").str.to_date(strict=False).alias("end_date")
+            pl.col("end_date")
+            .str.to_date(FMP_DATE_FORMAT, strict=False)
+            .alias("end_date")
         )
         # print(df_fmp)
+        return df_fmp
+
+    def _write_eod_price_batch(self, tab_sbase, asset_map, df_fmp):
+        """
+        Write stage of a pfin.eod_price batch (see update_table_eod_price): diff
+        the fetched rows against the table and insert/update them. Only the
+        table rows of the batch's assets are read from the database.
+
+        args:
+            tab_sbase:     reflected pfin.eod_price table
+            asset_map:     dictionary of symbol -> asset_id for the batch
+            df_fmp:        polars dataframe from _fetch_eod_price_batch
+        """
+        id_list = list(asset_map.values())
+        key_list = ["asset_id", "end_date"]
+        if self._use_server_diff(tab_sbase):
+            self.sync_table_df(tab_sbase, key_list, df_fmp)
+            return
+
+        logger.info("Figure out what's already in pfin.eod_price...")
+        df_sbase = self.fetch_table_keys_df(
+            tab_sbase, key_list, where=tab_sbase.__table__.c.asset_id.in_(id_list)
+        )
+        # print(df_sbase)
 
         logger.info("Merging columns to (inner join) to limit what gets sent to DB...")
         (common_cols, df_old, df_new) = self._calc_common_cols_df(
@@ -1199,7 +2451,6 @@ class PFinBackend(SBaseConn):
         # print(common_cols)
 
         logger.info("Determining entries to insert...")
-        key_list = ["asset_id", "end_date"]
         df_insert = self._isolate_new_rows_df(key_list, df_old, df_new)
         logger.info(f"Rows to insert:\n{df_insert}")
 
@@ -1214,6 +2465,239 @@ class PFinBackend(SBaseConn):
         self.update_table_df(tab_sbase, "id", df_update)
         return
 
+    def _use_server_diff(self, tab_sbase):
+        """
+        Whether to sync a table with the server side diff (see sync_table_df)
+        instead of reading it and diffing in polars. Set per table with the
+        PFIN_SERVER_DIFF env variable.
+        """
+        t_name = tab_sbase.__table__.name
+        return (
+            t_name in self._server_diff_tables and t_name in self._server_diff_capable
+        )
+
+    def _plan_mem_batches(self, tab_sbase, sym_list, rows_per_sym):
+        """
+        Split sym_list into batches whose projected frame sizes fit in the memory
+        budget (PFIN_MEM_BUDGET_MB). The projection assumes a sync holds
+        _mem_frame_copies copies of the rows (table snapshot, API frame, diff
+        projections and join results) at the same time. In pipeline mode the
+        batches are also capped at PFIN_PIPELINE_BATCH symbols, and the API
+        frames of the batches fetched ahead count against the budget too.
+        Only eod_price is planned this way: the statement syncs hold a few
+        quarters per symbol, and their reporting_period / key reads don't
+        shrink with smaller batches.
+
+        args:
+            tab_sbase:     reflected table being synced
+            sym_list:      list of symbols to sync
+            rows_per_sym:  expected number of table rows per symbol
+
+        returns:
+            batches:       list of symbol lists (one batch without a budget or
+                           a pipeline)
+        """
+        if not sym_list:
+            return [sym_list]
+        batch_size = len(sym_list)
+        if self.pipeline is not None:
+            batch_size = min(batch_size, self._pipeline_batch)
+        if self._mem_budget_bytes:
+            row_bytes = utils.estimate_row_bytes(self.get_table_schema(tab_sbase))
+            copies = self._mem_frame_copies
+            if self.pipeline is not None:
+                copies += self.pipeline.depth + 1  # queued and fetching batches
+            sym_bytes = rows_per_sym * row_bytes * copies
+            batch_size = min(
+                batch_size, max(int(self._mem_budget_bytes // sym_bytes), 1)
+            )
+            logger.info(
+                f"Memory budget {self._mem_budget_bytes / 2**20:.0f} MiB: projected "
+                f"{len(sym_list) * sym_bytes / 2**20:.0f} MiB"
+            )
+        batches = [
+            sym_list[idx : idx + batch_size]
+            for idx in range(0, len(sym_list), batch_size)
+        ]
+        if len(batches) > 1:
+            logger.info(
+                f"Syncing {len(batches)} batch(es) of up to {batch_size} symbol(s)"
+            )
+        return batches
+
+    def plan_statement_refresh(self, sym_list=None, full_sweep=None, asset_map=None):
+        """
+        Plan which symbols need their financial statements (reporting_period,
+        income, balance sheet, and cash flow) refreshed. Companies only file new
+        statements four times a year, so the nightly job only needs the symbols
+        that reported recently or are due to report:
+            - symbols on the FMP earnings calendar inside the refresh window
+            - symbols with an expected report date (pfin.earning.ref_date) inside
+              the refresh window
+            - symbols that filed (reporting_period.accepted_date) inside the
+              lookback window, to pick up late FMP data and restatements
+            - symbols with no filings yet, or whose last filing is overdue
+
+        args:
+            sym_list:      (optional) list of symbols to limit the plan to
+            full_sweep:    (optional) True returns every symbol. When set to None
+                           the full sweep runs on self._refresh_full_sweep_weekday
+            asset_map:     (optional) symbol -> asset_id map of the assets with
+                           financials, when the caller already fetched it
+
+        returns:
+            plan_list:     list of symbols to refresh
+        """
+        logger.info("==== " * 16)
+        logger.info("==== Planning financial statement refresh")
+        if asset_map is None:
+            asset_map = self._fetch_asset_map_financials()
+        if sym_list:
+            # [richmosko]: Only use subset of symbols
+            asset_map = {sym: asset_map[sym] for sym in sym_list}
+
+        today = date.today()
+        if full_sweep is None:
+            full_sweep = today.weekday() == self._refresh_full_sweep_weekday
+        if full_sweep:
+            logger.info(f"Full sweep: refreshing all {len(asset_map)} symbol(s)...")
+            return list(asset_map.keys())
+
+        start_date = today - timedelta(days=self._refresh_lookback_days)
+        end_date = today + timedelta(days=self._refresh_lookahead_days)
+
+        logger.info(f"Fetching earnings calendar from {start_date} to {end_date}...")
+        df_cal = self.fmp_client.get_earnings_calendar(
+            start_date.isoformat(), end_date.isoformat()
+        )
+        cal_syms = set(df_cal["symbol"].to_list()) if "symbol" in df_cal else set()
+
+        logger.info("Figure out the latest filings in pfin.reporting_period...")
+        tab_rp = self.base.by_module.pfin.reporting_period
+        stmt = sqla.select(tab_rp.asset_id, tab_rp.accepted_date)
+        df_rp = pl.DataFrame(
+            self._fetch_sbase_ldict(stmt),
+            schema={"asset_id": pl.Int64, "accepted_date": pl.Datetime("us", "UTC")},
+        )
+
+        logger.info("Figure out the expected report dates in pfin.earning...")
+        tab_earn = self.base.by_module.pfin.earning
+        stmt = (
+            sqla.select(tab_rp.asset_id, tab_earn.ref_date)
+            .join(tab_rp, tab_earn.reporting_period_id == tab_rp.id)
+            .where(tab_earn.ref_date.between(start_date, end_date))
+        )
+        df_earn = pl.DataFrame(
+            self._fetch_sbase_ldict(stmt),
+            schema={"asset_id": pl.Int64, "ref_date": pl.Date},
+        )
+
+        plan_list = self._select_refresh_symbols(
+            asset_map, cal_syms, df_rp, df_earn, today
+        )
+        logger.info(
+            f"Refreshing statements for {len(plan_list)} of {len(asset_map)} symbol(s)"
+        )
+        return plan_list
+
+    def _select_refresh_symbols(self, asset_map, cal_syms, df_rp, df_earn, today):
+        """
+        Select the symbols due for a financial statement refresh (see
+        self.plan_statement_refresh for the rules).
+
+        args:
+            asset_map:     dictionary of symbol(s) and mapped asset_id(s)
+            cal_syms:      set of symbols on the FMP earnings calendar
+            df_rp:         polars dataframe of reporting_period asset_id(s) and
+                           accepted_date(s)
+            df_earn:       polars dataframe of asset_id(s) with an expected
+                           report date (ref_date) inside the refresh window
+            today:         reference date for the refresh window
+
+        returns:
+            plan_list:     list of symbols to refresh (in asset_map order)
+        """
+        tmp_year_fut = self._tmp_year_fut
+        lookback = datetime.combine(
+            today - timedelta(days=self._refresh_lookback_days),
+            datetime.min.time(),
+            tzinfo=timezone.utc,
+        )
+        overdue = datetime.combine(
+            today - timedelta(days=self._refresh_overdue_days),
+            datetime.min.time(),
+            tzinfo=timezone.utc,
+        )
+
+        # [richmosko]: ignore the placeholder 'future' reporting periods
+        df_latest = (
+            df_rp.filter(pl.col("accepted_date").dt.year() < tmp_year_fut)
+            .group_by("asset_id")
+            .agg(pl.col("accepted_date").max())
+        )
+        latest_rpt = dict(df_latest.iter_rows())
+        due_ids = set(df_earn["asset_id"].to_list())
+
+        plan_list = []
+        for sym, asset_id in asset_map.items():
+            latest = latest_rpt.get(asset_id)
+            if (
+                sym in cal_syms
+                or asset_id in due_ids
+                or latest is None
+                or latest >= lookback
+                or latest < overdue
+            ):
+                plan_list.append(sym)
+        return plan_list
+
+    def _fetch_fmp_table_df(self, table, sym_list, periods):
+        """
+        Fetch the FMP data of a statement table (or earning) for a list of
+        symbols: the API side of update_table_<table>, so a backfill can fetch
+        the next chunk while the last one is written
+
+        args:
+            table:         reporting_period, a statement table or earning
+            sym_list:      list of symbols
+            periods:       number of (most recent) quarters
+
+        returns:
+            df_fmp:        polars dataframe of the FMP rows
+        """
+        if table == "earning":
+            return self.fmp_client.fetch_fmp_list_df(
+                self.fmp_client.earnings,
+                "symbol",
+                symbol=sym_list,
+                limit=(periods + 2),
+            )
+        (fmp_func, fmp_rename) = self._fmp_table_endpoints[table]
+        tab_sbase = getattr(self.base.by_module.pfin, table)
+        return self.fmp_client.get_statements(
+            getattr(self.fmp_client, fmp_func),
+            sym_list,
+            periods,
+            columns=self._fmp_columns(tab_sbase, fmp_rename),
+        )
+
+    def _fmp_columns(self, tab_sbase, rename=None):
+        """
+        Get the FMP (snake_case) field names that end up in the columns of a
+        table, so the FMP decode step can skip every other field.
+
+        args:
+            tab_sbase:     reflected sqlalchemy table the FMP data is headed to
+            rename:        (optional) dictionary of FMP field -> table column
+
+        returns:
+            columns:       set of FMP field names
+        """
+        fmp_names = {col: fmp for fmp, col in (rename or {}).items()}
+        tab_cols = tab_sbase.__table__.columns.keys()
+        columns = {fmp_names.get(col, col) for col in tab_cols}
+        return columns
+
     def _fetch_asset_map_financials(self):
         """
         Generate an asset => asset_id map (for items with financial statements)
@@ -1264,22 +2748,3 @@ class PFinBackend(SBaseConn):
             xid = item["id"]
             asset_map[sym] = xid
         return asset_map
-
-    def _set_dtype_df(self, tab_sbase, df_sbase):
-        """
-        Set the initial datatypes for columns in a polars dataframe from the
-        sqlalchemy reflected table.
-
-        args:
-            tab_sbase:     reflected sqlalchemy table
-            df_sbase:      polars dataframe of  ^^^^^ table
-
-        returns:
-            df_dtype:      schema corrected polars dataframe
-        """
-        # c_dict = pfb.get_column_dict(tab_sbase)
-        # df_schema = df_sbase.schema
-        logger.info("...TODO: METHOD NOT YET IMPLEMENTED...")
-        # TODO: Creating a big case statement for all the data types is a big
-        #       undertaking... Not urgent to impleent this right away.
-        return None
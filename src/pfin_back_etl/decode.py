@@ -0,0 +1,135 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Optional process pool for decoding the FMP JSON responses. Parsing the
+    JSON, building the frame and renaming its columns to snake_case all hold
+    the GIL, so with the fetches overlapped (see pipeline.py) they become the
+    bottleneck of one interpreter.
+
+    Workers get the raw response bytes and hand the decoded frame back as one
+    Arrow IPC buffer, so no python objects are pickled between the processes
+    (only two flat byte strings). Small responses are decoded inline, where
+    the round trip would cost more than the decode.
+"""
+
+# library imports
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import polars as pl
+
+from pfin_back_etl import utils
+
+logger = logging.getLogger("pfin_etl")
+
+
+def json_to_df(data, columns=None):
+    """
+    Build a dataframe from a decoded FMP JSON response, with snake_case columns
+
+    args:
+        data:              decoded JSON (list of records, or one record)
+        columns:           (optional) snake_case fields to keep. The rest of
+                           the response is never materialized
+
+    returns:
+        df:                polars dataframe
+    """
+    if columns is not None and isinstance(data, list) and data:
+        # [richmosko]: FMP leaves out null fields, so records can differ in keys
+        keys = dict.fromkeys(itertools.chain.from_iterable(data))
+        col_dict = utils.col_to_snake(keys)
+        raw_cols = [col for col, snake in col_dict.items() if snake in columns]
+        df = pl.DataFrame(data, schema=raw_cols)
+    else:
+        df = pl.DataFrame(data)
+    return df.rename(utils.col_to_snake(df.columns))
+
+
+def _decode_ipc(content, columns):
+    # [richmosko]: runs in the worker processes
+    df = json_to_df(json.loads(content), columns)
+    buf = io.BytesIO()
+    df.write_ipc(buf)
+    return buf.getvalue()
+
+
+class DecodePool:
+    """
+    Pool of worker processes decoding JSON responses to polars dataframes
+    """
+
+    def __init__(self, workers, min_bytes=64 * 1024):
+        """
+        Class initializer...
+
+        args:
+            workers:       number of worker processes
+            min_bytes:     responses smaller than this are decoded inline
+        """
+        self.workers = max(int(workers), 1)
+        self.min_bytes = min_bytes
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        # [richmosko]: spawn, as forking a process running polars (and the
+        #              pipeline threads) can deadlock
+        self._executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def wants(self, content):
+        """
+        Whether a response is large enough to be decoded by the workers
+        """
+        return len(content) >= self.min_bytes
+
+    def submit(self, content, columns=None):
+        """
+        Decode a JSON response in a worker process
+
+        args:
+            content:       raw response bytes
+            columns:       (optional) snake_case fields to keep
+
+        returns:
+            result:        function returning the decoded polars dataframe
+                           (waits for the worker)
+        """
+        future = self._executor.submit(
+            _decode_ipc, content, set(columns) if columns else None
+        )
+        with self._lock:
+            self.stats["jobs"] += 1
+            self.stats["json_bytes"] += len(content)
+
+        def result():
+            ipc = future.result()
+            with self._lock:
+                self.stats["ipc_bytes"] += len(ipc)
+            return pl.read_ipc(io.BytesIO(ipc))
+
+        return result
+
+    def shutdown(self):
+        """
+        Stop the worker processes
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def summary(self):
+        """
+        Pool statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        with self._lock:
+            return {"workers": self.workers, **dict(self.stats)}
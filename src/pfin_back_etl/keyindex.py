@@ -0,0 +1,181 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Key-only index of the synced tables. Routing the API rows of a sync to
+    inserts or updates only needs the key columns of the table (ie: asset_id
+    and end_date) and the surrogate id, not the full rows. The index keeps
+    those columns per table, sorted by key, in memory and in a local Parquet
+    file so it is kept across runs. Lookups are polars hash joins against it.
+
+    Before use, an index is checked against count(*) and max(id). Rows past
+    its max(id) are read incrementally; any other mismatch reloads the keys
+    of the whole table (still a narrow read). Tables without an id aren't
+    indexed (count(*) alone misses a delete followed by an insert), and a
+    filtered lookup with no index loaded reads only its rows, with the
+    filter in the database.
+"""
+
+# library imports
+import json
+import logging
+import os
+import threading
+from collections import Counter
+
+import polars as pl
+import sqlalchemy as sqla
+
+logger = logging.getLogger("pfin_etl")
+
+
+class KeyIndex:
+    """
+    Key (and id) columns of database tables, refreshed by max(id). Thread safe.
+    """
+
+    def __init__(self, engine, index_dir=None):
+        """
+        Class initializer...
+
+        args:
+            engine:        sqlalchemy engine of the indexed database
+            index_dir:     (optional) directory to keep the indexes across runs.
+                           In memory only (this process) when None
+        """
+        self.engine = engine
+        self.index_dir = index_dir
+        self.stats = Counter()
+        self._indexes = {}  # table name -> (key columns, stats, df_keys)
+        self._lock = threading.Lock()
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+
+    def lookup(self, tab, key_list, schema, where=None, expr=None):
+        """
+        Get the key columns of a table, from its index when it has one
+
+        args:
+            tab:           sqlalchemy Table object
+            key_list:      list of key columns
+            schema:        dictionary of column names -> polars data types
+            where:         (optional) sqlalchemy condition (ie: asset_id in
+                           the batch)
+            expr:          (optional) the same filter as a polars expression,
+                           to filter an index already loaded
+
+        returns:
+            df_keys:       polars dataframe of the key columns (and id), sorted
+                           by key
+        """
+        cols = self.index_columns(tab, key_list)
+        if "id" not in tab.c:
+            self.stats["unindexed_reads"] += 1
+            return self._read_db(tab, cols, schema, where).sort(cols)
+        if where is None or expr is not None:
+            with self._lock:
+                df_keys = self._refresh(tab, cols, schema, reload=where is None)
+            if df_keys is not None:
+                return df_keys if expr is None else df_keys.filter(expr)
+        # [richmosko]: don't load the keys of the whole table for a few assets
+        self.stats["filtered_reads"] += 1
+        return self._read_db(tab, cols, schema, where).sort(cols)
+
+    @staticmethod
+    def index_columns(tab, key_list):
+        """
+        Columns kept in the index of a table: the keys, plus the id
+        """
+        if not isinstance(key_list, list):
+            key_list = [key_list]
+        cols = list(key_list)
+        if "id" in tab.c and "id" not in cols:
+            cols.append("id")
+        return cols
+
+    def summary(self):
+        """
+        Index statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        with self._lock:
+            tables = {
+                name: len(entry[2]) for name, entry in self._indexes.items() if entry
+            }
+            return {**dict(self.stats), "rows": tables}
+
+    def _refresh(self, tab, cols, schema, reload=True):
+        entry = self._indexes.get(tab.fullname)
+        if entry is None:
+            entry = self._indexes[tab.fullname] = self._load(tab)
+        if entry is None or entry[0] != cols:
+            return self._reload(tab, cols, schema) if reload else None
+        (_, stats, df_keys) = entry
+        db_stats = self._db_stats(tab)
+        if stats == db_stats:
+            self.stats["hits"] += 1
+            return df_keys
+        max_id = stats["max_id"] or 0
+        if (db_stats["max_id"] or 0) > max_id:
+            df_new = self._read_db(tab, cols, schema, tab.c.id > max_id)
+            df_keys = pl.concat([df_keys, df_new.cast(df_keys.schema)])
+            if self._frame_stats(df_keys) == db_stats:
+                self.stats["increments"] += 1
+                self.stats["increment_rows"] += len(df_new)
+                return self._store(tab, cols, df_keys.sort(cols))
+        logger.info(f"Key index of {tab.name} is stale: {stats} vs {db_stats}")
+        return self._reload(tab, cols, schema) if reload else None
+
+    def _reload(self, tab, cols, schema):
+        df_keys = self._read_db(tab, cols, schema)
+        self.stats["reloads"] += 1
+        self.stats["reload_rows"] += len(df_keys)
+        return self._store(tab, cols, df_keys.sort(cols))
+
+    def _read_db(self, tab, cols, schema, where=None):
+        stmt = sqla.select(*[tab.c[col] for col in cols])
+        if where is not None:
+            stmt = stmt.where(where)
+        overrides = {col: schema[col] for col in cols if col in schema}
+        with self.engine.connect() as conn:
+            return pl.read_database(stmt, conn, schema_overrides=overrides)
+
+    def _db_stats(self, tab):
+        stmt = sqla.select(
+            sqla.func.count().label("rows"), sqla.func.max(tab.c.id).label("max_id")
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(stmt.select_from(tab)).one()._asdict()
+
+    @staticmethod
+    def _frame_stats(df_keys):
+        return {"rows": len(df_keys), "max_id": df_keys["id"].max()}
+
+    def _paths(self, tab):
+        base = os.path.join(self.index_dir, f"{tab.fullname}.keys")
+        return (f"{base}.parquet", f"{base}.json")
+
+    def _load(self, tab):
+        if not self.index_dir:
+            return None
+        (path, meta_path) = self._paths(tab)
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return (meta["columns"], meta["stats"], pl.read_parquet(path))
+
+    def _store(self, tab, cols, df_keys):
+        stats = self._frame_stats(df_keys)
+        self._indexes[tab.fullname] = (cols, stats, df_keys)
+        if self.index_dir:
+            (path, meta_path) = self._paths(tab)
+            df_keys.write_parquet(f"{path}.tmp")
+            with open(f"{meta_path}.tmp", "w") as f:
+                json.dump({"columns": cols, "stats": stats}, f, indent=2)
+            os.replace(f"{path}.tmp", path)
+            os.replace(f"{meta_path}.tmp", meta_path)
+        return df_keys
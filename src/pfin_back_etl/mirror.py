@@ -0,0 +1,336 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Optional write-through local Parquet mirror of the synced tables. Every
+    update_table_* starts with a snapshot of its target table... with a mirror
+    the snapshot is read from a local (memory mapped) Parquet file instead of
+    pulled over the network, and the rows this ETL inserts and updates are
+    written through to the file.
+
+    Before a mirror is used it is validated against the database with cheap
+    aggregates (row count, max(id), max(updated_at) where the columns exist)
+    and the reflected column names. A mirror that is only missing new rows
+    (ie: the ids the database assigned to this ETL's inserts) catches up by
+    reading the rows past its max(id). Any other mismatch triggers a full
+    resync of the table. Updates by other writers that keep those aggregates
+    unchanged can't be detected, so the mirror assumes this ETL is the only
+    writer.
+"""
+
+# library imports
+import json
+import logging
+import operator
+import os
+import threading
+from collections import Counter
+
+import polars as pl
+import sqlalchemy as sqla
+from sqlalchemy.sql import elements, operators
+
+logger = logging.getLogger("pfin_etl")
+
+# [richmosko]: sqlalchemy comparison operators the mirror can filter with
+_COMPARE_OPS = {
+    operators.eq: operator.eq,
+    operators.ne: operator.ne,
+    operators.lt: operator.lt,
+    operators.le: operator.le,
+    operators.gt: operator.gt,
+    operators.ge: operator.ge,
+}
+
+
+def where_to_expr(where):
+    """
+    Translate a (simple) sqlalchemy where clause to a polars expression.
+    Handles column comparisons and IN lists against literal values, joined
+    with AND.
+
+    args:
+        where:             sqlalchemy condition (ie: tab.c.asset_id.in_(ids))
+
+    returns:
+        expr:              polars expression (None if it can't be translated)
+    """
+    if isinstance(where, elements.BooleanClauseList):
+        if where.operator is not operators.and_:
+            return None
+        expr_list = [where_to_expr(clause) for clause in where.clauses]
+        if not expr_list or any(expr is None for expr in expr_list):
+            return None
+        return pl.all_horizontal(expr_list)
+    if not (
+        isinstance(where, elements.BinaryExpression)
+        and isinstance(where.left, sqla.Column)
+        and isinstance(where.right, elements.BindParameter)
+    ):
+        return None
+    col = pl.col(where.left.name)
+    value = where.right.effective_value
+    if where.operator is operators.in_op:
+        return col.is_in(list(value))
+    if where.operator in _COMPARE_OPS:
+        return _COMPARE_OPS[where.operator](col, value)
+    return None
+
+
+def _stat_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _align_df(df, schema):
+    """
+    Select and cast the columns of df to a mirror schema (missing columns
+    become nulls)
+    """
+    expr_list = []
+    for col, dtype in schema.items():
+        if col in df.columns:
+            expr_list.append(pl.col(col).cast(dtype, strict=False))
+        else:
+            expr_list.append(pl.lit(None, dtype=dtype).alias(col))
+    return df.select(expr_list)
+
+
+class TableMirror:
+    """
+    Directory of Parquet files (one per table) mirroring database tables.
+    Thread safe.
+    """
+
+    def __init__(self, mirror_dir, engine):
+        """
+        Class initializer...
+
+        args:
+            mirror_dir:    directory of the Parquet files (created if missing)
+            engine:        sqlalchemy engine of the mirrored database
+        """
+        self.mirror_dir = mirror_dir
+        self.engine = engine
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(mirror_dir, exist_ok=True)
+
+    def fetch(self, tab, schema, where=None):
+        """
+        Read a table (snapshot) from the mirror, resyncing it from the
+        database first if it fails validation
+
+        args:
+            tab:           sqlalchemy Table object
+            schema:        dictionary of column names -> polars data types
+            where:         (optional) sqlalchemy condition to only read some rows
+
+        returns:
+            df_tab:        polars dataframe of the table rows (None if the
+                           where clause can't be evaluated on the mirror)
+        """
+        expr = None
+        if where is not None:
+            expr = where_to_expr(where)
+            if expr is None:
+                self.stats["unsupported"] += 1
+                return None
+        with self._lock:
+            (path, _) = self._paths(tab)
+            (status, db_stats) = self._validate(tab)
+            if status == "behind":
+                status = self._catch_up(tab, schema, db_stats)
+            if status == "valid":
+                self.stats["hits"] += 1
+                if expr is None:
+                    return pl.read_parquet(path, memory_map=True)
+                return pl.scan_parquet(path).filter(expr).collect()
+            df_tab = self._resync(tab, schema)
+        return df_tab if expr is None else df_tab.filter(expr)
+
+    def apply_insert(self, tab, schema, df_insert):
+        """
+        Write inserted rows through to the mirror. Rows of tables with an id
+        column are left for the next fetch to catch up on, as only the
+        database knows the ids (and defaults) it assigned.
+        """
+        if "id" in tab.c:
+            return
+        with self._lock:
+            df_mirror = self._read(tab)
+            if df_mirror is None:
+                return
+            try:
+                if self._has_defaults(tab, df_insert.columns):
+                    self._drop(tab, "insert relies on column defaults")
+                    return
+                df_new = _align_df(df_insert, df_mirror.schema)
+                self._write(tab, pl.concat([df_mirror, df_new]))
+                self.stats["inserts"] += len(df_new)
+            except Exception as exc:
+                self._drop(tab, f"insert write-through failed ({exc})")
+
+    def apply_update(self, tab, key_list, df_update):
+        """
+        Write updated rows through to the mirror (matched on key_list)
+        """
+        if not isinstance(key_list, list):
+            key_list = [key_list]
+        with self._lock:
+            df_mirror = self._read(tab)
+            if df_mirror is None:
+                return
+            try:
+                cols = [col for col in df_mirror.columns if col in df_update.columns]
+                df_upd = df_update.select(cols).cast(
+                    {col: df_mirror.schema[col] for col in cols}, strict=False
+                )
+                df_mirror = df_mirror.update(
+                    df_upd, on=key_list, how="left", include_nulls=True
+                )
+                self._write(tab, df_mirror)
+                self.stats["updates"] += len(df_update)
+            except Exception as exc:
+                self._drop(tab, f"update write-through failed ({exc})")
+
+    def invalidate(self, tab, reason):
+        """
+        Drop the mirror of a table (ie: after a write that can't be written
+        through). It is resynced on the next fetch.
+        """
+        with self._lock:
+            self._drop(tab, reason)
+
+    def summary(self):
+        """
+        Mirror statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        return {"dir": self.mirror_dir, **dict(self.stats)}
+
+    def _paths(self, tab):
+        name = f"{tab.schema}.{tab.name}" if tab.schema else tab.name
+        base = os.path.join(self.mirror_dir, name)
+        return (f"{base}.parquet", f"{base}.json")
+
+    def _read(self, tab):
+        (path, meta_path) = self._paths(tab)
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            return None
+        return pl.read_parquet(path, memory_map=False)
+
+    def _read_db(self, tab, schema, where=None):
+        stmt = sqla.select(tab)
+        if where is not None:
+            stmt = stmt.where(where)
+        with self.engine.connect() as conn:
+            return pl.read_database(stmt, conn, schema_overrides=schema)
+
+    def _db_stats(self, tab):
+        aggs = [sqla.func.count().label("rows")]
+        for col in ("id", "updated_at"):
+            if col in tab.c:
+                aggs.append(sqla.func.max(tab.c[col]).label(f"max_{col}"))
+        with self.engine.connect() as conn:
+            row = conn.execute(sqla.select(*aggs).select_from(tab)).one()
+        return {key: _stat_value(value) for key, value in row._asdict().items()}
+
+    @staticmethod
+    def _frame_stats(tab, df):
+        stats = {"rows": len(df)}
+        for col in ("id", "updated_at"):
+            if col in tab.c:
+                stats[f"max_{col}"] = _stat_value(df[col].max())
+        return stats
+
+    @staticmethod
+    def _has_defaults(tab, columns):
+        return any(
+            col.default is not None or col.server_default is not None
+            for col in tab.columns
+            if col.name not in columns
+        )
+
+    def _validate(self, tab):
+        """
+        Compare the mirror of a table against the database
+
+        returns:
+            status:        'valid', 'behind' (only missing rows past max(id)),
+                           'stale' or 'missing'
+            db_stats:      the database aggregates (None if 'missing')
+        """
+        (path, meta_path) = self._paths(tab)
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            return ("missing", None)
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("columns") != list(tab.c.keys()):
+            logger.info(f"Mirror of {tab.name} has different columns...")
+            return ("stale", None)
+        db_stats = self._db_stats(tab)
+        stats = meta.get("stats") or {}
+        if stats == db_stats:
+            return ("valid", db_stats)
+        if (
+            "max_id" in db_stats
+            and (db_stats["max_id"] or 0) > (stats.get("max_id") or 0)
+            and db_stats["rows"] > stats.get("rows", 0)
+        ):
+            return ("behind", db_stats)
+        logger.info(
+            f"Mirror of {tab.name} is stale: {stats} vs {db_stats} in the database..."
+        )
+        return ("stale", db_stats)
+
+    def _catch_up(self, tab, schema, db_stats):
+        """
+        Append the rows past the mirror's max(id)
+
+        returns:
+            status:        'valid' if the mirror now matches db_stats, else 'stale'
+        """
+        df_mirror = self._read(tab)
+        max_id = df_mirror["id"].max()
+        where = tab.c.id > max_id if max_id is not None else None
+        df_new = _align_df(self._read_db(tab, schema, where), df_mirror.schema)
+        df_mirror = pl.concat([df_mirror, df_new])
+        if self._frame_stats(tab, df_mirror) != db_stats:
+            logger.info(f"Mirror of {tab.name} is stale after catching up...")
+            return "stale"
+        self._write(tab, df_mirror)
+        self.stats["catch_ups"] += 1
+        self.stats["catch_up_rows"] += len(df_new)
+        return "valid"
+
+    def _resync(self, tab, schema):
+        logger.info(f"Resyncing the mirror of {tab.name} from the database...")
+        df_tab = self._read_db(tab, schema)
+        self._write(tab, df_tab)
+        self.stats["resyncs"] += 1
+        self.stats["resync_rows"] += len(df_tab)
+        return df_tab
+
+    def _write(self, tab, df_tab):
+        # [richmosko]: write to temp files and rename, so a crash mid-write
+        #              never leaves a mirror that looks valid
+        (path, meta_path) = self._paths(tab)
+        meta = {
+            "columns": list(tab.c.keys()),
+            "stats": self._frame_stats(tab, df_tab),
+        }
+        df_tab.write_parquet(f"{path}.tmp")
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(f"{path}.tmp", path)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _drop(self, tab, reason):
+        logger.warning(f"Dropping the mirror of {tab.name}: {reason}")
+        self.stats["invalidations"] += 1
+        for path in self._paths(tab):
+            if os.path.exists(path):
+                os.remove(path)
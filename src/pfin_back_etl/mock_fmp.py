@@ -0,0 +1,216 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Local mock of the Financial Modeling Prep HTTP API for tests and
+    benchmarks. Serves the deterministic payloads of synth.SynthFMP over real
+    HTTP, with optional per-request latency and jitter, HTTP 429 responses
+    above a calls per minute threshold, and random server failures. Point
+    PFinFMP at it with base_url=server.base_url (or PFIN_FMP_BASE_URL).
+
+    python -m pfin_back_etl.mock_fmp --port 8765 --symbols 1000 --latency 0.05
+"""
+
+# library imports
+import argparse
+import collections
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pfin_back_etl import synth
+
+logger = logging.getLogger("pfin_etl")
+
+
+class MockFMPServer:
+    """
+    Mock FMP API server (threaded, one thread per connection). Use it as a
+    context manager, or call start() and stop().
+    """
+
+    def __init__(
+        self,
+        synth_fmp=None,
+        latency=0.0,
+        jitter=0.0,
+        rate_limit=None,
+        rate_window=60.0,
+        failure_rate=0.0,
+        seed=0,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        Class initializer...
+
+        args:
+            synth_fmp:     SynthFMP payload generator. Defaults to 100 symbols
+            latency:       seconds added to every response
+            jitter:        (max) random seconds added on top of latency
+            rate_limit:    (optional) calls per rate_window above which the server
+                           answers HTTP 429 (rejected calls don't count)
+            rate_window:   rate limit window in seconds (60 = calls per minute)
+            failure_rate:  fraction (0-1) of calls answered with an HTTP 500
+            seed:          seed for the jitter and failure draws
+            host:          interface to listen on
+            port:          port to listen on (0 picks a free port)
+        """
+        self.synth_fmp = synth_fmp or synth.SynthFMP()
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = collections.deque()
+        self.stats = collections.Counter()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        (host, port) = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/stable/"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="mock-fmp", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"Mock FMP server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def serve_forever(self):
+        """
+        Serve from the calling thread until interrupted (Ctrl-C)
+        """
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, path, params):
+        """
+        Answer one request (after the injected latency)
+
+        args:
+            path:          request path (ie: /stable/income-statement)
+            params:        dictionary of query parameters
+
+        returns:
+            status:        HTTP status code
+            content_type:  response content type
+            body:          response body (bytes)
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.failure_rate
+            limited = self._rate_limited(time.monotonic())
+        if delay:
+            time.sleep(delay)
+
+        if "apikey" not in params:
+            return self._error(401, "Invalid API KEY.")
+        if limited:
+            with self._lock:
+                self.stats["status_429"] += 1
+            return self._error(429, "Limit Reach. Please upgrade your plan.")
+        if fail:
+            with self._lock:
+                self.stats["status_500"] += 1
+            return self._error(500, "Internal Server Error")
+        endpoint = path.strip("/").removeprefix("stable/")
+        return self.synth_fmp.respond(endpoint, params)
+
+    def _rate_limited(self, now):
+        if self.rate_limit is None:
+            return False
+        while self._calls and now - self._calls[0] >= self.rate_window:
+            self._calls.popleft()
+        if len(self._calls) >= self.rate_limit:
+            return True
+        self._calls.append(now)
+        return False
+
+    def _error(self, status, message):
+        body = json.dumps({"Error Message": message}).encode()
+        return (status, "application/json", body)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # no 40ms delayed ACK stalls
+
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                params = dict(urllib.parse.parse_qsl(url.query))
+                (status, content_type, body) = server.handle(url.path, params)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Mock FMP: {format % args}")
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock FMP API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=100, help="universe size")
+    parser.add_argument("--years", type=int, default=5, help="years of history")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic data seed")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--rate-limit", type=int, default=None, help="calls/min")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="0-1")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockFMPServer(
+        synth.SynthFMP(args.symbols, args.years, args.seed),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Serving mock FMP API at {server.base_url} (Ctrl-C to stop)")
+    server.serve_forever()
+    logger.info(f"Mock FMP server stats: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,686 @@
+"""
+Project:       pfin_back_etl
+Author:        Rich Mosko
+
+Description:
+    Lightweight run instrumentation. Records the wall time, rows and bytes of
+    each stage (fetch, read, diff, insert, update) of each table sync, and
+    writes them out as a JSON run report and an (optional) Prometheus textfile.
+    Also keeps per-endpoint API call accounting (counts, latency, bytes), and
+    an opt-in SQL statement tracer hooked into the sqlalchemy engine events.
+    Table syncs can also be profiled (cProfile or tracemalloc) per run, and
+    every stage records the process memory (RSS) when it ends.
+
+"""
+
+# library imports
+import cProfile
+import contextlib
+import functools
+import json
+import logging
+import math
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import sqlalchemy as sqla
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # [richmosko]: not available on Windows
+    resource = None
+
+logger = logging.getLogger("pfin_etl")
+
+# Normalizing SQL statements for aggregation (literals and batch suffixes out)
+_SQL_SPACE = re.compile(r"\s+")
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_BATCH_PARAM = re.compile(r"__\d+\)s")
+_SQL_TABLE = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|TABLE)\s+(?:ONLY\s+)?([\w.\"]+)", re.IGNORECASE
+)
+SQL_TEXT_LIMIT = 200
+
+# Stages recorded by the ETL... "transform" is whatever is left of the table
+# sync total after the other stages (the polars work in update_table_*). It is
+# left out when stages of the sync ran concurrently (ie: pipeline.Pipeline)
+STAGES = ["fetch", "read", "transform", "diff", "insert", "update", "sync"]
+
+
+class RunReport:
+    """
+    Run Report
+    Collects timing spans for one ETL run. Spans opened inside a sync(table)
+    block are attributed to that table.
+    """
+
+    def __init__(self):
+        """
+        Class initializer...
+        """
+        self.sections = {}
+        self.profiler = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all recorded spans and start a new run
+        """
+        self.started_at = datetime.now(timezone.utc)
+        self._t_start = time.perf_counter()
+        self.spans = []
+        self._table_stack = []
+
+    @property
+    def current_table(self):
+        """
+        Name of the table sync currently running (None outside of a sync)
+        """
+        return self._table_stack[-1] if self._table_stack else None
+
+    def add_section(self, name, func):
+        """
+        Register an extra section for the run report
+
+        args:
+            name:          key of the section in the JSON run report
+            func:          callable returning a JSON serializable dictionary
+        """
+        self.sections[name] = func
+
+    @contextlib.contextmanager
+    def sync(self, table):
+        """
+        Time a whole table sync, and attribute the spans inside it to table
+        """
+        self._table_stack.append(table)
+        profile = contextlib.nullcontext()
+        if self.profiler is not None and self.profiler.wants(table):
+            profile = self.profiler.profile(table)
+        try:
+            with self.span("total", table) as rec, profile:
+                yield rec
+        finally:
+            self._table_stack.pop()
+
+    @contextlib.contextmanager
+    def span(self, stage, table=None):
+        """
+        Time a stage. The yielded record can be filled in with the "rows" and
+        "bytes" handled by the stage. The process RSS is recorded when the
+        stage ends, with the process high-water mark so far (ru_maxrss is per
+        process, so it isn't the peak of the stage itself).
+
+        args:
+            stage:         stage name (see STAGES)
+            table:         (optional) table name. Defaults to the current sync
+        """
+        t_start = time.perf_counter()
+        rec = {
+            "table": table or self.current_table or "-",
+            "stage": stage,
+            "seconds": 0.0,
+            "rows": 0,
+            "bytes": 0,
+            "start": t_start - self._t_start,
+            "thread": threading.current_thread().name,
+        }
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = time.perf_counter() - t_start
+            rec["rss_bytes"] = rss_bytes()
+            rec["process_peak_rss_bytes"] = max(peak_rss_bytes(), rec["rss_bytes"])
+            self.spans.append(rec)
+
+    def summary(self):
+        """
+        Aggregate the spans per table and stage
+
+        returns:
+            tables:        dictionary of table -> stage -> aggregates (calls,
+                           seconds, rows, bytes, rows_per_sec, max_rss_bytes,
+                           process_peak_rss_bytes)
+        """
+        tables = {}
+        for rec in self.spans:
+            stages = tables.setdefault(rec["table"], {})
+            agg = stages.setdefault(rec["stage"], _new_stage_agg())
+            agg["calls"] += 1
+            agg["seconds"] += rec["seconds"]
+            agg["rows"] += rec["rows"]
+            agg["bytes"] += rec["bytes"]
+            agg["max_rss_bytes"] = max(agg["max_rss_bytes"], rec.get("rss_bytes", 0))
+            agg["process_peak_rss_bytes"] = max(
+                agg["process_peak_rss_bytes"], rec.get("process_peak_rss_bytes", 0)
+            )
+
+        overlapped = self._overlapped_tables()
+        for table, stages in tables.items():
+            if (
+                "total" in stages
+                and "transform" not in stages
+                and table not in overlapped
+            ):
+                other = sum(
+                    agg["seconds"] for name, agg in stages.items() if name != "total"
+                )
+                stages["transform"] = _new_stage_agg()
+                stages["transform"]["calls"] = stages["total"]["calls"]
+                stages["transform"]["seconds"] = max(
+                    stages["total"]["seconds"] - other, 0.0
+                )
+            for agg in stages.values():
+                secs = agg["seconds"]
+                agg["rows_per_sec"] = agg["rows"] / secs if secs > 0 else 0.0
+        return tables
+
+    def _overlapped_tables(self):
+        """
+        Tables with stage spans from different threads running at the same time
+        (their stage times add up to more than the wall time of the sync)
+        """
+        by_table = {}
+        for rec in self.spans:
+            if rec["stage"] != "total" and "start" in rec:
+                by_table.setdefault(rec["table"], []).append(rec)
+        overlapped = set()
+        for table, recs in by_table.items():
+            thread_end = {}
+            for rec in sorted(recs, key=lambda rec: rec["start"]):
+                if any(
+                    end > rec["start"]
+                    for thread, end in thread_end.items()
+                    if thread != rec["thread"]
+                ):
+                    overlapped.add(table)
+                    break
+                end = rec["start"] + rec["seconds"]
+                thread_end[rec["thread"]] = max(thread_end.get(rec["thread"], 0), end)
+        return overlapped
+
+    def to_dict(self):
+        """
+        Build the machine-readable run report
+        """
+        report = {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_seconds": time.perf_counter() - self._t_start,
+            "tables": self.summary(),
+        }
+        for name, func in self.sections.items():
+            report[name] = func()
+        return report
+
+    def write_json(self, path):
+        """
+        Save the run report as JSON
+        """
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp_file, path)
+        logger.info(f"Run report saved to {path}")
+
+    def write_prometheus(self, path):
+        """
+        Save the per-stage metrics in the Prometheus textfile collector format
+        (written atomically, so the collector never reads a partial file)
+        """
+        metrics = [
+            ("seconds", "Wall time of the table sync stage in seconds"),
+            ("rows", "Rows handled by the table sync stage"),
+            ("bytes", "Bytes handled by the table sync stage"),
+            ("max_rss_bytes", "Process RSS at the end of the table sync stage"),
+        ]
+        tables = self.summary()
+        lines = []
+        for field, help_text in metrics:
+            name = f"pfin_etl_stage_{field}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for table, stages in tables.items():
+                for stage, agg in stages.items():
+                    label = f'table="{table}",stage="{stage}"'
+                    lines.append(f"{name}{{{label}}} {agg[field]}")
+        lines.append("# HELP pfin_etl_run_seconds Wall time of the ETL run in seconds")
+        lines.append("# TYPE pfin_etl_run_seconds gauge")
+        lines.append(f"pfin_etl_run_seconds {time.perf_counter() - self._t_start}")
+
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_file, path)
+        logger.info(f"Prometheus metrics saved to {path}")
+
+    def log_summary(self):
+        """
+        Log the per-table stage timings
+        """
+        logger.info("==== " * 16)
+        logger.info("==== Run Summary (seconds / rows per stage)")
+        for table, stages in self.summary().items():
+            parts = []
+            for stage in ["total"] + STAGES:
+                if stage in stages:
+                    agg = stages[stage]
+                    parts.append(f"{stage}={agg['seconds']:.2f}s/{agg['rows']}")
+            rss_mb = max(agg["max_rss_bytes"] for agg in stages.values()) / 2**20
+            logger.info(f"  {table}: {', '.join(parts)} (rss: {rss_mb:.0f} MiB)")
+
+
+def _new_stage_agg():
+    return {
+        "calls": 0,
+        "seconds": 0.0,
+        "rows": 0,
+        "bytes": 0,
+        "max_rss_bytes": 0,
+        "process_peak_rss_bytes": 0,
+    }
+
+
+def rss_bytes():
+    """
+    Current resident set size (RSS) of the process in bytes. Falls back to the
+    peak RSS where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """
+    High-water mark of the process resident set size (RSS) in bytes (0 if the
+    platform can't tell)
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # [richmosko]: ru_maxrss is in bytes on macOS, and in KiB on Linux
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class ApiStats:
+    """
+    API Call Statistics
+    Per-endpoint call counts, latency percentiles, response bytes, errors,
+    retries and rate-limited (HTTP 429) responses.
+    """
+
+    def __init__(self):
+        """
+        Class initializer...
+        """
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all recorded calls
+        """
+        self.endpoints = {}
+
+    def _endpoint(self, endpoint):
+        return self.endpoints.setdefault(
+            endpoint,
+            {"latency": [], "bytes": 0, "errors": 0, "retries": 0, "status_429": 0},
+        )
+
+    def record(self, endpoint, seconds, nbytes=0, error=False, rate_limited=False):
+        """
+        Record a single API call (each retry attempt counts as a call)
+
+        args:
+            endpoint:      endpoint name (ie: income_statement)
+            seconds:       latency of the call
+            nbytes:        size of the response body
+            error:         the call failed
+            rate_limited:  the call was rejected with HTTP 429
+        """
+        stats = self._endpoint(endpoint)
+        stats["latency"].append(seconds)
+        stats["bytes"] += nbytes
+        stats["errors"] += int(error or rate_limited)
+        stats["status_429"] += int(rate_limited)
+
+    def record_retry(self, endpoint):
+        """
+        Record a retry of a failed API call
+        """
+        self._endpoint(endpoint)["retries"] += 1
+
+    def summary(self):
+        """
+        Aggregate the calls per endpoint
+
+        returns:
+            endpoints:     dictionary of endpoint -> calls, errors, retries,
+                           status_429, bytes, total_seconds, p50, p95, p99
+        """
+        endpoints = {}
+        for endpoint, stats in sorted(self.endpoints.items()):
+            latency = sorted(stats["latency"])
+            endpoints[endpoint] = {
+                "calls": len(latency),
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "status_429": stats["status_429"],
+                "bytes": stats["bytes"],
+                "total_seconds": sum(latency),
+                "p50": _percentile(latency, 50),
+                "p95": _percentile(latency, 95),
+                "p99": _percentile(latency, 99),
+            }
+        return endpoints
+
+    def log_summary(self):
+        """
+        Log the per-endpoint API call accounting
+        """
+        logger.info("==== " * 16)
+        logger.info("==== API Calls (calls / p50 / p95 / p99 / bytes / 429s)")
+        for endpoint, agg in self.summary().items():
+            logger.info(
+                f"  {endpoint}: {agg['calls']} / {agg['p50']:.3f}s / "
+                f"{agg['p95']:.3f}s / {agg['p99']:.3f}s / {agg['bytes']} / "
+                f"{agg['status_429']} (retries: {agg['retries']})"
+            )
+
+
+class SqlTracer:
+    """
+    SQL Statement Tracer
+    Listens to the before/after_cursor_execute events of a sqlalchemy engine
+    and records the normalized statement text, duration, rowcount and
+    executemany batch size of every statement sent to the database.
+    """
+
+    def __init__(self, slow_seconds=0.5, max_slow=50):
+        """
+        Class initializer...
+
+        args:
+            slow_seconds:  statements taking longer are logged as slow queries
+            max_slow:      max number of slow queries kept for the run report
+        """
+        self.slow_seconds = slow_seconds
+        self.max_slow = max_slow
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all recorded statements
+        """
+        self.statements = {}
+        self.tables = {}
+        self.slow = []
+
+    def attach(self, engine):
+        """
+        Start tracing the statements executed on engine
+        """
+        sqla.event.listen(engine, "before_cursor_execute", self._before_execute)
+        sqla.event.listen(engine, "after_cursor_execute", self._after_execute)
+        sqla.event.listen(engine, "handle_error", self._handle_error)
+        logger.info(f"SQL tracing enabled (slow: >{self.slow_seconds}s)...")
+
+    def detach(self, engine):
+        """
+        Stop tracing the statements executed on engine
+        """
+        sqla.event.remove(engine, "before_cursor_execute", self._before_execute)
+        sqla.event.remove(engine, "after_cursor_execute", self._after_execute)
+        sqla.event.remove(engine, "handle_error", self._handle_error)
+
+    def _before_execute(self, conn, cursor, statement, params, context, executemany):
+        conn.info.setdefault("pfin_sql_start", []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, params, context, executemany):
+        seconds = time.perf_counter() - conn.info["pfin_sql_start"].pop()
+        batch = len(params) if executemany and params else 1
+        rowcount = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        self.record(statement, seconds, rowcount, batch)
+
+    def _handle_error(self, exception_context):
+        # [richmosko]: a failed statement never gets its after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and exception_context.statement is not None:
+            start_list = conn.info.get("pfin_sql_start")
+            if start_list:
+                start_list.pop()
+
+    def record(self, statement, seconds, rowcount=0, batch=1):
+        """
+        Record a single executed statement
+
+        args:
+            statement:     SQL text sent to the database
+            seconds:       duration of the execution
+            rowcount:      rows affected or returned (when the driver knows)
+            batch:         number of parameter sets (executemany)
+        """
+        sql = normalize_sql(statement)
+        match = _SQL_TABLE.search(statement)
+        target = match.group(1).replace('"', "") if match else "-"
+        table = run_report.current_table or target
+
+        stats = self.statements.setdefault(
+            sql,
+            {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "batch": 0},
+        )
+        stats["calls"] += 1
+        stats["seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+        stats["rows"] += rowcount
+        stats["batch"] += batch
+
+        tab_stats = self.tables.setdefault(
+            table, {"statements": 0, "seconds": 0.0, "rows": 0}
+        )
+        tab_stats["statements"] += 1
+        tab_stats["seconds"] += seconds
+        tab_stats["rows"] += rowcount
+
+        if seconds >= self.slow_seconds:
+            logger.warning(f"Slow SQL ({seconds:.3f}s, {table}): {sql}")
+            if len(self.slow) < self.max_slow:
+                self.slow.append(
+                    {"sql": sql, "seconds": seconds, "rows": rowcount, "table": table}
+                )
+
+    def summary(self, top=25):
+        """
+        Aggregate the traced statements for the run report
+
+        returns:
+            sql:           dictionary with per-table aggregates, the top statements
+                           by total time, and the slow query log
+        """
+        statements = sorted(
+            self.statements.items(), key=lambda item: item[1]["seconds"], reverse=True
+        )
+        return {
+            "tables": self.tables,
+            "statements": [{"sql": sql, **stats} for sql, stats in statements[:top]],
+            "slow": self.slow,
+        }
+
+
+class Profiler:
+    """
+    Table Sync Profiler
+    Wraps selected table syncs in cProfile (cpu) or tracemalloc (mem), and dumps
+    the results per table into a run directory.
+    """
+
+    def __init__(self, mode, run_dir, tables=None, top=25):
+        """
+        Class initializer...
+
+        args:
+            mode:          "cpu" (cProfile) or "mem" (tracemalloc)
+            run_dir:       directory to write the profiles into
+            tables:        (optional) list of table names to profile (all if None)
+            top:           number of entries in the text summaries
+        """
+        if mode not in ("cpu", "mem"):
+            raise ValueError(f"Unknown profile mode '{mode}' (use cpu or mem)")
+        self.mode = mode
+        self.run_dir = run_dir
+        self.tables = set(tables) if tables else None
+        self.top = top
+        os.makedirs(run_dir, exist_ok=True)
+
+    def wants(self, table):
+        """
+        Check if a table sync should be profiled
+        """
+        return self.tables is None or table in self.tables
+
+    @contextlib.contextmanager
+    def profile(self, table):
+        """
+        Profile the code run inside the block as a sync of table
+        """
+        if self.mode == "cpu":
+            with self._profile_cpu(table):
+                yield
+        else:
+            with self._profile_mem(table):
+                yield
+
+    @contextlib.contextmanager
+    def _profile_cpu(self, table):
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            # [richmosko]: .pstats loads in snakeviz, or flameprof for flamegraphs
+            prof.dump_stats(os.path.join(self.run_dir, f"{table}.pstats"))
+            with open(os.path.join(self.run_dir, f"{table}.cpu.txt"), "w") as f:
+                stats = pstats.Stats(prof, stream=f)
+                stats.sort_stats("cumulative").print_stats(self.top)
+            logger.info(f"CPU profile of {table} saved to {self.run_dir}")
+
+    @contextlib.contextmanager
+    def _profile_mem(self, table):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(25)
+        tracemalloc.reset_peak()
+        snap_start = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            snap_end = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            stats = snap_end.compare_to(snap_start, "lineno")
+            with open(os.path.join(self.run_dir, f"{table}.mem.txt"), "w") as f:
+                f.write(f"Peak traced memory: {peak / 2**20:.1f} MiB\n")
+                f.write(f"Top {self.top} allocation sites (growth):\n")
+                for stat in stats[: self.top]:
+                    f.write(f"{stat}\n")
+            logger.info(f"Memory profile of {table} saved to {self.run_dir}")
+
+
+def enable_profiling(mode, run_dir=None, tables=None):
+    """
+    Profile the table syncs of this run (see Profiler)
+
+    args:
+        mode:              "cpu" or "mem"
+        run_dir:           (optional) output directory. Defaults to a new
+                           pfin_profile_<timestamp> directory
+        tables:            (optional) list of table names to profile
+
+    returns:
+        profiler:          the Profiler attached to the run report
+    """
+    if run_dir is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        run_dir = f"pfin_profile_{stamp}"
+    run_report.profiler = Profiler(mode, run_dir, tables)
+    logger.info(f"Profiling ({mode}) table syncs into {run_dir}...")
+    return run_report.profiler
+
+
+def normalize_sql(statement):
+    """
+    Normalize a SQL statement for aggregation: collapse whitespace, replace
+    literals with '?', fold the insertmanyvalues parameter suffixes, and cut the
+    text to SQL_TEXT_LIMIT characters.
+    """
+    sql = _SQL_SPACE.sub(" ", statement).strip()
+    sql = _SQL_LITERAL.sub("?", sql)
+    sql = _SQL_BATCH_PARAM.sub("__n)s", sql)
+    if len(sql) > SQL_TEXT_LIMIT:
+        sql = sql[:SQL_TEXT_LIMIT] + "..."
+    return sql
+
+
+def _percentile(values, pct):
+    """
+    Nearest-rank percentile of a sorted list (0.0 for an empty list)
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+# [richmosko]: one report per process... the ETL runs one job at a time
+run_report = RunReport()
+api_stats = ApiStats()
+run_report.add_section("api", api_stats.summary)
+sql_tracer = SqlTracer()
+
+
+def sync(table):
+    """
+    Time a whole table sync on the run report (see RunReport.sync)
+    """
+    return run_report.sync(table)
+
+
+def span(stage, table=None):
+    """
+    Time a stage on the run report (see RunReport.span)
+    """
+    return run_report.span(stage, table)
+
+
+def timed(stage):
+    """
+    Decorator version of span(). The rows and bytes are taken from the
+    returned dataframe (or list) when there is one.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with run_report.span(stage) as rec:
+                result = func(*args, **kwargs)
+                if hasattr(result, "estimated_size"):
+                    rec["rows"] = len(result)
+                    rec["bytes"] = result.estimated_size()
+                elif isinstance(result, list):
+                    rec["rows"] = len(result)
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,136 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Producer/consumer pipeline for the batched table syncs. A fetch thread
+    pulls (and transforms) the API rows of the next symbol batches while the
+    calling thread diffs and writes the previous ones to the database, so a
+    sync takes about as long as its slowest stage instead of the sum of them.
+
+    Fetched batches are handed over through a bounded queue: the fetch thread
+    blocks when it is `depth` batches ahead of the writer (backpressure), which
+    keeps the memory bounded by the queue depth. Each batch commits on its own,
+    and a batch that fails (in either stage) is logged and skipped... the
+    other batches still run, and the failures are raised once at the end.
+"""
+
+# library imports
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger("pfin_etl")
+
+_DONE = object()  # [richmosko]: end of the fetched batches
+
+
+class _Failed:
+    """
+    A batch whose fetch stage raised
+    """
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class Pipeline:
+    """
+    Two stage (fetch -> write) pipeline over batches, with a bounded queue
+    """
+
+    def __init__(self, depth=2):
+        """
+        Class initializer...
+
+        args:
+            depth:         max number of fetched batches waiting to be written
+        """
+        self.depth = max(int(depth), 1)
+        self.stats = Counter()
+
+    def run(self, batches, fetch_func, write_func):
+        """
+        Fetch the batches in a background thread and write them in this one
+
+        args:
+            batches:       list of batches (ie: lists of symbols)
+            fetch_func:    function(batch) -> fetched data (network side)
+            write_func:    function(batch, data) writing it (database side)
+
+        raises:
+            RuntimeError:  after all batches ran, if any of them failed
+        """
+        q = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce,
+            args=(batches, fetch_func, q, stop),
+            name="pfin-pipeline-fetch",
+            daemon=True,
+        )
+        failed = []
+        producer.start()
+        try:
+            while True:
+                t_wait = time.perf_counter()
+                (batch, data) = q.get()
+                self.stats["write_wait_seconds"] += time.perf_counter() - t_wait
+                if batch is _DONE:
+                    break
+                if isinstance(data, _Failed):
+                    failed.append((batch, "fetch", data.exc))
+                    continue
+                try:
+                    write_func(batch, data)
+                    self.stats["batches"] += 1
+                except Exception as exc:
+                    logger.exception(f"Pipeline: writing a batch failed ({exc})")
+                    failed.append((batch, "write", exc))
+                del data  # [richmosko]: release the batch before the next get
+        finally:
+            stop.set()
+            producer.join()
+        if failed:
+            self.stats["failed"] += len(failed)
+            detail = "; ".join(f"{stage}: {exc}" for (_, stage, exc) in failed)
+            raise RuntimeError(
+                f"Pipeline: {len(failed)} of {len(batches)} batch(es) failed ({detail})"
+            )
+
+    def summary(self):
+        """
+        Pipeline statistics for the run report
+
+        returns:
+            summary:       JSON serializable dictionary
+        """
+        return {"depth": self.depth, **dict(self.stats)}
+
+    def _produce(self, batches, fetch_func, q, stop):
+        for batch in batches:
+            if stop.is_set():
+                return
+            try:
+                data = fetch_func(batch)
+            except Exception as exc:
+                logger.exception(f"Pipeline: fetching a batch failed ({exc})")
+                data = _Failed(exc)
+            if not self._put(q, (batch, data), stop):
+                return
+        self._put(q, (_DONE, None), stop)
+
+    def _put(self, q, item, stop):
+        # [richmosko]: block while the writer is behind, but give up if it
+        #              stopped (so the thread never hangs on a full queue)
+        t_wait = time.perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                self.stats["fetch_wait_seconds"] += time.perf_counter() - t_wait
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,166 @@
+"""
+Project:       pfin_back_etl
+Author:        Rich Mosko
+
+Description:
+    Staleness tracking for the nightly table refreshes. Remembers when each
+    table (and each asset within a table) was last refreshed, and decides which
+    work is stale enough to schedule within a time or API-call budget.
+
+"""
+
+# library imports
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("pfin_etl")
+
+# Maximum age of the data in each table before it is considered stale
+DEFAULT_REFRESH_POLICY = {
+    "cpi": timedelta(days=30),
+    "asset": timedelta(days=7),
+    "equity_profile": timedelta(days=7),
+    "reporting_period": timedelta(days=1),  # [richmosko]: and the statements
+    "earning": timedelta(days=1),
+    "eod_price": timedelta(days=1),
+}
+
+# Slack so a job scheduled at the same time every night still sees the data
+# from the previous night as stale (runtimes drift by a few minutes)
+REFRESH_GRACE = timedelta(hours=2)
+
+
+class RefreshTracker:
+    """
+    Refresh Tracker
+    Keeps the last-refreshed timestamps per table and per asset (symbol) in a
+    local JSON state file, and compares them against a refresh policy (the max
+    age allowed per table).
+    """
+
+    def __init__(self, state_file, policy=None):
+        """
+        Class initializer...
+
+        args:
+            state_file:    path of the JSON file used to persist the timestamps
+            policy:        (optional) dictionary of table name -> max age
+                           (timedelta). Merged over DEFAULT_REFRESH_POLICY
+        """
+        self._state_file = state_file
+        self.policy = dict(DEFAULT_REFRESH_POLICY)
+        if policy:
+            self.policy.update(policy)
+        self._state = self._load_state()
+
+    def last_refreshed(self, table, sym=None):
+        """
+        Get the last time a table (or a single asset in the table) was refreshed
+
+        returns:
+            ts:            datetime of the last refresh (None if never)
+        """
+        tab_state = self._state.get(table, {})
+        if sym is None:
+            ts = tab_state.get("_table")
+        else:
+            ts = tab_state.get("assets", {}).get(sym)
+        return datetime.fromisoformat(ts) if ts else None
+
+    def staleness(self, table, sym=None, now=None):
+        """
+        How far past its max age the data is. Positive values are stale, and
+        data that was never refreshed is infinitely stale.
+
+        returns:
+            overdue:       timedelta past the max age (timedelta.max if never)
+        """
+        now = now or datetime.now(timezone.utc)
+        ts = self.last_refreshed(table, sym)
+        if ts is None:
+            return timedelta.max
+        max_age = self.policy.get(table, timedelta(0))
+        return (now - ts) - max_age + REFRESH_GRACE
+
+    def is_stale(self, table, sym=None, now=None):
+        """
+        Check if a table (or a single asset in the table) is due for a refresh
+        """
+        return self.staleness(table, sym, now) > timedelta(0)
+
+    def schedule(self, candidates, call_budget=None, force=False, now=None):
+        """
+        Select the stale (table, symbol) work to run, most stale first, until the
+        API call budget is used up.
+
+        args:
+            candidates:    dictionary of table name -> (sym_list, calls_per_sym)
+            call_budget:   (optional) max number of API calls to schedule
+            force:         schedule every candidate, stale or not
+            now:           (optional) reference time for the staleness
+
+        returns:
+            sched:         dictionary of table name -> list of symbols to refresh
+                           (in the order the candidates were given)
+        """
+        items = []
+        for table, (sym_list, cost) in candidates.items():
+            for idx, sym in enumerate(sym_list):
+                overdue = self.staleness(table, sym, now)
+                if force or overdue > timedelta(0):
+                    items.append((overdue, table, idx, sym, cost))
+        items.sort(key=lambda item: item[0], reverse=True)
+
+        picked = {table: [] for table in candidates}
+        calls = 0
+        for _, table, idx, sym, cost in items:
+            if call_budget is not None and calls + cost > call_budget:
+                continue
+            calls += cost
+            picked[table].append((idx, sym))
+
+        sched = {}
+        for table, lst in picked.items():
+            sched[table] = [sym for _, sym in sorted(lst)]
+            logger.info(
+                f"Schedule {table}: {len(sched[table])} of "
+                f"{len(candidates[table][0])} symbol(s) stale"
+            )
+        logger.info(f"Scheduled ~{calls} API call(s) (budget: {call_budget})")
+        return sched
+
+    def mark_refreshed(self, table, sym_list=None, now=None):
+        """
+        Record a refresh of a table. When sym_list is given, only those assets
+        are marked, otherwise the table as a whole is marked. The state file is
+        saved right away so an interrupted run keeps its progress.
+        """
+        now = now or datetime.now(timezone.utc)
+        tab_state = self._state.setdefault(table, {})
+        if sym_list is None:
+            tab_state["_table"] = now.isoformat()
+        else:
+            assets = tab_state.setdefault("assets", {})
+            for sym in sym_list:
+                assets[sym] = now.isoformat()
+        self._save_state()
+
+    def _load_state(self):
+        """
+        Load the timestamps from the state file (empty state if missing)
+        """
+        if not os.path.exists(self._state_file):
+            return {}
+        with open(self._state_file, "r") as f:
+            return json.load(f)
+
+    def _save_state(self):
+        """
+        Save the timestamps to the state file
+        """
+        tmp_file = self._state_file + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_file, self._state_file)
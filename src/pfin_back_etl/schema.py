@@ -0,0 +1,198 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Dialect neutral snapshot (sqlalchemy Core) of the pfin tables this ETL
+    reads and writes. The real DDL lives with the pfin-dash database; this
+    copy is used to stand up a local database (ie: SQLite) for offline
+    benchmarks and tests, so it only tracks the columns the ETL touches.
+"""
+
+# library imports
+import sqlalchemy as sqla
+
+from pfin_back_etl import synth, utils
+
+SCHEMA = "pfin"
+
+# [richmosko]: SQLite only auto-increments INTEGER PRIMARY KEY columns
+BigId = sqla.BigInteger().with_variant(sqla.Integer(), "sqlite")
+# [richmosko]: statement amounts are numeric in the pfin DDL... SQLite has no
+#              decimal storage (sqlalchemy would hand back Decimals), so they
+#              stay floats there
+Amount = sqla.Numeric().with_variant(sqla.Float(), "sqlite")
+# [richmosko]: quarters, plus 'NA' for the future reporting periods of the
+#              earnings estimates (PFinBackend._tmp_period_fut)
+Period = sqla.Enum("Q1", "Q2", "Q3", "Q4", "NA", name="fiscal_period")
+
+
+def _statement_table(metadata, name, fmp_fields):
+    columns = [
+        sqla.Column(
+            "reporting_period_id",
+            BigId,
+            sqla.ForeignKey(f"{SCHEMA}.reporting_period.id"),
+            primary_key=True,
+        )
+    ]
+    for field, col in utils.col_to_snake(fmp_fields).items():
+        # [richmosko]: share counts are whole numbers
+        col_type = sqla.BigInteger if field.startswith("weightedAverageShs") else Amount
+        columns.append(sqla.Column(col, col_type))
+    return sqla.Table(name, metadata, *columns, schema=SCHEMA)
+
+
+def build_metadata():
+    """
+    Build the sqlalchemy MetaData of the pfin tables
+
+    returns:
+        metadata:          sqlalchemy MetaData with the pfin tables
+    """
+    metadata = sqla.MetaData()
+    sqla.Table(
+        "asset_cat",
+        metadata,
+        sqla.Column("id", BigId, primary_key=True),
+        sqla.Column("cat", sqla.String, nullable=False),
+        sqla.Column("sub_cat", sqla.String, nullable=False),
+        schema=SCHEMA,
+    )
+    sqla.Table(
+        "asset",
+        metadata,
+        sqla.Column("id", BigId, primary_key=True),
+        sqla.Column("symbol", sqla.String, nullable=False, unique=True),
+        sqla.Column("description", sqla.String),
+        sqla.Column("currency", sqla.String),
+        sqla.Column("exchange", sqla.String),
+        sqla.Column("exchange_full_name", sqla.String),
+        sqla.Column("asset_cat_id", BigId, sqla.ForeignKey(f"{SCHEMA}.asset_cat.id")),
+        sqla.Column("has_financials", sqla.Boolean, default=True),
+        sqla.Column("has_chart", sqla.Boolean, default=True),
+        schema=SCHEMA,
+    )
+    sqla.Table(
+        "cpi",
+        metadata,
+        sqla.Column("id", BigId, primary_key=True),
+        sqla.Column("year", sqla.Integer, nullable=False),
+        sqla.Column("month", sqla.Integer, nullable=False),
+        sqla.Column("period_name", sqla.String),
+        sqla.Column("series_id", sqla.String),
+        sqla.Column("series_name", sqla.String),
+        sqla.Column("series_value", sqla.Float),
+        sqla.Column("ref_date", sqla.Date),
+        schema=SCHEMA,
+    )
+    sqla.Table(
+        "equity_profile",
+        metadata,
+        sqla.Column(
+            "asset_id",
+            BigId,
+            sqla.ForeignKey(f"{SCHEMA}.asset.id"),
+            primary_key=True,
+        ),
+        sqla.Column("price", sqla.Float),
+        sqla.Column("market_cap", sqla.BigInteger),
+        sqla.Column("beta", sqla.Float),
+        sqla.Column("last_dividend", sqla.Float),
+        sqla.Column("range", sqla.String),
+        sqla.Column("volume", sqla.BigInteger),
+        sqla.Column("average_volume", sqla.BigInteger),
+        sqla.Column("company_name", sqla.String),
+        sqla.Column("cik", sqla.String),
+        sqla.Column("isin", sqla.String),
+        sqla.Column("cusip", sqla.String),
+        sqla.Column("industry", sqla.String),
+        sqla.Column("sector", sqla.String),
+        sqla.Column("country", sqla.String),
+        sqla.Column("website", sqla.String),
+        sqla.Column("description", sqla.String),
+        sqla.Column("ceo", sqla.String),
+        sqla.Column("full_time_employees", sqla.Integer),
+        sqla.Column("ipo_date", sqla.Date),
+        sqla.Column("image", sqla.String),
+        sqla.Column("is_etf", sqla.Boolean),
+        sqla.Column("is_actively_trading", sqla.Boolean),
+        sqla.Column("is_adr", sqla.Boolean),
+        sqla.Column("is_fund", sqla.Boolean),
+        schema=SCHEMA,
+    )
+    sqla.Table(
+        "reporting_period",
+        metadata,
+        sqla.Column("id", BigId, primary_key=True),
+        sqla.Column(
+            "asset_id", BigId, sqla.ForeignKey(f"{SCHEMA}.asset.id"), nullable=False
+        ),
+        sqla.Column("fiscal_year", sqla.Integer, nullable=False),
+        sqla.Column("period", Period, nullable=False),
+        sqla.Column("end_date", sqla.Date),
+        sqla.Column("filing_date", sqla.Date),
+        sqla.Column("accepted_date", sqla.DateTime(timezone=True)),
+        sqla.Column("reported_currency", sqla.String),
+        sqla.Column("cik", sqla.String),
+        sqla.UniqueConstraint("asset_id", "fiscal_year", "period"),
+        schema=SCHEMA,
+    )
+    _statement_table(metadata, "income_statement", synth.INCOME_FIELDS)
+    _statement_table(metadata, "balance_sheet_statement", synth.BALANCE_FIELDS)
+    _statement_table(metadata, "cash_flow_statement", synth.CASH_FLOW_FIELDS)
+    sqla.Table(
+        "earning",
+        metadata,
+        sqla.Column(
+            "reporting_period_id",
+            BigId,
+            sqla.ForeignKey(f"{SCHEMA}.reporting_period.id"),
+            primary_key=True,
+        ),
+        sqla.Column("ref_date", sqla.Date),
+        sqla.Column("eps_actual", sqla.Float),
+        sqla.Column("eps_estimated", sqla.Float),
+        sqla.Column("revenue_actual", sqla.Float),
+        sqla.Column("revenue_estimated", sqla.Float),
+        sqla.Column("last_updated", sqla.Date),
+        schema=SCHEMA,
+    )
+    sqla.Table(
+        "eod_price",
+        metadata,
+        sqla.Column("id", BigId, primary_key=True),
+        sqla.Column(
+            "asset_id", BigId, sqla.ForeignKey(f"{SCHEMA}.asset.id"), nullable=False
+        ),
+        sqla.Column("end_date", sqla.Date, nullable=False),
+        sqla.Column("open", sqla.Float),
+        sqla.Column("high", sqla.Float),
+        sqla.Column("low", sqla.Float),
+        sqla.Column("close", sqla.Float),
+        sqla.Column("volume", sqla.BigInteger),
+        sqla.Column("change", sqla.Float),
+        sqla.Column("change_percent", sqla.Float),
+        sqla.Column("vwap", sqla.Float),
+        sqla.UniqueConstraint("asset_id", "end_date"),
+        schema=SCHEMA,
+    )
+    return metadata
+
+
+def create_pfin_schema(engine):
+    """
+    Create the pfin tables (if missing) and seed the asset categories
+
+    args:
+        engine:            sqlalchemy engine of the target database. The pfin
+                           schema itself must already exist (or be attached)
+    """
+    metadata = build_metadata()
+    metadata.create_all(engine)
+    tab_acat = metadata.tables[f"{SCHEMA}.asset_cat"]
+    with engine.begin() as conn:
+        if conn.execute(sqla.select(tab_acat.c.id)).first() is None:
+            conn.execute(
+                sqla.insert(tab_acat), [{"cat": "Equity", "sub_cat": "UNKNOWN"}]
+            )
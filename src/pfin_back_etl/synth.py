@@ -0,0 +1,587 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Deterministic synthetic API payloads for offline benchmarks and tests.
+    SynthFMP answers the Financial Modeling Prep endpoints this project calls
+    (by URL path and query params) with realistically shaped data at any scale,
+    and bls_cpi_payload() builds a BLS timeseries response.
+
+"""
+
+# library imports
+import io
+import json
+import math
+import random
+import zlib
+from datetime import date, timedelta
+
+import polars as pl
+
+# Statement fields, roughly the width of the real FMP statements
+INCOME_FIELDS = [
+    "revenue",
+    "costOfRevenue",
+    "grossProfit",
+    "researchAndDevelopmentExpenses",
+    "generalAndAdministrativeExpenses",
+    "sellingAndMarketingExpenses",
+    "sellingGeneralAndAdministrativeExpenses",
+    "otherExpenses",
+    "operatingExpenses",
+    "costAndExpenses",
+    "netInterestIncome",
+    "interestIncome",
+    "interestExpense",
+    "depreciationAndAmortization",
+    "ebitda",
+    "ebit",
+    "nonOperatingIncomeExcludingInterest",
+    "operatingIncome",
+    "totalOtherIncomeExpensesNet",
+    "incomeBeforeTax",
+    "incomeTaxExpense",
+    "netIncomeFromContinuingOperations",
+    "netIncomeFromDiscontinuedOperations",
+    "otherAdjustmentsToNetIncome",
+    "netIncome",
+    "netIncomeDeductions",
+    "bottomLineNetIncome",
+    "eps",
+    "epsDiluted",
+    "weightedAverageShsOut",
+    "weightedAverageShsOutDil",
+]
+BALANCE_FIELDS = [
+    "cashAndCashEquivalents",
+    "shortTermInvestments",
+    "cashAndShortTermInvestments",
+    "netReceivables",
+    "accountsReceivables",
+    "otherReceivables",
+    "inventory",
+    "prepaids",
+    "otherCurrentAssets",
+    "totalCurrentAssets",
+    "propertyPlantEquipmentNet",
+    "goodwill",
+    "intangibleAssets",
+    "goodwillAndIntangibleAssets",
+    "longTermInvestments",
+    "taxAssets",
+    "otherNonCurrentAssets",
+    "totalNonCurrentAssets",
+    "otherAssets",
+    "totalAssets",
+    "totalPayables",
+    "accountPayables",
+    "otherPayables",
+    "accruedExpenses",
+    "shortTermDebt",
+    "capitalLeaseObligationsCurrent",
+    "taxPayables",
+    "deferredRevenue",
+    "otherCurrentLiabilities",
+    "totalCurrentLiabilities",
+    "longTermDebt",
+    "deferredRevenueNonCurrent",
+    "deferredTaxLiabilitiesNonCurrent",
+    "otherNonCurrentLiabilities",
+    "totalNonCurrentLiabilities",
+    "otherLiabilities",
+    "capitalLeaseObligations",
+    "totalLiabilities",
+    "treasuryStock",
+    "preferredStock",
+    "commonStock",
+    "retainedEarnings",
+    "additionalPaidInCapital",
+    "accumulatedOtherComprehensiveIncomeLoss",
+    "otherTotalStockholdersEquity",
+    "totalStockholdersEquity",
+    "totalEquity",
+    "minorityInterest",
+    "totalLiabilitiesAndTotalEquity",
+    "totalInvestments",
+    "totalDebt",
+    "netDebt",
+]
+CASH_FLOW_FIELDS = [
+    "netIncome",
+    "depreciationAndAmortization",
+    "deferredIncomeTax",
+    "stockBasedCompensation",
+    "changeInWorkingCapital",
+    "accountsReceivables",
+    "inventory",
+    "accountsPayables",
+    "otherWorkingCapital",
+    "otherNonCashItems",
+    "netCashProvidedByOperatingActivities",
+    "investmentsInPropertyPlantAndEquipment",
+    "acquisitionsNet",
+    "purchasesOfInvestments",
+    "salesMaturitiesOfInvestments",
+    "otherInvestingActivities",
+    "netCashProvidedByInvestingActivities",
+    "netDebtIssuance",
+    "longTermNetDebtIssuance",
+    "shortTermNetDebtIssuance",
+    "netStockIssuance",
+    "netCommonStockIssuance",
+    "commonStockIssuance",
+    "commonStockRepurchased",
+    "netPreferredStockIssuance",
+    "netDividendsPaid",
+    "commonDividendsPaid",
+    "preferredDividendsPaid",
+    "otherFinancingActivities",
+    "netCashProvidedByFinancingActivities",
+    "effectOfForexChangesOnCash",
+    "netChangeInCash",
+    "cashAtEndOfPeriod",
+    "cashAtBeginningOfPeriod",
+    "operatingCashFlow",
+    "capitalExpenditure",
+    "freeCashFlow",
+    "incomeTaxesPaid",
+    "interestPaid",
+]
+STATEMENT_FIELDS = {
+    "income-statement": INCOME_FIELDS,
+    "balance-sheet-statement": BALANCE_FIELDS,
+    "cash-flow-statement": CASH_FLOW_FIELDS,
+}
+SECTORS = [
+    ("Technology", "Software - Infrastructure"),
+    ("Technology", "Semiconductors"),
+    ("Healthcare", "Biotechnology"),
+    ("Financial Services", "Credit Services"),
+    ("Consumer Cyclical", "Internet Retail"),
+    ("Industrials", "Aerospace & Defense"),
+    ("Energy", "Oil & Gas Integrated"),
+    ("Utilities", "Utilities - Regulated Electric"),
+]
+EXCHANGES = [("NASDAQ", "NASDAQ Global Select"), ("NYSE", "New York Stock Exchange")]
+
+
+class SynthFMP:
+    """
+    Synthetic Financial Modeling Prep
+    Generates deterministic FMP payloads for a universe of n_symbols made up
+    symbols, each with `years` of quarterly statements, earnings and daily
+    prices up to as_of. The same (seed, symbol) always produces the same data.
+    """
+
+    def __init__(self, n_symbols=100, years=5, seed=0, as_of=None):
+        """
+        Class initializer...
+
+        args:
+            n_symbols:     size of the symbol universe
+            years:         years of history per symbol
+            seed:          random seed (the data is deterministic per seed)
+            as_of:         (optional) last date with data. Defaults to today
+        """
+        self.n_symbols = n_symbols
+        self.years = years
+        self.seed = seed
+        self.as_of = as_of or date.today()
+        self.symbols = [_ticker(idx) for idx in range(n_symbols)]
+        self._sym_index = {sym: idx for idx, sym in enumerate(self.symbols)}
+        self.handlers = {
+            "company-screener": self.company_screener,
+            "search-symbol": self.search_symbol,
+            "profile": self.profile,
+            "profile-bulk": self.profile_bulk,
+            "income-statement": self.statement,
+            "balance-sheet-statement": self.statement,
+            "cash-flow-statement": self.statement,
+            "income-statement-bulk": self.statement_bulk,
+            "balance-sheet-statement-bulk": self.statement_bulk,
+            "cash-flow-statement-bulk": self.statement_bulk,
+            "earnings": self.earnings,
+            "earnings-calendar": self.earnings_calendar,
+            "historical-price-eod/full": self.historical_full,
+        }
+
+    def respond(self, path, params):
+        """
+        Answer an FMP request
+
+        args:
+            path:          endpoint path relative to the base URL
+                           (ie: income-statement, historical-price-eod/full)
+            params:        dictionary of query parameters
+
+        returns:
+            status:        HTTP status code (404 for unknown endpoints)
+            content_type:  response content type
+            body:          response body (bytes)
+        """
+        path = path.strip("/")
+        handler = self.handlers.get(path)
+        if handler is None:
+            body = json.dumps({"Error Message": f"Unknown endpoint {path}"})
+            return (404, "application/json", body.encode())
+        payload = handler(path, params)
+        if isinstance(payload, bytes):
+            return (200, "text/csv", payload)
+        return (200, "application/json", json.dumps(payload).encode())
+
+    def _rng(self, sym, kind):
+        return random.Random(zlib.crc32(f"{self.seed}:{sym}:{kind}".encode()))
+
+    def _symbol_list(self, params, key="symbol"):
+        syms = str(params.get(key, "")).split(",")
+        return [sym for sym in syms if sym in self._sym_index]
+
+    def _quarters(self, limit=None):
+        """
+        Fiscal quarter end dates (newest first) up to as_of
+        """
+        n_quarters = self.years * 4 if limit is None else int(limit)
+        q_end = _quarter_end(self.as_of)
+        while q_end + timedelta(days=30) > self.as_of:
+            # [richmosko]: quarter isn't over (or filed) yet
+            q_end = _quarter_end(q_end - timedelta(days=92))
+        quarters = []
+        for _ in range(n_quarters):
+            quarters.append(q_end)
+            q_end = _quarter_end(q_end - timedelta(days=92))
+        return quarters
+
+    def _company(self, sym):
+        idx = self._sym_index[sym]
+        rng = self._rng(sym, "company")
+        sector, industry = SECTORS[idx % len(SECTORS)]
+        exchange, exchange_full = EXCHANGES[idx % len(EXCHANGES)]
+        price = round(rng.uniform(5, 900), 2)
+        shares = rng.randint(50, 5000) * 1_000_000
+        return {
+            "symbol": sym,
+            "companyName": f"{sym.title()} Holdings Inc.",
+            "sector": sector,
+            "industry": industry,
+            "exchange": exchange,
+            "exchangeFullName": exchange_full,
+            "currency": "USD",
+            "country": "US",
+            "price": price,
+            "shares": shares,
+            "marketCap": int(price * shares),
+            "beta": round(rng.uniform(0.3, 2.5), 3),
+            "lastDividend": round(rng.choice([0.0, 0.0, rng.uniform(0.1, 4)]), 2),
+            "cik": f"{rng.randint(1, 1999999):010d}",
+        }
+
+    def company_screener(self, path, params):
+        limit = int(params.get("limit", self.n_symbols))
+        rows = []
+        for sym in self.symbols[:limit]:
+            co = self._company(sym)
+            rows.append(
+                {
+                    "symbol": sym,
+                    "companyName": co["companyName"],
+                    "marketCap": co["marketCap"],
+                    "sector": co["sector"],
+                    "industry": co["industry"],
+                    "beta": co["beta"],
+                    "price": co["price"],
+                    "lastAnnualDividend": co["lastDividend"],
+                    "volume": co["shares"] // 200,
+                    "exchange": co["exchangeFullName"],
+                    "exchangeShortName": co["exchange"],
+                    "country": "US",
+                    "isEtf": False,
+                    "isFund": False,
+                    "isActivelyTrading": True,
+                }
+            )
+        return rows
+
+    def search_symbol(self, path, params):
+        sym = str(params.get("query", ""))
+        if sym not in self._sym_index:
+            return []
+        co = self._company(sym)
+        return [
+            {
+                "symbol": sym,
+                "name": co["companyName"],
+                "currency": "USD",
+                "exchangeFullName": co["exchangeFullName"],
+                "exchange": co["exchange"],
+            }
+        ]
+
+    def _profile_row(self, sym):
+        co = self._company(sym)
+        rng = self._rng(sym, "profile")
+        return {
+            "symbol": sym,
+            "price": co["price"],
+            "marketCap": co["marketCap"],
+            "beta": co["beta"],
+            "lastDividend": co["lastDividend"],
+            "range": f"{co['price'] * 0.7:.2f}-{co['price'] * 1.2:.2f}",
+            "change": round(rng.uniform(-5, 5), 2),
+            "changePercentage": round(rng.uniform(-3, 3), 4),
+            "volume": co["shares"] // 200,
+            "averageVolume": co["shares"] // 180,
+            "companyName": co["companyName"],
+            "currency": "USD",
+            "cik": co["cik"],
+            "isin": f"US{rng.randint(0, 999999999):09d}0",
+            "cusip": f"{rng.randint(0, 99999999):08d}0",
+            "exchangeFullName": co["exchangeFullName"],
+            "exchange": co["exchange"],
+            "industry": co["industry"],
+            "website": f"https://www.{sym.lower()}.example.com",
+            "description": f"{co['companyName']} operates in {co['industry']}.",
+            "ceo": "Jane Doe",
+            "sector": co["sector"],
+            "country": "US",
+            "fullTimeEmployees": str(rng.randint(100, 200000)),
+            "phone": "555-0100",
+            "address": "1 Main Street",
+            "city": "Springfield",
+            "state": "IL",
+            "zip": "62701",
+            "image": f"https://images.example.com/{sym}.png",
+            "ipoDate": (
+                date(1980, 1, 1) + timedelta(days=rng.randint(0, 15000))
+            ).isoformat(),
+            "defaultImage": False,
+            "isEtf": False,
+            "isActivelyTrading": True,
+            "isAdr": False,
+            "isFund": False,
+        }
+
+    def profile(self, path, params):
+        return [self._profile_row(sym) for sym in self._symbol_list(params)]
+
+    def profile_bulk(self, path, params):
+        # [richmosko]: the whole universe fits in part 0
+        if int(params.get("part", 0)) > 0:
+            return b""
+        return _to_csv([self._profile_row(sym) for sym in self.symbols])
+
+    def _statements(self, kind, sym, limit=None):
+        fields = STATEMENT_FIELDS[kind]
+        co = self._company(sym)
+        base = co["marketCap"] / self._rng(sym, kind).uniform(8, 40)  # per quarter
+        rows = []
+        for q_end in self._quarters(limit):
+            rng = self._rng(sym, f"{kind}:{q_end}")
+            filing = q_end + timedelta(days=rng.randint(25, 45))
+            row = {
+                "date": q_end.isoformat(),
+                "symbol": sym,
+                "reportedCurrency": "USD",
+                "cik": co["cik"],
+                "filingDate": filing.isoformat(),
+                "acceptedDate": f"{filing.isoformat()} 16:{rng.randint(0, 59):02d}:00",
+                "fiscalYear": str(q_end.year),
+                "period": f"Q{(q_end.month - 1) // 3 + 1}",
+            }
+            for field in fields:
+                if field.startswith("eps"):
+                    row[field] = round(rng.uniform(-1, 5), 2)
+                elif field.startswith("weightedAverage"):
+                    row[field] = co["shares"]
+                else:
+                    row[field] = int(base * rng.uniform(-0.2, 1.0))
+            rows.append(row)
+        return rows
+
+    def statement(self, path, params):
+        syms = self._symbol_list(params)
+        if not syms:
+            return []
+        return self._statements(path, syms[0], params.get("limit"))
+
+    def statement_bulk(self, path, params):
+        kind = path.removesuffix("-bulk")
+        year = str(params.get("year"))
+        period = str(params.get("period"))
+        rows = []
+        for sym in self.symbols:
+            for row in self._statements(kind, sym):
+                if row["fiscalYear"] == year and row["period"] == period:
+                    rows.append(row)
+        return _to_csv(rows) if rows else b""
+
+    def _earnings(self, sym):
+        rows = []
+        quarters = self._quarters()
+        # [richmosko]: two future quarters with estimates only
+        q_next = _quarter_end(quarters[0] + timedelta(days=95))
+        q_next2 = _quarter_end(q_next + timedelta(days=95))
+        for q_end in [q_next2, q_next] + quarters:
+            rng = self._rng(sym, f"earnings:{q_end}")
+            announce = q_end + timedelta(days=rng.randint(25, 45))
+            future = q_end > quarters[0]
+            eps_est = round(rng.uniform(-0.5, 4), 2)
+            rev_est = rng.randint(50, 50000) * 1_000_000
+            rows.append(
+                {
+                    "symbol": sym,
+                    "date": announce.isoformat(),
+                    "epsActual": None if future else round(eps_est * 1.05, 2),
+                    "epsEstimated": eps_est,
+                    "revenueActual": None if future else int(rev_est * 1.02),
+                    "revenueEstimated": rev_est,
+                    "lastUpdated": (self.as_of if future else announce).isoformat(),
+                }
+            )
+        return rows
+
+    def earnings(self, path, params):
+        syms = self._symbol_list(params)
+        if not syms:
+            return []
+        rows = self._earnings(syms[0])
+        limit = params.get("limit")
+        return rows[: int(limit)] if limit else rows
+
+    def earnings_calendar(self, path, params):
+        start = date.fromisoformat(params.get("from", self.as_of.isoformat()))
+        end = date.fromisoformat(params.get("to", self.as_of.isoformat()))
+        rows = []
+        for sym in self.symbols:
+            for row in self._earnings(sym):
+                if start <= date.fromisoformat(row["date"]) <= end:
+                    rows.append(row)
+        return rows
+
+    def historical_full(self, path, params):
+        syms = self._symbol_list(params)
+        if not syms:
+            return []
+        sym = syms[0]
+        first = self.as_of - timedelta(days=self.years * 365)
+        start = max(date.fromisoformat(params.get("from", first.isoformat())), first)
+        end = min(
+            date.fromisoformat(params.get("to", self.as_of.isoformat())), self.as_of
+        )
+
+        # [richmosko]: prices only depend on (symbol, day), so any window (or a
+        #              later as_of) agrees on the overlapping days
+        base = self._company(sym)["price"]
+        phase = zlib.crc32(sym.encode()) % 628 / 100
+        rows = []
+        day = end
+        while day >= start:
+            if day.weekday() < 5:
+                prev = _price(base, phase, sym, day - timedelta(days=1))
+                close = _price(base, phase, sym, day)
+                high = round(max(prev, close) * 1.005, 2)
+                low = round(min(prev, close) * 0.995, 2)
+                rows.append(
+                    {
+                        "symbol": sym,
+                        "date": day.isoformat(),
+                        "open": prev,
+                        "high": high,
+                        "low": low,
+                        "close": close,
+                        "volume": 100_000 + _noise(sym, day, 1) % 50_000_000,
+                        "change": round(close - prev, 2),
+                        "changePercent": round((close - prev) / prev * 100, 4),
+                        "vwap": round((high + low + close) / 3, 4),
+                    }
+                )
+            day -= timedelta(days=1)
+        return rows  # FMP returns the newest day first
+
+
+def bls_cpi_payload(series_id_lst, startyear, endyear, seed=0, as_of=None):
+    """
+    Build a BLS timeseries (v2) response with monthly CPI values
+
+    args:
+        series_id_lst:     list of series IDs. id: ['CUUR0000SA0']
+        startyear:         first year
+        endyear:           last year
+        seed:              random seed (the data is deterministic per seed)
+        as_of:             (optional) only months published by this date (the
+                           prior month). Defaults to today
+
+    returns:
+        payload:           dictionary shaped like the BLS JSON response
+    """
+    as_of = as_of or date.today()
+    series = []
+    for series_id in series_id_lst:
+        rng = random.Random(zlib.crc32(f"{seed}:{series_id}".encode()))
+        value = 250.0
+        data = []
+        # [richmosko]: walk from a fixed year, so a month has the same value
+        #              whatever window of years is requested
+        for year in range(min(2000, int(startyear)), int(endyear) + 1):
+            for month in range(1, 13):
+                value *= 1 + rng.uniform(-0.002, 0.006)
+                if (year, month) >= (as_of.year, as_of.month):
+                    break
+                if year < int(startyear):
+                    continue
+                data.append(
+                    {
+                        "year": str(year),
+                        "period": f"M{month:02d}",
+                        "periodName": date(2000, month, 1).strftime("%B"),
+                        "value": f"{value:.3f}",
+                        "footnotes": [{}],
+                    }
+                )
+        data.reverse()  # BLS returns the newest month first
+        series.append({"seriesID": series_id, "data": data})
+    return {"status": "REQUEST_SUCCEEDED", "Results": {"series": series}}
+
+
+def _ticker(idx):
+    """
+    Deterministic made up ticker for a universe index (AAAB, AAAC, ...)
+    """
+    letters = ""
+    num = idx + 1
+    for _ in range(4):
+        num, rem = divmod(num, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _noise(sym, day, salt=0):
+    return zlib.crc32(f"{sym}:{day.toordinal()}:{salt}".encode())
+
+
+def _price(base, phase, sym, day):
+    """
+    Deterministic closing price of sym on day (a slow cycle plus daily noise)
+    """
+    cycle = 1 + 0.25 * math.sin(day.toordinal() / 40 + phase)
+    jitter = 1 + 0.02 * (_noise(sym, day) / 2**32 - 0.5)
+    return round(max(base * cycle * jitter, 0.01), 2)
+
+
+def _quarter_end(day):
+    """
+    Last day of the calendar quarter containing day
+    """
+    q_month = ((day.month - 1) // 3 + 1) * 3
+    if q_month == 12:
+        return date(day.year, 12, 31)
+    return date(day.year, q_month + 1, 1) - timedelta(days=1)
+
+
+def _to_csv(rows):
+    if not rows:
+        return b""
+    buf = io.BytesIO()
+    pl.DataFrame(rows, infer_schema_length=None).write_csv(buf)
+    return buf.getvalue()
@@ -14,10 +14,28 @@ import dotenv
 import re
 import requests
 import json
+import threading
+import time
 import polars as pl
+import sqlalchemy as sqla
+from urllib3.util.request import ACCEPT_ENCODING
+from pfin_back_etl import cassette, perf
 
 logger = logging.getLogger("pfin_etl")
 
+# [richmosko]: shared HTTP connection pool settings (see http_session)
+HTTP_POOL_SIZE = 16
+HTTP_TIMEOUT = 60.0  # seconds (connect and read)
+BLS_API_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
+CPI_SCHEMA = {
+    "year": pl.Int64,
+    "month": pl.Int64,
+    "period_name": pl.String,
+    "series_value": pl.Float64,
+    "series_id": pl.String,
+    "ref_date": pl.String,
+}
+
 
 def col_to_snake(col_list):
     col_dict = {}
@@ -57,6 +75,75 @@ def apply_schema_df(df_src, df_tgt):
     return df_cast
 
 
+def sqla_to_pl_dtype(sqla_type):
+    """
+    Map a reflected sqlalchemy column type to the matching polars data type.
+    Order matters, as the more specific sqlalchemy types subclass the generic
+    ones (ie: BigInteger is an Integer, Enum is a String).
+
+    args:
+        sqla_type:         sqlalchemy column type instance (ie: column.type)
+
+    returns:
+        dtype:             polars data type (None if there's no direct mapping,
+                           in which case polars infers the type)
+    """
+    if isinstance(sqla_type, sqla.Boolean):
+        return pl.Boolean
+    if isinstance(sqla_type, sqla.SmallInteger):
+        return pl.Int16
+    if isinstance(sqla_type, sqla.BigInteger):
+        return pl.Int64
+    if isinstance(sqla_type, sqla.Integer):
+        return pl.Int32
+    if isinstance(sqla_type, (sqla.Numeric, sqla.Float)):
+        # Numeric(p, s) and Float... Decimal math is too slow for the diffs
+        return pl.Float64
+    if isinstance(sqla_type, sqla.DateTime):
+        return pl.Datetime("us", "UTC" if sqla_type.timezone else None)
+    if isinstance(sqla_type, sqla.Date):
+        return pl.Date
+    if isinstance(sqla_type, sqla.Time):
+        return pl.Time
+    if isinstance(sqla_type, sqla.Interval):
+        return pl.Duration("us")
+    if isinstance(sqla_type, sqla.Enum) and sqla_type.enums:
+        # fixed set of categories, so it's safe to join and compare
+        return pl.Enum(sqla_type.enums)
+    if isinstance(sqla_type, (sqla.String, sqla.Uuid)):
+        return pl.String
+    return None
+
+
+def estimate_row_bytes(schema):
+    """
+    Estimate the in-memory size of one row of a polars dataframe with the given
+    schema (used to project frame sizes before anything is fetched).
+
+    args:
+        schema:            dictionary of column names -> polars data types
+
+    returns:
+        row_bytes:         estimated bytes per row
+    """
+    dtype_bytes = {
+        pl.Boolean: 1,
+        pl.Int16: 2,
+        pl.Int32: 4,
+        pl.Int64: 8,
+        pl.Float32: 4,
+        pl.Float64: 8,
+        pl.Date: 4,
+        pl.Time: 8,
+        pl.Datetime: 8,
+        pl.Duration: 8,
+        pl.Enum: 4,
+        pl.String: 32,  # [richmosko]: rough average incl. offsets
+    }
+    row_bytes = sum(dtype_bytes.get(dt.base_type(), 8) for dt in schema.values())
+    return max(row_bytes, 1)
+
+
 def load_env_variables(env_prefix):
     """
     Load the environmental variables from a '.env' file. The variables read
@@ -93,14 +180,138 @@ def load_env_variables(env_prefix):
         )
 
     # Fetch other env variables
+    params["FMP_BASE_URL"] = os.getenv(env_prefix + "FMP_BASE_URL")
     params["DB_USER"] = os.getenv(env_prefix + "DB_USER")
     params["DB_HOST"] = os.getenv(env_prefix + "DB_HOST")
     params["DB_PORT"] = os.getenv(env_prefix + "DB_PORT")
     params["DB_NAME"] = os.getenv(env_prefix + "DB_NAME")
     params["DB_PASSWORD"] = os.getenv(env_prefix + "DB_PASSWORD")
+
+    # Fetch optional database backend env variables
+    params["DB_BACKEND"] = os.getenv(env_prefix + "DB_BACKEND")
+    params["DB_URL"] = os.getenv(env_prefix + "DB_URL")
+    params["DB_SSLMODE"] = os.getenv(env_prefix + "DB_SSLMODE")
+    params["DB_PATH"] = os.getenv(env_prefix + "DB_PATH")
+
+    # Fetch optional scheduling env variables
+    params["STATE_FILE"] = os.getenv(env_prefix + "STATE_FILE")
+    params["TIME_BUDGET"] = os.getenv(env_prefix + "TIME_BUDGET")
+    params["CALL_BUDGET"] = os.getenv(env_prefix + "CALL_BUDGET")
+
+    # Fetch optional instrumentation env variables
+    params["RUN_REPORT"] = os.getenv(env_prefix + "RUN_REPORT")
+    params["PROM_FILE"] = os.getenv(env_prefix + "PROM_FILE")
+    params["SQL_TRACE"] = os.getenv(env_prefix + "SQL_TRACE")
+    params["SQL_SLOW_MS"] = os.getenv(env_prefix + "SQL_SLOW_MS")
+    params["PROFILE"] = os.getenv(env_prefix + "PROFILE")
+    params["PROFILE_TABLES"] = os.getenv(env_prefix + "PROFILE_TABLES")
+    params["PROFILE_DIR"] = os.getenv(env_prefix + "PROFILE_DIR")
+    params["MEM_BUDGET_MB"] = os.getenv(env_prefix + "MEM_BUDGET_MB")
+    params["CASSETTE"] = os.getenv(env_prefix + "CASSETTE")
+    params["CASSETTE_MODE"] = os.getenv(env_prefix + "CASSETTE_MODE") or "replay"
+    params["MIRROR_DIR"] = os.getenv(env_prefix + "MIRROR_DIR")
+    params["SNAPSHOT_CACHE"] = os.getenv(env_prefix + "SNAPSHOT_CACHE")
+    params["SERVER_DIFF"] = os.getenv(env_prefix + "SERVER_DIFF")
+    params["KEY_INDEX"] = os.getenv(env_prefix + "KEY_INDEX")
+    params["KEY_INDEX_DIR"] = os.getenv(env_prefix + "KEY_INDEX_DIR")
+    params["PIPELINE_BATCH"] = os.getenv(env_prefix + "PIPELINE_BATCH")
+    params["PIPELINE_DEPTH"] = os.getenv(env_prefix + "PIPELINE_DEPTH")
+    params["DECODE_WORKERS"] = os.getenv(env_prefix + "DECODE_WORKERS")
+    params["FMP_CONCURRENCY"] = os.getenv(env_prefix + "FMP_CONCURRENCY")
+    params["HTTP_POOL_SIZE"] = os.getenv(env_prefix + "HTTP_POOL_SIZE")
+    params["HTTP_TIMEOUT"] = os.getenv(env_prefix + "HTTP_TIMEOUT")
+
+    # Fetch optional BLS env variables
+    params["BLS_SERIES_ID"] = os.getenv("BLS_SERIES_ID")
+    params["BLS_CACHE_DIR"] = os.getenv(env_prefix + "BLS_CACHE_DIR")
+    params["BLS_WORKERS"] = os.getenv(env_prefix + "BLS_WORKERS")
+
+    # Fetch optional backfill env variables
+    params["BACKFILL_CHECKPOINT"] = os.getenv(env_prefix + "BACKFILL_CHECKPOINT")
+    params["BACKFILL_WORKERS"] = os.getenv(env_prefix + "BACKFILL_WORKERS")
     return params
 
 
+class TimeoutHTTPAdapter(requests.adapters.HTTPAdapter):
+    """
+    requests transport adapter with a default timeout for every request
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+_http = {"adapter": None, "session": None}
+_http_lock = threading.Lock()
+
+
+def http_session():
+    """
+    The shared requests session of the process (BLS calls), with pooled
+    keep-alive connections, a default timeout, and compressed responses
+    (gzip, and brotli when the brotli package is installed)
+
+    returns:
+        session:           requests.Session
+    """
+    with _http_lock:
+        if _http["session"] is None:
+            _http["session"] = requests.Session()
+        session = _http["session"]
+    mount_http(session)
+    return session
+
+
+def mount_http(session):
+    """
+    Route a requests session (ie: the fmpstab one of PFinFMP) through the
+    shared connection pool
+
+    args:
+        session:           requests.Session (or subclass)
+    """
+    with _http_lock:
+        if _http["adapter"] is None:
+            _http["adapter"] = TimeoutHTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+            )
+        adapter = _http["adapter"]
+    if session.get_adapter("https://") is not adapter:
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+
+def configure_http(pool_size=None, timeout=None):
+    """
+    Resize the shared connection pool and set its default timeout. The
+    sessions already routed through it pick up the new pool on their next
+    mount_http (http_session and PFinBackend do that).
+
+    args:
+        pool_size:         (optional) max pooled connections per host
+        timeout:           (optional) default request timeout in seconds
+    """
+    global HTTP_POOL_SIZE, HTTP_TIMEOUT
+    with _http_lock:
+        HTTP_POOL_SIZE = int(pool_size or HTTP_POOL_SIZE)
+        HTTP_TIMEOUT = float(timeout or HTTP_TIMEOUT)
+        old = _http["adapter"]
+        _http["adapter"] = TimeoutHTTPAdapter(
+            timeout=HTTP_TIMEOUT,
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+        )
+    if old is not None:
+        old.close()
+
+
 def sqla_modulename_for_table(tablename, declarativetable, reflecttable):
     """
     This function needs to be defined with the above input arguments
@@ -150,8 +361,19 @@ def fetch_cpi_df(api_key, startyear, endyear, series_id_lst):
             "endyear": endyear,
         }
     )
-    p = requests.post(
-        "https://api.bls.gov/publicAPI/v2/timeseries/data/", data=data, headers=headers
+    t_start = time.perf_counter()
+    p = cassette.call(
+        "bls",
+        "timeseries_data",
+        {"seriesid": series_id_lst, "startyear": startyear, "endyear": endyear},
+        lambda: http_session().post(BLS_API_URL, data=data, headers=headers),
+    )
+    perf.api_stats.record(
+        "bls_timeseries_data",
+        time.perf_counter() - t_start,
+        nbytes=len(p.content),
+        error=not p.ok,
+        rate_limited=(p.status_code == 429),
     )
     json_data = json.loads(p.text)
 
@@ -161,6 +383,8 @@ def fetch_cpi_df(api_key, startyear, endyear, series_id_lst):
 
     df_list = []
     for series in json_data["Results"]["series"]:
+        if not series["data"]:
+            continue  # [richmosko]: ie: the current year, before its first release
         df = pl.DataFrame(series["data"])
         df = df.rename(col_to_snake(df.columns))
         df = df.with_columns(pl.lit(series["seriesID"]).alias("series_id"))
@@ -180,5 +404,7 @@ def fetch_cpi_df(api_key, startyear, endyear, series_id_lst):
         df = df.drop("footnotes")
         df = df.with_columns(pl.format("{}-{}-14", "year", "month").alias("ref_date"))
         df_list.append(df)
+    if not df_list:
+        return pl.DataFrame(schema=CPI_SCHEMA)
     df_cpi = pl.concat(df_list, how="vertical_relaxed")
     return df_cpi
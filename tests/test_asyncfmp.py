@@ -0,0 +1,131 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the asyncio FMP client in pfin_back_etl.asyncfmp.
+    These tests run on an in-memory httpx transport (no API). They are
+    skipped when the optional httpx dependency isn't installed.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import pytest
+from pfin_back_etl import asyncfmp, perf
+from pfin_back_etl.core import PFinFMP
+
+httpx = pytest.importorskip("httpx")
+
+
+def _make_client(handler, max_concurrency=4):
+    return asyncfmp.AsyncPFinFMP(
+        "test",
+        base_url="http://fmp.test/stable",
+        max_calls_per_minute=600000,
+        max_concurrency=max_concurrency,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+class TestAsyncRateLimiter:
+    """Tests for spacing out the calls of the async client."""
+
+    @pytest.mark.unit
+    def test_spaces_calls(self):
+        limiter = asyncfmp.AsyncRateLimiter(per_minute=1200)  # 50ms apart
+
+        async def run():
+            t_start = time.monotonic()
+            await asyncio.gather(*[limiter.acquire() for _ in range(3)])
+            return time.monotonic() - t_start
+
+        assert asyncio.run(run()) >= 0.09
+
+
+class TestAsyncPFinFMP:
+    """Tests for the async endpoint calls and list fan out."""
+
+    @pytest.mark.unit
+    def test_fan_out_is_ordered_and_bounded(self):
+        in_flight = {"now": 0, "max": 0}
+
+        async def handler(request):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            assert request.url.path == "/stable/historical-price-eod/full"
+            assert request.url.params["from"] == "2024-01-01"
+            symbol = request.url.params["symbol"]
+            body = [{"symbol": symbol, "closePrice": 1.0, "link": "x"}]
+            return httpx.Response(200, content=json.dumps(body).encode())
+
+        async def run():
+            async with _make_client(handler, max_concurrency=3) as client:
+                return await client.fetch_fmp_list_df(
+                    client.historical_full,
+                    "symbol",
+                    columns={"symbol", "close_price"},
+                    symbol=[f"S{idx}" for idx in range(10)],
+                    start_date="2024-01-01",
+                )
+
+        df = asyncio.run(run())
+        assert df["symbol"].to_list() == [f"S{idx}" for idx in range(10)]
+        assert df.columns == ["symbol", "close_price"]
+        assert in_flight["max"] == 3
+
+    @pytest.mark.unit
+    def test_retries_rate_limited(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.params["symbol"])
+            if len(calls) == 1:
+                return httpx.Response(429)
+            return httpx.Response(200, content=b"[]")
+
+        async def run():
+            async with _make_client(handler) as client:
+                client._retry_backoff = 0.0
+                return await client.fetch_fmp_df(client.profile, symbol="AAPL")
+
+        perf.api_stats.reset()
+        assert asyncio.run(run()).is_empty()
+        agg = perf.api_stats.summary()["profile"]
+        assert (agg["calls"], agg["status_429"], agg["retries"]) == (2, 1, 1)
+        perf.api_stats.reset()
+
+
+class TestPFinFMPAsync:
+    """Tests for the PFinFMP list fetches on the async client."""
+
+    @pytest.mark.unit
+    def test_one_client_and_loop_per_run(self, monkeypatch):
+        threads = []
+
+        def handler(request):
+            threads.append(threading.current_thread().name)
+            body = [{"symbol": request.url.params["symbol"], "closePrice": 1.0}]
+            return httpx.Response(200, content=json.dumps(body).encode())
+
+        real_client = asyncfmp.AsyncPFinFMP
+
+        def make_client(*args, **kwargs):
+            return real_client(*args, transport=httpx.MockTransport(handler), **kwargs)
+
+        monkeypatch.setattr(asyncfmp, "AsyncPFinFMP", make_client)
+        fmp = PFinFMP("test", base_url="http://fmp.test/stable")
+        fmp.enable_async(4)
+        client = fmp._async_client
+        thread = fmp._async_thread
+        for symbols in (["A", "B"], ["C"]):
+            df = fmp.fetch_fmp_list_df(fmp.historical_full, "symbol", symbol=symbols)
+            assert df["symbol"].to_list() == symbols
+        assert fmp._async_client is client
+        assert set(threads) == {"fmp-async"}
+        fmp.close_async()
+        assert fmp._async_client is None and not thread.is_alive()
+        assert client._client.is_closed
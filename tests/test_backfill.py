@@ -0,0 +1,251 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the historical backfill in pfin_back_etl.backfill and
+    PFinBackend.backfill. These tests run on a temporary SQLite database with
+    the FMP calls mocked (no external DB, no API).
+"""
+
+import json
+import os
+from datetime import date, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+import polars as pl
+import requests
+from pfin_back_etl import PFinBackend, backfill, cassette
+
+
+def _make_backend(db_dir):
+    env = {
+        "FMP_API_KEY": "test",
+        "BLS_API_KEY": "test",
+        "PFIN_DB_BACKEND": "sqlite",
+        "PFIN_DB_PATH": str(db_dir),
+        "PFIN_STATE_FILE": str(db_dir / "state.json"),
+        "PFIN_BACKFILL_CHECKPOINT": str(db_dir / "checkpoint.json"),
+    }
+    with patch.dict(os.environ, env):
+        return PFinBackend()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return _make_backend(tmp_path)
+
+
+class TestPlanChunks:
+    """Tests for splitting a backfill into symbol/date chunks."""
+
+    @pytest.mark.unit
+    def test_symbol_and_date_chunks(self):
+        chunks = backfill.plan_chunks(
+            ["C", "A", "B"],
+            date(2020, 1, 1),
+            date(2020, 1, 25),
+            symbols_per_chunk=2,
+            days_per_chunk=10,
+        )
+        assert [(c.symbols, c.start.day, c.end.day) for c in chunks] == [
+            (("A", "B"), 1, 10),
+            (("C",), 1, 10),
+            (("A", "B"), 11, 20),
+            (("C",), 11, 20),
+            (("A", "B"), 21, 25),
+            (("C",), 21, 25),
+        ]
+        assert len({chunk.key for chunk in chunks}) == 6
+
+    @pytest.mark.unit
+    def test_open_end_keys_stable(self):
+        """Without an end date, the chunks keep their keys day to day."""
+        start = date.today() - timedelta(days=15)
+        chunks = backfill.plan_chunks(["A"], start, days_per_chunk=10)
+        assert chunks[-1].end == date.today()
+        assert chunks[-1].key.startswith(f"{start + timedelta(days=10)}..")
+        # [richmosko]: 10 days later, past the next chunk boundary
+        with patch.object(backfill, "date") as mock_date:
+            mock_date.today.return_value = date.today() + timedelta(days=10)
+            later = backfill.plan_chunks(["A"], start, days_per_chunk=10)
+            single = backfill.plan_chunks(["A"], start)
+        assert len(later) == 3
+        assert {chunk.key for chunk in chunks} < {chunk.key for chunk in later}
+        assert single[0].key == backfill.plan_chunks(["A"], start)[0].key
+        assert backfill.run_name("eod_price", start) == f"eod_price:{start}.."
+
+
+class TestBackfillRunner:
+    """Tests for the checkpoints, failures and call budget of the runner."""
+
+    CHUNKS = backfill.plan_chunks(
+        ["A", "B", "C", "D"], date(2020, 1, 1), date(2020, 1, 2), symbols_per_chunk=1
+    )
+
+    @pytest.mark.unit
+    def test_resumes_after_failure(self, tmp_path):
+        written = []
+        fail = {"B"}
+
+        def write(chunk, data):
+            if data in fail:
+                fail.discard(data)
+                raise ValueError("boom")
+            written.append(data)
+
+        runner = backfill.Backfill(str(tmp_path / "ckpt.json"), workers=2)
+        with pytest.raises(RuntimeError, match="1 of 4 chunk"):
+            runner.run("eod_price", self.CHUNKS, lambda c: c.symbols[0], write)
+        written.append("-")
+
+        runner = backfill.Backfill(str(tmp_path / "ckpt.json"), workers=2)
+        runner.run("eod_price", self.CHUNKS, lambda c: c.symbols[0], write)
+        assert written == ["A", "C", "D", "-", "B"]
+        assert runner.stats["checkpointed"] == 3
+
+    @pytest.mark.unit
+    def test_call_budget_defers_chunks(self, tmp_path):
+        written = []
+        runner = backfill.Backfill(str(tmp_path / "ckpt.json"))
+        left = runner.run(
+            "eod_price",
+            self.CHUNKS,
+            lambda c: c.symbols[0],
+            lambda chunk, data: written.append(data),
+            call_budget=3,
+        )
+        assert (written, left, runner.stats["deferred"]) == (["A", "B", "C"], 0, 1)
+
+
+class TestBackfillEodPrice:
+    """Tests for the eod_price backfill: copy into empty ranges, else diff."""
+
+    @staticmethod
+    def _fmp_rows(fmp_func, key, columns=None, **kwargs):
+        rows = []
+        for sym in kwargs["symbol"]:
+            for day in pl.date_range(
+                date.fromisoformat(kwargs["start_date"]),
+                date.fromisoformat(kwargs["end_date"]),
+                eager=True,
+            ):
+                rows.append({"symbol": sym, "date": day.isoformat(), "close": 1.5})
+        return pl.DataFrame(rows)
+
+    @pytest.mark.unit
+    def test_copy_then_diff(self, sqlite_backend):
+        pfb = sqlite_backend
+        tab_cat = pfb.get_reflected_table("pfin", "asset_cat")
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        tab_eod = pfb.get_reflected_table("pfin", "eod_price")
+        pfb.insert_table_df(
+            tab_cat, pl.DataFrame({"cat": ["Equity"], "sub_cat": ["x"]})
+        )
+        pfb.insert_table_df(
+            tab_asset,
+            pl.DataFrame(
+                {"symbol": ["AAA", "BBB"], "asset_cat_id": [1, 1], "has_chart": True}
+            ),
+        )
+        pfb.insert_table_df(
+            tab_eod,
+            pl.DataFrame(
+                {"asset_id": [2], "end_date": [date(2024, 1, 9)], "close": [9.0]}
+            ),
+        )
+
+        with patch.object(pfb.fmp_client, "fetch_fmp_list_df", self._fmp_rows):
+            pfb.backfill(
+                ["eod_price"],
+                date(2024, 1, 1),
+                date(2024, 1, 10),
+                symbols_per_chunk=1,
+                days_per_chunk=5,
+            )
+        stats = pfb.backfill_runner.stats
+        assert (stats["chunks_copy"], stats["chunks_diff"]) == (3, 1)
+        df_eod = pfb.fetch_table_df(tab_eod)
+        assert len(df_eod) == 20
+        assert df_eod["close"].unique().to_list() == [1.5]
+
+    @staticmethod
+    def _add_assets(pfb):
+        tab_cat = pfb.get_reflected_table("pfin", "asset_cat")
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        pfb.insert_table_df(
+            tab_cat, pl.DataFrame({"cat": ["Equity"], "sub_cat": ["x"]})
+        )
+        pfb.insert_table_df(
+            tab_asset,
+            pl.DataFrame(
+                {"symbol": ["AAA", "BBB"], "asset_cat_id": [1, 1], "has_chart": True}
+            ),
+        )
+
+    @pytest.mark.unit
+    def test_date_chunks_replay_from_cassette(self, tmp_path):
+        """Each date chunk is recorded and replayed on its own."""
+
+        def historical_full(symbol, start_date, end_date):
+            rows = self._fmp_rows(
+                None,
+                "symbol",
+                symbol=[symbol],
+                start_date=start_date,
+                end_date=end_date,
+            )
+            rsp = requests.Response()
+            rsp.status_code = 200
+            rsp._content = json.dumps(rows.to_dicts()).encode()
+            return rsp
+
+        tape_file = str(tmp_path / "tape.zip")
+        df_list = []
+        for mode in ("record", "replay"):
+            db_dir = tmp_path / mode
+            db_dir.mkdir()
+            pfb = _make_backend(db_dir)
+            self._add_assets(pfb)
+            cassette.use(tape_file, mode)
+            try:
+                with patch.object(pfb.fmp_client, "historical_full", historical_full):
+                    pfb.backfill(
+                        ["eod_price"],
+                        date(2024, 1, 1),
+                        date(2024, 1, 10),
+                        symbols_per_chunk=1,
+                        days_per_chunk=5,
+                    )
+            finally:
+                cassette.eject()
+            tab_eod = pfb.get_reflected_table("pfin", "eod_price")
+            df_list.append(
+                pfb.fetch_table_df(tab_eod)
+                .select(["asset_id", "end_date"])
+                .sort(["asset_id", "end_date"])
+            )
+        assert len(df_list[1]) == 20
+        assert df_list[1].equals(df_list[0])
+
+
+class TestBackfillStatements:
+    """Tests for the statement backfill depth."""
+
+    @pytest.mark.unit
+    def test_depth_runs_from_start_to_today(self, sqlite_backend):
+        """A past end date still loads the quarters back to the start date."""
+        pfb = sqlite_backend
+        pfb._fetch_asset_map_financials = MagicMock(return_value={"AAA": 1})
+        pfb.update_table_income_statement = MagicMock()
+        df_fmp = pl.DataFrame({"symbol": ["AAA"]})
+        pfb.fmp_client.get_statements = MagicMock(return_value=df_fmp)
+        start = date.today() - timedelta(days=3 * 365 + 30)
+        pfb.backfill(["income_statement"], start, start + timedelta(days=60))
+        # [richmosko]: fetched on a backfill worker, then written
+        (args, _) = pfb.fmp_client.get_statements.call_args
+        assert args[1:] == (["AAA"], 16)
+        pfb.update_table_income_statement.assert_called_once_with(
+            sym_list=["AAA"], years=4, df_fmp=df_fmp
+        )
@@ -0,0 +1,106 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the windowed BLS CPI fetcher in pfin_back_etl.bls.
+    The BLS API is answered by synth.bls_cpi_payload (no API).
+"""
+
+import json
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+import requests
+from pfin_back_etl import bls, cassette, synth, utils
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def bls_api():
+    requests_seen = []
+
+    def post(url, data=None, headers=None, **kwargs):
+        req = json.loads(data)
+        requests_seen.append((req["seriesid"], req["startyear"], req["endyear"]))
+        payload = synth.bls_cpi_payload(
+            req["seriesid"], req["startyear"], req["endyear"], as_of=TODAY
+        )
+        rsp = requests.Response()
+        rsp.status_code = 200
+        rsp.encoding = "utf-8"
+        rsp._content = json.dumps(payload).encode()
+        return rsp
+
+    with patch.object(utils.http_session(), "post", post):
+        yield requests_seen
+
+
+class TestPlanWindows:
+    """Tests for splitting series and years into BLS request windows."""
+
+    @pytest.mark.unit
+    def test_year_and_series_limits(self):
+        years = list(range(1990, 2027))
+        windows = bls.plan_windows(
+            {"A": years, "B": years, "C": years}, max_years=20, max_series=2
+        )
+        assert windows == [
+            (["A", "B"], 1990, 2009),
+            (["C"], 1990, 2009),
+            (["A", "B"], 2010, 2026),
+            (["C"], 2010, 2026),
+        ]
+
+    @pytest.mark.unit
+    def test_gaps_split_windows(self):
+        windows = bls.plan_windows({"A": [2020, 2021, 2025, 2026], "B": [2025, 2026]})
+        assert windows == [(["A"], 2020, 2021), (["A", "B"], 2025, 2026)]
+
+
+class TestCpiFetcher:
+    """Tests for the concurrent windowed fetch and the closed years cache."""
+
+    SERIES = ["CUUR0000SA0", "CUSR0000SA0"]
+
+    @pytest.mark.unit
+    def test_windows_merge_like_one_request(self, bls_api):
+        fetcher = bls.CpiFetcher("key", max_years=3, max_series=1)
+        df = fetcher.fetch(2017, 2026, self.SERIES, today=TODAY)
+        assert len(bls_api) == 8  # 4 windows of years x 2 series
+        df_one = utils.fetch_cpi_df("key", 2017, 2026, self.SERIES)
+        assert df.equals(df_one.select(df.columns).sort(["series_id", "year", "month"]))
+        assert df.select(["series_id", "year", "month"]).is_unique().all()
+
+    @pytest.mark.unit
+    def test_closed_years_cached(self, bls_api, tmp_path):
+        bls.CpiFetcher("key", str(tmp_path)).fetch(2017, 2026, self.SERIES, today=TODAY)
+        bls_api.clear()
+        fetcher = bls.CpiFetcher("key", str(tmp_path))
+        df = fetcher.fetch(2017, 2026, self.SERIES, today=TODAY)
+        # [richmosko]: NSA only re-fetches the current year, SA the last 5 years
+        assert sorted(bls_api) == [
+            (["CUSR0000SA0"], 2022, 2026),
+            (["CUUR0000SA0"], 2026, 2026),
+        ]
+        assert len(df) == 2 * (9 * 12 + 9)
+        assert fetcher.stats["cached_years"] == 9 + 5
+
+    @pytest.mark.unit
+    def test_windows_replay_from_cassette(self, bls_api, tmp_path):
+        """Each year window is recorded and replayed on its own."""
+        tape_file = str(tmp_path / "tape.zip")
+        fetcher = bls.CpiFetcher("key", max_years=3, max_series=1)
+        cassette.use(tape_file, "record")
+        df_live = fetcher.fetch(2017, 2026, self.SERIES, today=TODAY)
+        cassette.use(tape_file, "replay")
+        bls_api.clear()
+        fetcher = bls.CpiFetcher("key", max_years=3, max_series=1)
+        try:
+            df_replay = fetcher.fetch(2017, 2026, self.SERIES, today=TODAY)
+        finally:
+            cassette.eject()
+        assert bls_api == []
+        assert df_replay.equals(df_live)
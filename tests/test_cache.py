@@ -0,0 +1,79 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the run-scoped snapshot cache in pfin_back_etl.cache.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import pytest
+import sqlalchemy as sqla
+from unittest.mock import MagicMock
+from pfin_back_etl import cache
+
+
+@pytest.fixture
+def tables():
+    metadata = sqla.MetaData()
+    tab_cat = sqla.Table(
+        "asset_cat",
+        metadata,
+        sqla.Column("id", sqla.Integer, primary_key=True),
+        sqla.Column("cat", sqla.String),
+        schema="pfin",
+    )
+    tab_asset = sqla.Table(
+        "asset",
+        metadata,
+        sqla.Column("id", sqla.Integer, primary_key=True),
+        sqla.Column("symbol", sqla.String),
+        sqla.Column("asset_cat_id", sqla.ForeignKey("pfin.asset_cat.id")),
+        schema="pfin",
+    )
+    return (tab_asset, tab_cat)
+
+
+class TestSnapshotCache:
+    """Tests for caching reads and invalidating them on writes."""
+
+    @pytest.mark.unit
+    def test_stmt_key(self, tables):
+        (tab_asset, tab_cat) = tables
+        stmt = sqla.select(tab_asset.c.symbol).join(tab_cat)
+        (key, deps) = cache.stmt_key(stmt.where(tab_cat.c.cat == "Equity"))
+        (key_etf, _) = cache.stmt_key(stmt.where(tab_cat.c.cat == "ETF"))
+        assert deps == {"pfin.asset", "pfin.asset_cat"}
+        assert key != key_etf
+
+    @pytest.mark.unit
+    def test_hits_and_invalidation(self, tables):
+        (tab_asset, tab_cat) = tables
+        snap = cache.SnapshotCache()
+        fetch = MagicMock(return_value=["AAPL"])
+        (key, deps) = cache.stmt_key(sqla.select(tab_asset).join(tab_cat))
+        assert snap.get_or_fetch(key, deps, fetch) == ["AAPL"]
+        assert snap.get_or_fetch(key, deps, fetch) == ["AAPL"]
+        assert fetch.call_count == 1
+
+        snap.invalidate("pfin.cpi")  # unrelated table
+        snap.get_or_fetch(key, deps, fetch)
+        assert fetch.call_count == 1
+        snap.invalidate("pfin.asset_cat")
+        snap.get_or_fetch(key, deps, fetch)
+        assert fetch.call_count == 2
+
+        summary = snap.summary()
+        assert (summary["hits"], summary["misses"]) == (2, 2)
+        assert summary["invalidations"] == 1
+        assert summary["table_hits"]["pfin.asset"] == 2
+
+    @pytest.mark.unit
+    def test_clear(self):
+        snap = cache.SnapshotCache()
+        fetch = MagicMock(return_value=1)
+        snap.get_or_fetch("k", {"pfin.asset"}, fetch)
+        snap.clear()
+        snap.get_or_fetch("k", {"pfin.asset"}, fetch)
+        assert fetch.call_count == 2
+        assert snap.summary()["entries"] == 1
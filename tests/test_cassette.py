@@ -0,0 +1,101 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the API record/replay cassettes in pfin_back_etl.cassette.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import pytest
+import requests
+from datetime import date
+from unittest.mock import MagicMock
+from pfin_back_etl import cassette
+from pfin_back_etl.core import PFinFMP
+
+
+def _response(body, status=200):
+    rsp = requests.Response()
+    rsp.status_code = status
+    rsp._content = body
+    return rsp
+
+
+@pytest.fixture
+def tape_file(tmp_path):
+    yield str(tmp_path / "tape.zip")
+    cassette.eject()
+
+
+class TestCassette:
+    """Tests for recording and replaying API responses."""
+
+    @pytest.mark.unit
+    def test_record_then_replay(self, tape_file):
+        live = MagicMock(return_value=_response(b'[{"symbol": "AAPL"}]'))
+        args = {"symbol": "AAPL", "start_date": "2021-01-01"}
+        tape = cassette.use(tape_file, "record")
+        tape.today = date(2026, 1, 1)
+        rsp = cassette.call("fmp", "historical_full", args, live)
+        cassette.call("fmp", "historical_full", args, live)  # first one wins
+        cassette.eject()
+        assert rsp.json() == [{"symbol": "AAPL"}]
+
+        # [richmosko]: a later day asks for a later window... same recording
+        tape = cassette.use(tape_file, "replay")
+        tape.today = date(2026, 1, 2)
+        args = {"symbol": "AAPL", "start_date": "2021-01-02"}
+        rsp = cassette.call("fmp", "historical_full", args, live)
+        assert rsp.json() == [{"symbol": "AAPL"}]
+        assert live.call_count == 2
+        assert tape.hits == 1
+
+    @pytest.mark.unit
+    def test_windows_recorded_apart(self, tape_file):
+        """Different date windows of one run replay their own responses."""
+        windows = [("2016-01-01", "2020-12-31"), ("2021-01-01", "2025-12-31")]
+
+        def live_for(window):
+            return lambda: _response(f'[{{"from": "{window[0]}"}}]'.encode())
+
+        cassette.use(tape_file, "record")
+        for window in windows:
+            args = {"symbol": "AAPL", "from": window[0], "to": window[1]}
+            cassette.call("fmp", "historical_full", args, live_for(window))
+        cassette.eject()
+
+        tape = cassette.use(tape_file, "replay")
+        for window in windows:
+            args = {"symbol": "AAPL", "from": window[0], "to": window[1]}
+            rsp = cassette.call("fmp", "historical_full", args, None)
+            assert rsp.json() == [{"from": window[0]}]
+        assert tape.hits == 2
+
+    @pytest.mark.unit
+    def test_replay_miss_and_errors_not_recorded(self, tape_file):
+        cassette.use(tape_file, "record")
+        live = MagicMock(return_value=_response(b"{}", status=500))
+        cassette.call("fmp", "profile", {"symbol": "AAPL"}, live)
+        cassette.eject()
+
+        cassette.use(tape_file, "replay")
+        with pytest.raises(cassette.CassetteMiss, match="fmp/profile/"):
+            cassette.call("fmp", "profile", {"symbol": "AAPL"}, live)
+
+    @pytest.mark.unit
+    def test_unknown_mode_raises(self, tape_file):
+        with pytest.raises(ValueError, match="Unknown cassette mode"):
+            cassette.Cassette(tape_file, "rewind")
+
+    @pytest.mark.unit
+    def test_fmp_calls_replay_without_network(self, tape_file):
+        client = PFinFMP("test")
+        live = MagicMock(__name__="earnings")
+        live.return_value = _response(b'[{"symbol": "NVDA", "epsActual": 1.1}]')
+        cassette.use(tape_file, "record")
+        client.fetch_fmp_df(live, symbol="NVDA", limit=22)
+        cassette.use(tape_file, "replay")
+        df = client.fetch_fmp_df(live, symbol="NVDA", limit=22)
+        assert live.call_count == 1
+        assert df["eps_actual"].to_list() == [1.1]
@@ -8,10 +8,15 @@ Description:
     database or API connections.
 """
 
+import os
 import pytest
 import polars as pl
-from unittest.mock import MagicMock
-from pfin_back_etl.core import SBaseConn, PFinFMP
+import requests
+import sqlalchemy as sqla
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+from pfin_back_etl import perf, pipeline, schedule
+from pfin_back_etl.core import SBaseConn, PFinFMP, PFinBackend
 
 
 # ===================================================================
@@ -144,6 +149,84 @@ class TestCalcCommonCols:
         assert len(df_new) == 3
 
 
+class TestSetDtypeDf:
+    """Tests for _set_dtype_df — types a DataFrame from the reflected table."""
+
+    @staticmethod
+    def _mock_table():
+        meta = sqla.MetaData()
+        tab = sqla.Table(
+            "reporting_period",
+            meta,
+            sqla.Column("id", sqla.BigInteger),
+            sqla.Column("asset_id", sqla.Integer),
+            sqla.Column("fiscal_year", sqla.SmallInteger),
+            sqla.Column("period", sqla.Enum("Q1", "Q2", "Q3", "Q4", name="period")),
+            sqla.Column("end_date", sqla.Date),
+            sqla.Column("accepted_date", sqla.DateTime(timezone=True)),
+            sqla.Column("revenue", sqla.Numeric),
+        )
+        mock_table = MagicMock()
+        mock_table.__table__ = tab
+        return mock_table
+
+    @pytest.mark.unit
+    def test_api_strings_typed(self):
+        conn = object.__new__(SBaseConn)
+        df_api = pl.DataFrame(
+            {
+                "asset_id": [1],
+                "fiscal_year": ["2024"],
+                "period": ["Q3"],
+                "end_date": ["2024-09-28"],
+                "accepted_date": ["2024-11-01 06:01:36"],
+                "revenue": [94930000000],
+                "extra_field": ["kept"],
+            }
+        )
+        result = conn._set_dtype_df(self._mock_table(), df_api)
+        assert result.schema["asset_id"] == pl.Int32
+        assert result.schema["fiscal_year"] == pl.Int16
+        assert result.schema["period"] == pl.Enum(["Q1", "Q2", "Q3", "Q4"])
+        assert result.schema["end_date"] == pl.Date
+        assert result.schema["accepted_date"] == pl.Datetime("us", "UTC")
+        assert result.schema["revenue"] == pl.Float64
+        assert result.schema["extra_field"] == pl.String
+        assert result["end_date"][0] == date(2024, 9, 28)
+
+    @pytest.mark.unit
+    def test_bad_values_become_null(self):
+        conn = object.__new__(SBaseConn)
+        df_api = pl.DataFrame(
+            {
+                "period": ["FY", "Q1"],
+                "end_date": ["n/a", None],
+                "accepted_date": ["n/a", "n/a"],
+            }
+        )
+        result = conn._set_dtype_df(self._mock_table(), df_api)
+        assert result["period"].to_list() == [None, "Q1"]
+        assert result["end_date"].to_list() == [None, None]
+        assert result["accepted_date"].to_list() == [None, None]
+        assert result.schema["accepted_date"] == pl.Datetime("us", "UTC")
+
+    @pytest.mark.unit
+    def test_typed_keys_join_db_frame(self):
+        """FMP keys join against the reflected (Enum/Int32) DB keys."""
+        conn = object.__new__(SBaseConn)
+        tab = self._mock_table()
+        df_rp = pl.DataFrame(
+            {"id": [7], "asset_id": [1], "fiscal_year": [2024], "period": ["Q3"]}
+        )
+        df_rp = conn._set_dtype_df(tab, df_rp)
+        df_api = pl.DataFrame(
+            {"asset_id": [1], "fiscal_year": ["2024"], "period": ["Q3"]}
+        )
+        df_api = conn._set_dtype_df(tab, df_api)
+        df_mrg = df_rp.join(df_api, on=["asset_id", "fiscal_year", "period"])
+        assert df_mrg["id"].to_list() == [7]
+
+
 # ===================================================================
 # PFinFMP (tested with mocked API calls)
 # ===================================================================
@@ -183,6 +266,25 @@ class TestPFinFMP:
         result = fmp.fetch_fmp_df(mock_func, symbol="FAKE")
         assert len(result) == 0
 
+    @pytest.mark.unit
+    def test_fetch_fmp_df_prunes_columns(self):
+        """Only the requested (snake_case) fields are decoded."""
+        fmp = object.__new__(PFinFMP)
+
+        mock_func = MagicMock()
+        mock_func.__name__ = "test_api"
+        mock_response = MagicMock()
+        mock_response.json.return_value = [
+            {"symbol": "AAPL", "netIncome": 1000000, "link": "https://..."}
+        ]
+        mock_func.return_value = mock_response
+
+        result = fmp.fetch_fmp_df(
+            mock_func, columns={"symbol", "net_income"}, symbol="AAPL"
+        )
+        assert result.columns == ["symbol", "net_income"]
+        assert mock_func.call_args.kwargs == {"symbol": "AAPL"}
+
     @pytest.mark.unit
     def test_fetch_fmp_list_df_concatenates(self):
         """Verify multiple API calls are concatenated into one DataFrame."""
@@ -204,3 +306,604 @@ class TestPFinFMP:
 
         assert len(result) == 3
         assert sorted(result["symbol"].to_list()) == ["AAPL", "META", "NVDA"]
+
+    @staticmethod
+    def _make_batch_client(batch_size=2):
+        fmp = object.__new__(PFinFMP)
+        fmp._batch_size = batch_size
+        fmp._unsupported = set()
+        return fmp
+
+    @pytest.mark.unit
+    def test_call_fmp_retries_rate_limited(self):
+        """HTTP 429 responses are retried and counted in the API stats."""
+        fmp = self._make_batch_client()
+        fmp._retry_backoff = 0.0
+        perf.api_stats.reset()
+
+        rsp_429 = requests.Response()
+        rsp_429.status_code = 429
+        mock_rsp = MagicMock(content=b"[]")
+        mock_func = MagicMock(__name__="earnings")
+        mock_func.side_effect = [requests.HTTPError(response=rsp_429), mock_rsp]
+
+        assert fmp._call_fmp(mock_func, symbol="AAPL") is mock_rsp
+        agg = perf.api_stats.summary()["earnings"]
+        assert agg["calls"] == 2
+        assert agg["status_429"] == 1
+        assert agg["retries"] == 1
+        assert agg["bytes"] == 2
+        perf.api_stats.reset()
+
+    @pytest.mark.unit
+    def test_call_fmp_stats_keyed_on_endpoint(self):
+        """API stats of a real endpoint function land under the endpoint name."""
+        fmp = PFinFMP("test")
+        perf.api_stats.reset()
+        rsp = MagicMock(content=b"[]")
+        with patch("pfin_back_etl.core.cassette.call", return_value=rsp):
+            fmp._call_fmp(fmp.income_statement, symbol="AAPL")
+            fmp._call_fmp(fmp.balance_sheet_statement, symbol="AAPL")
+        stats = perf.api_stats.summary()
+        assert stats["income_statement"]["calls"] == 1
+        assert stats["balance_sheet_statement"]["calls"] == 1
+        assert "method" not in stats
+        perf.api_stats.reset()
+
+    @pytest.mark.unit
+    def test_call_fmp_gives_up_after_max_retries(self):
+        fmp = self._make_batch_client()
+        fmp._retry_backoff = 0.0
+        fmp._max_retries = 1
+
+        rsp_429 = requests.Response()
+        rsp_429.status_code = 429
+        mock_func = MagicMock(__name__="earnings")
+        mock_func.side_effect = requests.HTTPError(response=rsp_429)
+
+        with pytest.raises(requests.HTTPError):
+            fmp._call_fmp(mock_func, symbol="AAPL")
+        assert mock_func.call_count == 2
+        perf.api_stats.reset()
+
+    @pytest.mark.unit
+    def test_fetch_fmp_batch_df_fills_missing(self):
+        """Symbols missing from a batch response are fetched one at a time."""
+        fmp = self._make_batch_client()
+        calls = []
+
+        def mock_fetch_fmp_df(func, **kwargs):
+            calls.append(kwargs["symbol"])
+            syms = [s for s in kwargs["symbol"].split(",") if s != "NVDA"]
+            return pl.DataFrame({"symbol": syms, "price": [1.0] * len(syms)})
+
+        fmp.fetch_fmp_df = mock_fetch_fmp_df
+        mock_func = MagicMock(__name__="profile")
+        result = fmp.fetch_fmp_batch_df(
+            mock_func, "symbol", symbol=["AAPL", "NVDA", "META"]
+        )
+
+        assert calls == ["AAPL,NVDA", "NVDA", "META"]
+        assert sorted(result["symbol"].to_list()) == ["AAPL", "META"]
+
+    @pytest.mark.unit
+    def test_fetch_fmp_batch_df_unsupported_falls_back(self):
+        """When the plan rejects batch requests, fall back to one call per item."""
+        fmp = self._make_batch_client()
+        calls = []
+
+        def mock_fetch_fmp_df(func, **kwargs):
+            calls.append(kwargs["symbol"])
+            if "," in kwargs["symbol"]:
+                return pl.DataFrame({"error message": ["Premium endpoint"]})
+            return pl.DataFrame({"symbol": [kwargs["symbol"]]})
+
+        fmp.fetch_fmp_df = mock_fetch_fmp_df
+        mock_func = MagicMock(__name__="profile")
+        result = fmp.fetch_fmp_batch_df(
+            mock_func, "symbol", symbol=["AAPL", "NVDA", "META", "MSFT"]
+        )
+
+        # After the first rejected batch, no more batches are attempted
+        assert calls == ["AAPL,NVDA", "AAPL", "NVDA", "META", "MSFT"]
+        assert "profile" in fmp._unsupported
+        assert len(result) == 4
+
+    @staticmethod
+    def _http_error(status):
+        rsp = requests.Response()
+        rsp.status_code = status
+        return requests.HTTPError(f"{status} error", response=rsp)
+
+    @pytest.mark.unit
+    def test_fetch_fmp_batch_df_rejected_by_plan(self):
+        """HTTP 402 on a batch request disables batching for the endpoint."""
+        fmp = self._make_batch_client()
+
+        def mock_fetch_fmp_df(func, **kwargs):
+            if "," in kwargs["symbol"]:
+                raise self._http_error(402)
+            return pl.DataFrame({"symbol": [kwargs["symbol"]]})
+
+        fmp.fetch_fmp_df = mock_fetch_fmp_df
+        result = fmp.fetch_fmp_batch_df(
+            MagicMock(__name__="profile"), "symbol", symbol=["AAPL", "NVDA"]
+        )
+        assert "profile" in fmp._unsupported
+        assert sorted(result["symbol"].to_list()) == ["AAPL", "NVDA"]
+
+    @pytest.mark.unit
+    def test_fetch_fmp_batch_df_transient_error_raises(self):
+        """A server error is raised and doesn't mark the endpoint unsupported."""
+        fmp = self._make_batch_client()
+        fmp.fetch_fmp_df = MagicMock(side_effect=self._http_error(500))
+        with pytest.raises(requests.HTTPError):
+            fmp.fetch_fmp_batch_df(
+                MagicMock(__name__="profile"), "symbol", symbol=["AAPL", "NVDA"]
+            )
+        assert fmp._unsupported == set()
+
+    @pytest.mark.unit
+    def test_fetch_fmp_batch_df_empty_batch_keeps_batching(self):
+        """An empty batch response is fetched one at a time, batching stays on."""
+        fmp = self._make_batch_client()
+        calls = []
+
+        def mock_fetch_fmp_df(func, **kwargs):
+            calls.append(kwargs["symbol"])
+            if kwargs["symbol"] in ("OLD1,OLD2", "OLD1", "OLD2"):
+                return pl.DataFrame()
+            syms = kwargs["symbol"].split(",")
+            return pl.DataFrame({"symbol": syms})
+
+        fmp.fetch_fmp_df = mock_fetch_fmp_df
+        result = fmp.fetch_fmp_batch_df(
+            MagicMock(__name__="profile"),
+            "symbol",
+            symbol=["OLD1", "OLD2", "AAPL", "NVDA"],
+        )
+        assert calls == ["OLD1,OLD2", "AAPL,NVDA", "OLD1", "OLD2"]
+        assert fmp._unsupported == set()
+        assert sorted(result["symbol"].to_list()) == ["AAPL", "NVDA"]
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_df_parses_csv(self):
+        fmp = self._make_batch_client()
+        mock_func = MagicMock(__name__="profile_bulk")
+        mock_func.return_value.content = b"symbol,companyName,mktCap\nAAPL,Apple,10\n"
+
+        result = fmp.fetch_fmp_bulk_df(mock_func, part=0)
+        assert result.columns == ["symbol", "company_name", "mkt_cap"]
+        assert result["symbol"].to_list() == ["AAPL"]
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_df_prunes_columns(self):
+        fmp = self._make_batch_client()
+        mock_func = MagicMock(__name__="profile_bulk")
+        mock_func.return_value.content = b"symbol,companyName,mktCap\nAAPL,Apple,10\n"
+
+        result = fmp.fetch_fmp_bulk_df(mock_func, columns={"symbol", "mkt_cap"})
+        assert result.columns == ["symbol", "mkt_cap"]
+        assert result["mkt_cap"].to_list() == [10]
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_df_not_in_plan(self):
+        """A rejected bulk request returns None and disables the endpoint."""
+        fmp = self._make_batch_client()
+        mock_func = MagicMock(__name__="profile_bulk")
+        mock_func.side_effect = self._http_error(402)
+
+        assert fmp.fetch_fmp_bulk_df(mock_func, part=0) is None
+        assert fmp.fetch_fmp_bulk_df(mock_func, part=1) is None
+        assert mock_func.call_count == 1
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_df_error_payload(self):
+        fmp = self._make_batch_client()
+        mock_func = MagicMock(__name__="profile_bulk")
+        mock_func.return_value.content = b'{"Error Message": "Premium endpoint"}'
+
+        assert fmp.fetch_fmp_bulk_df(mock_func, part=0) is None
+        assert "profile_bulk" in fmp._unsupported
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_df_transient_error_raises(self):
+        fmp = self._make_batch_client()
+        mock_func = MagicMock(__name__="profile_bulk")
+        mock_func.side_effect = self._http_error(500)
+
+        with pytest.raises(requests.HTTPError):
+            fmp.fetch_fmp_bulk_df(mock_func, part=0)
+        assert fmp._unsupported == set()
+
+    @pytest.mark.unit
+    def test_fetch_fmp_bulk_parts_df_keeps_fetched_parts(self):
+        """A failed part keeps the parts already fetched."""
+        fmp = self._make_batch_client()
+        parts = [pl.DataFrame({"symbol": ["AAPL"]}), self._http_error(500)]
+        fmp.fetch_fmp_bulk_df = MagicMock(side_effect=parts)
+
+        result = fmp.fetch_fmp_bulk_parts_df(MagicMock(__name__="profile_bulk"))
+        assert result["symbol"].to_list() == ["AAPL"]
+
+    @pytest.mark.unit
+    def test_get_profiles_fills_symbols_missing_from_bulk(self):
+        fmp = self._make_batch_client()
+        fmp._bulk_min_symbols = 1
+        fmp.profile_bulk = MagicMock(__name__="profile_bulk")
+        fmp.profile = MagicMock(__name__="profile")
+        fmp.fetch_fmp_bulk_parts_df = MagicMock(
+            return_value=pl.DataFrame({"symbol": ["AAPL", "MSFT"]})
+        )
+        fmp.fetch_fmp_batch_df = MagicMock(
+            return_value=pl.DataFrame({"symbol": ["NVDA"]})
+        )
+
+        result = fmp.get_profiles(["AAPL", "NVDA"])
+        assert result["symbol"].to_list() == ["AAPL", "NVDA"]
+        _, kwargs = fmp.fetch_fmp_batch_df.call_args
+        assert kwargs["symbol"] == ["NVDA"]
+
+    @pytest.mark.unit
+    def test_statements_use_bulk_endpoint(self):
+        """The real endpoint functions find their <endpoint>_bulk sibling."""
+        fmp = PFinFMP("test")
+        fmp._bulk_min_symbols = 1
+        bulk_calls = []
+
+        def mock_bulk(bulk_func, sym_list, limit, **kwargs):
+            bulk_calls.append(bulk_func.__name__)
+            return pl.DataFrame({"symbol": sym_list})
+
+        fmp._fetch_statements_bulk_df = mock_bulk
+        result = fmp.get_statements(fmp.income_statement, ["AAPL"], 4)
+        assert fmp.income_statement.__name__ == "income_statement"
+        assert bulk_calls == ["income_statement_bulk"]
+        assert result["symbol"].to_list() == ["AAPL"]
+
+
+# ===================================================================
+# PFinBackend FMP column pruning
+# ===================================================================
+class TestFmpColumns:
+    """Tests for _fmp_columns — FMP fields needed by a table."""
+
+    @pytest.mark.unit
+    def test_fmp_columns_from_table(self):
+        """Table columns map back to FMP field names through the rename map."""
+        pfb = object.__new__(PFinBackend)
+        mock_table = MagicMock()
+        mock_table.__table__ = MagicMock()
+        mock_table.__table__.columns.keys.return_value = [
+            "id",
+            "asset_id",
+            "end_date",
+            "revenue",
+        ]
+        columns = pfb._fmp_columns(
+            mock_table, {"symbol": "asset_id", "date": "end_date"}
+        )
+        assert columns == {"id", "symbol", "date", "revenue"}
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    env = {
+        "FMP_API_KEY": "test",
+        "BLS_API_KEY": "test",
+        "PFIN_DB_BACKEND": "sqlite",
+        "PFIN_DB_PATH": str(tmp_path),
+        "PFIN_STATE_FILE": str(tmp_path / "state.json"),
+    }
+    with patch.dict(os.environ, env):
+        return PFinBackend()
+
+
+# ===================================================================
+# SBaseConn database backends
+# ===================================================================
+class TestDbBackend:
+    """Tests for the PFIN_DB_BACKEND engine selection."""
+
+    @staticmethod
+    def _make_conn(**params):
+        conn = object.__new__(SBaseConn)
+        conn._schema_list = ["auth", "pfin"]
+        conn._params = {
+            "DB_BACKEND": None,
+            "DB_URL": None,
+            "DB_SSLMODE": None,
+            "DB_PATH": None,
+            "DB_USER": "user",
+            "DB_HOST": "localhost",
+            "DB_PORT": "5432",
+            "DB_NAME": "postgres",
+            "DB_PASSWORD": "secret",
+        }
+        conn._params.update(params)
+        return conn
+
+    @pytest.mark.unit
+    def test_supabase_requires_ssl(self):
+        engine = self._make_conn()._create_engine()
+        assert engine.url.query["sslmode"] == "require"
+
+    @pytest.mark.unit
+    def test_local_postgres_without_ssl(self):
+        engine = self._make_conn(DB_BACKEND="postgres")._create_engine()
+        assert engine.url.query["sslmode"] == "disable"
+        url = "postgresql+psycopg2://etl@localhost:5433/pfin"
+        engine = self._make_conn(DB_BACKEND="postgres", DB_URL=url)._create_engine()
+        assert engine.url.port == 5433
+
+    @pytest.mark.unit
+    def test_unknown_backend_raises(self):
+        with pytest.raises(ValueError, match="Unknown DB_BACKEND"):
+            self._make_conn(DB_BACKEND="oracle")._create_engine()
+
+    @pytest.mark.unit
+    def test_sqlite_backend_insert_and_update(self, sqlite_backend, tmp_path):
+        pfb = sqlite_backend
+        assert pfb.engine.dialect.name == "sqlite"
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        df = pl.DataFrame({"symbol": ["AAPL", "NVDA"], "currency": ["USD", "USD"]})
+        pfb.insert_table_df(tab_asset, df)
+
+        df_sbase = pfb.fetch_table_df(tab_asset)
+        df_update = df_sbase.with_columns(pl.lit("EUR").alias("currency"))
+        pfb.update_table_df(tab_asset, ["id"], df_update.head(1))
+        df_sbase = pfb.fetch_table_df(tab_asset).sort("id")
+        assert df_sbase["currency"].to_list() == ["EUR", "USD"]
+        assert (tmp_path / "pfin.db").exists()
+
+    @pytest.mark.unit
+    def test_update_keeps_columns_not_given(self, sqlite_backend):
+        pfb = sqlite_backend
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        df = pl.DataFrame({"symbol": ["AAPL", "NVDA"], "currency": ["USD", "USD"]})
+        pfb.insert_table_df(tab_asset, df)
+        df_update = pl.DataFrame({"id": [2], "currency": ["EUR"]})
+        pfb.update_table_df(tab_asset, "id", df_update)
+        df_sbase = pfb.fetch_table_df(tab_asset).sort("id")
+        assert df_sbase["symbol"].to_list() == ["AAPL", "NVDA"]
+        assert df_sbase["currency"].to_list() == ["USD", "EUR"]
+
+    @pytest.mark.unit
+    def test_update_with_only_key_columns(self, sqlite_backend):
+        pfb = sqlite_backend
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        df = pl.DataFrame({"symbol": ["AAPL"], "currency": ["USD"]})
+        pfb.insert_table_df(tab_asset, df)
+        pfb.update_table_df(tab_asset, "id", pl.DataFrame({"id": [1]}))
+        df_sbase = pfb.fetch_table_df(tab_asset)
+        assert df_sbase["currency"].to_list() == ["USD"]
+
+    @pytest.mark.unit
+    def test_key_index_is_opt_in(self, sqlite_backend, tmp_path):
+        assert sqlite_backend.key_index is None
+        env = {
+            "FMP_API_KEY": "test",
+            "BLS_API_KEY": "test",
+            "PFIN_DB_BACKEND": "sqlite",
+            "PFIN_DB_PATH": str(tmp_path),
+            "PFIN_KEY_INDEX": "1",
+        }
+        with patch.dict(os.environ, env):
+            pfb = SBaseConn("PFIN_", ["pfin"])
+        tab_asset = pfb.get_reflected_table("pfin", "asset")
+        pfb.insert_table_df(tab_asset, pl.DataFrame({"symbol": ["AAPL"]}))
+        assert pfb.fetch_table_keys_df(tab_asset, "symbol")["id"].to_list() == [1]
+        assert pfb.key_index.stats["reloads"] == 1
+
+
+# ===================================================================
+# SBaseConn server side diff
+# ===================================================================
+class TestSyncTableDf:
+    """Tests for sync_table_df — insert/update classification in the DB."""
+
+    @pytest.mark.unit
+    def test_insert_update_unchanged(self, sqlite_backend):
+        pfb = sqlite_backend
+        tab_cpi = pfb.get_reflected_table("pfin", "cpi")
+        key_list = ["series_id", "year", "month"]
+        df = pl.DataFrame(
+            {
+                "series_id": ["CUUR0000SA0"] * 2,
+                "year": [2026, 2026],
+                "month": [1, 2],
+                "series_value": [320.5, None],
+                "not_a_column": ["x", "y"],
+            }
+        )
+        counts = pfb.sync_table_df(tab_cpi, key_list, df)
+        assert counts == {"insert": 2, "update": 0, "unchanged": 0}
+
+        # [richmosko]: null -> value is a change, the same value isn't
+        df = pl.concat(
+            [
+                df.with_columns(pl.lit(320.5).alias("series_value")),
+                df.head(1).with_columns(pl.lit(3, dtype=pl.Int64).alias("month")),
+            ]
+        )
+        counts = pfb.sync_table_df(tab_cpi, key_list, df, sample=5)
+        assert counts == {"insert": 1, "update": 1, "unchanged": 1}
+        df_cpi = pfb.fetch_table_df(tab_cpi).sort("month")
+        assert df_cpi["month"].to_list() == [1, 2, 3]
+        assert df_cpi["series_value"].to_list() == [320.5] * 3
+
+    @pytest.mark.unit
+    def test_tables_from_env(self):
+        pfb = object.__new__(PFinBackend)
+        pfb._server_diff_tables = {"eod_price", "asset"}
+        tab = MagicMock()
+        tab.__table__ = sqla.Table("eod_price", sqla.MetaData())
+        assert pfb._use_server_diff(tab)
+        tab.__table__ = sqla.Table("asset", sqla.MetaData())
+        assert not pfb._use_server_diff(tab)  # not a server diff capable sync
+
+
+# ===================================================================
+# PFinBackend memory budget batching
+# ===================================================================
+class TestPlanMemBatches:
+    """Tests for _plan_mem_batches — splits a sync to fit a memory budget."""
+
+    @staticmethod
+    def _make_backend(budget_bytes):
+        pfb = object.__new__(PFinBackend)
+        pfb._mem_budget_bytes = budget_bytes
+        pfb._mem_frame_copies = 4
+        return pfb
+
+    @staticmethod
+    def _mock_table():
+        tab = sqla.Table(
+            "eod_price",
+            sqla.MetaData(),
+            sqla.Column("id", sqla.BigInteger),
+            sqla.Column("asset_id", sqla.Integer),
+            sqla.Column("end_date", sqla.Date),
+            sqla.Column("close", sqla.Numeric),
+        )
+        mock_table = MagicMock()
+        mock_table.__table__ = tab
+        return mock_table
+
+    @pytest.mark.unit
+    def test_no_budget_single_batch(self):
+        pfb = self._make_backend(None)
+        sym_list = ["AAPL", "NVDA", "META"]
+        assert pfb._plan_mem_batches(self._mock_table(), sym_list, 1260) == [sym_list]
+
+    @pytest.mark.unit
+    def test_budget_splits_symbols(self):
+        # 24 bytes/row * 4 copies * 100 rows = 9600 bytes per symbol
+        pfb = self._make_backend(20000)
+        sym_list = ["AAPL", "NVDA", "META", "MSFT", "V"]
+        batches = pfb._plan_mem_batches(self._mock_table(), sym_list, 100)
+        assert batches == [["AAPL", "NVDA"], ["META", "MSFT"], ["V"]]
+
+    @pytest.mark.unit
+    def test_tiny_budget_one_symbol_per_batch(self):
+        pfb = self._make_backend(1)
+        batches = pfb._plan_mem_batches(self._mock_table(), ["AAPL", "NVDA"], 100)
+        assert batches == [["AAPL"], ["NVDA"]]
+
+    @pytest.mark.unit
+    def test_pipeline_batches(self):
+        pfb = self._make_backend(None)
+        pfb.pipeline = pipeline.Pipeline(depth=2)
+        pfb._pipeline_batch = 2
+        sym_list = ["AAPL", "NVDA", "META"]
+        batches = pfb._plan_mem_batches(self._mock_table(), sym_list, 100)
+        assert batches == [["AAPL", "NVDA"], ["META"]]
+        # 24 bytes/row * (4 + 3 in flight) copies * 100 rows = 16800 per symbol
+        pfb._mem_budget_bytes = 20000
+        batches = pfb._plan_mem_batches(self._mock_table(), sym_list, 100)
+        assert batches == [["AAPL"], ["NVDA"], ["META"]]
+
+
+# ===================================================================
+# PFinBackend statement refresh planner
+# ===================================================================
+class TestSelectRefreshSymbols:
+    """Tests for _select_refresh_symbols — picks symbols due for statements."""
+
+    @staticmethod
+    def _make_backend():
+        pfb = object.__new__(PFinBackend)
+        pfb._tmp_year_fut = 4000
+        pfb._refresh_lookback_days = 7
+        pfb._refresh_overdue_days = 100
+        return pfb
+
+    @staticmethod
+    def _df_rp(rows):
+        return pl.DataFrame(
+            rows,
+            schema={"asset_id": pl.Int64, "accepted_date": pl.Datetime("us", "UTC")},
+            orient="row",
+        )
+
+    @pytest.mark.unit
+    def test_selects_due_symbols(self):
+        pfb = self._make_backend()
+        today = date(2025, 2, 15)
+        asset_map = {"AAPL": 1, "NVDA": 2, "META": 3, "V": 4, "NEW": 5, "OLD": 6}
+        df_rp = self._df_rp(
+            [
+                (1, datetime(2025, 1, 31, tzinfo=timezone.utc)),  # quiet
+                (2, datetime(2024, 11, 20, tzinfo=timezone.utc)),  # on calendar
+                (3, datetime(2025, 2, 12, tzinfo=timezone.utc)),  # just filed
+                (4, datetime(2024, 12, 30, tzinfo=timezone.utc)),  # due in DB
+                (6, datetime(2024, 8, 1, tzinfo=timezone.utc)),  # overdue
+                (1, datetime(4000, 12, 31, tzinfo=timezone.utc)),  # placeholder
+            ]
+        )
+        df_earn = pl.DataFrame({"asset_id": [4], "ref_date": [date(2025, 2, 16)]})
+
+        result = pfb._select_refresh_symbols(asset_map, {"NVDA"}, df_rp, df_earn, today)
+
+        assert result == ["NVDA", "META", "V", "NEW", "OLD"]
+
+    @pytest.mark.unit
+    def test_placeholder_period_does_not_count_as_filing(self):
+        """A 'future' placeholder row alone means the symbol never filed."""
+        pfb = self._make_backend()
+        df_rp = self._df_rp([(1, datetime(4000, 12, 31, tzinfo=timezone.utc))])
+        df_earn = pl.DataFrame(schema={"asset_id": pl.Int64, "ref_date": pl.Date})
+
+        result = pfb._select_refresh_symbols(
+            {"AAPL": 1}, set(), df_rp, df_earn, date(2025, 2, 15)
+        )
+        assert result == ["AAPL"]
+
+
+# ===================================================================
+# PFinBackend nightly scheduling
+# ===================================================================
+class TestUpdateTableAll:
+    """Tests for update_table_all — runs the stale work of each table."""
+
+    @staticmethod
+    def _make_backend(tmp_path):
+        pfb = object.__new__(PFinBackend)
+        pfb._params = {"TIME_BUDGET": None, "CALL_BUDGET": None}
+        pfb._stock_screener_result_limit = 5000
+        pfb.refresh_tracker = schedule.RefreshTracker(str(tmp_path / "state.json"))
+        pfb.snapshot_cache = None
+        pfb._fetch_asset_map_financials = MagicMock(return_value={"AAPL": 1})
+        pfb._fetch_asset_map_chart = MagicMock(return_value={"AAPL": 1})
+        pfb.plan_statement_refresh = MagicMock(return_value=["AAPL"])
+        for table in (
+            "cpi",
+            "asset",
+            "equity_profile",
+            "reporting_period",
+            "income_statement",
+            "balance_sheet_statement",
+            "cash_flow_statement",
+            "earning",
+            "eod_price",
+        ):
+            setattr(pfb, f"update_table_{table}", MagicMock())
+        return pfb
+
+    @pytest.mark.unit
+    def test_asset_map_fetched_once(self, tmp_path):
+        pfb = self._make_backend(tmp_path)
+        pfb.update_table_all()
+        assert pfb._fetch_asset_map_financials.call_count == 1
+        _, kwargs = pfb.plan_statement_refresh.call_args
+        assert kwargs["asset_map"] == {"AAPL": 1}
+        pfb.update_table_cash_flow_statement.assert_called_once_with(sym_list=["AAPL"])
+
+    @pytest.mark.unit
+    def test_statement_tables_tracked_as_reporting_period(self, tmp_path):
+        pfb = self._make_backend(tmp_path)
+        pfb.update_table_all()
+        tracker = pfb.refresh_tracker
+        assert tracker.last_refreshed("reporting_period", "AAPL") is not None
+        assert tracker.last_refreshed("income_statement", "AAPL") is None
+        assert tracker.last_refreshed("eod_price", "AAPL") is not None
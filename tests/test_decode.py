@@ -0,0 +1,78 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the JSON decode process pool in pfin_back_etl.decode.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import json
+import pytest
+import polars as pl
+from unittest.mock import MagicMock
+from pfin_back_etl import decode
+from pfin_back_etl.core import PFinBackend, PFinFMP
+
+RECORDS = [
+    {"symbol": "AAPL", "netIncome": 1000000, "link": "https://..."},
+    {"symbol": "NVDA", "netIncome": 2000000, "link": "https://..."},
+]
+
+
+class TestJsonToDf:
+    """Tests for json_to_df — FMP records to snake_case frames."""
+
+    @pytest.mark.unit
+    def test_snake_case_and_pruning(self):
+        df = decode.json_to_df(RECORDS, columns={"symbol", "net_income"})
+        assert df.columns == ["symbol", "net_income"]
+        assert decode.json_to_df(RECORDS).columns == ["symbol", "net_income", "link"]
+        assert decode.json_to_df([]).is_empty()
+
+    @pytest.mark.unit
+    def test_pruning_keeps_fields_missing_from_first_record(self):
+        records = [{"symbol": "AAPL"}, {"symbol": "NVDA", "netIncome": 2000000}]
+        df = decode.json_to_df(records, columns={"symbol", "net_income"})
+        assert df.columns == ["symbol", "net_income"]
+        assert df["net_income"].to_list() == [None, 2000000]
+
+
+class TestDecodePool:
+    """Tests for decoding responses in worker processes."""
+
+    @pytest.mark.unit
+    def test_pool_matches_inline_decode(self):
+        pool = decode.DecodePool(1, min_bytes=0)
+        try:
+            content = json.dumps(RECORDS).encode()
+            assert pool.wants(content)
+            df = pool.submit(content, columns={"symbol", "net_income"})()
+            assert df.equals(decode.json_to_df(RECORDS, {"symbol", "net_income"}))
+
+            fmp = object.__new__(PFinFMP)
+            fmp.decode_pool = pool
+            mock_func = MagicMock(__name__="test_api")
+            mock_func.side_effect = lambda symbol: MagicMock(
+                content=json.dumps([{"symbol": symbol, "closePrice": 1.0}]).encode()
+            )
+            df = fmp.fetch_fmp_list_df(
+                mock_func, "symbol", symbol=["AAPL", "NVDA", "META"]
+            )
+            assert df["symbol"].to_list() == ["AAPL", "NVDA", "META"]
+            assert df.schema["close_price"] == pl.Float64
+            assert pool.summary()["jobs"] == 4
+        finally:
+            pool.shutdown()
+
+    @pytest.mark.unit
+    def test_backend_close_shuts_down_pool(self):
+        pfb = object.__new__(PFinBackend)
+        pfb.decode_pool = MagicMock()
+        pfb.fmp_client = MagicMock()
+        pool = pfb.decode_pool
+        pfb.close()
+        pool.shutdown.assert_called_once_with()
+        assert pfb.decode_pool is None
+        assert pfb.fmp_client.decode_pool is None
+        pfb.close()  # closing twice is a no-op
@@ -0,0 +1,109 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the key-only table index in pfin_back_etl.keyindex.
+    These tests run on a temporary SQLite database (no external DB, no API).
+"""
+
+import pytest
+import polars as pl
+import sqlalchemy as sqla
+from pfin_back_etl import keyindex
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    tab = sqla.Table(
+        "eod_price",
+        sqla.MetaData(),
+        sqla.Column("id", sqla.Integer, primary_key=True),
+        sqla.Column("asset_id", sqla.Integer, nullable=False),
+        sqla.Column("date", sqla.String, nullable=False),
+        sqla.Column("close", sqla.Float),
+    )
+    tab.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            sqla.insert(tab),
+            [
+                {"asset_id": 2, "date": "2024-01-02", "close": 1.0},
+                {"asset_id": 1, "date": "2024-01-02", "close": 2.0},
+            ],
+        )
+    schema = {"id": pl.Int64, "asset_id": pl.Int64, "date": pl.String}
+    return (engine, tab, schema)
+
+
+class TestKeyIndex:
+    """Tests for building, refreshing and persisting the key index."""
+
+    KEYS = ["asset_id", "date"]
+
+    @pytest.mark.unit
+    def test_reload_then_hit(self, db):
+        (engine, tab, schema) = db
+        ki = keyindex.KeyIndex(engine)
+        df_keys = ki.lookup(tab, self.KEYS, schema)
+        assert df_keys.columns == ["asset_id", "date", "id"]
+        assert df_keys["asset_id"].to_list() == [1, 2]  # sorted by key
+        df_keys = ki.lookup(tab, self.KEYS, schema, expr=pl.col("asset_id") == 2)
+        assert df_keys["id"].to_list() == [1]
+        assert (ki.stats["reloads"], ki.stats["hits"]) == (1, 1)
+
+    @pytest.mark.unit
+    def test_increment_and_reload(self, db):
+        (engine, tab, schema) = db
+        ki = keyindex.KeyIndex(engine)
+        ki.lookup(tab, self.KEYS, schema)
+        with engine.begin() as conn:
+            conn.execute(sqla.insert(tab), [{"asset_id": 1, "date": "2024-01-03"}])
+        assert len(ki.lookup(tab, self.KEYS, schema)) == 3
+        assert (ki.stats["increments"], ki.stats["increment_rows"]) == (1, 1)
+
+        with engine.begin() as conn:
+            conn.execute(sqla.delete(tab).where(tab.c.id == 1))
+        assert ki.lookup(tab, self.KEYS, schema)["id"].to_list() == [2, 3]
+        assert ki.stats["reloads"] == 2
+
+    @pytest.mark.unit
+    def test_kept_across_runs(self, db, tmp_path):
+        (engine, tab, schema) = db
+        keyindex.KeyIndex(engine, str(tmp_path / "keys")).lookup(tab, self.KEYS, schema)
+        ki = keyindex.KeyIndex(engine, str(tmp_path / "keys"))
+        assert len(ki.lookup(tab, self.KEYS, schema)) == 2
+        assert (ki.stats["reloads"], ki.stats["hits"]) == (0, 1)
+        assert ki.summary()["rows"] == {"eod_price": 2}
+
+    @pytest.mark.unit
+    def test_filtered_lookup_reads_database(self, db):
+        """Without an index loaded, a filtered lookup only reads its rows."""
+        (engine, tab, schema) = db
+        ki = keyindex.KeyIndex(engine)
+        df_keys = ki.lookup(tab, self.KEYS, schema, where=tab.c.asset_id == 2)
+        assert df_keys["id"].to_list() == [1]
+        assert ki.stats["filtered_reads"] == 1
+        assert ki.summary()["rows"] == {}
+
+    @pytest.mark.unit
+    def test_table_without_id_not_indexed(self, db):
+        """A delete followed by an insert keeps count(*) the same."""
+        (engine, _, schema) = db
+        tab = sqla.Table(
+            "quote",
+            sqla.MetaData(),
+            sqla.Column("asset_id", sqla.Integer, primary_key=True),
+            sqla.Column("date", sqla.String, nullable=False),
+        )
+        tab.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(sqla.insert(tab), [{"asset_id": 1, "date": "2024-01-02"}])
+        ki = keyindex.KeyIndex(engine)
+        ki.lookup(tab, self.KEYS, schema)
+        with engine.begin() as conn:
+            conn.execute(sqla.delete(tab))
+            conn.execute(sqla.insert(tab), [{"asset_id": 3, "date": "2024-01-02"}])
+        assert ki.lookup(tab, self.KEYS, schema)["asset_id"].to_list() == [3]
+        assert ki.stats["unindexed_reads"] == 2
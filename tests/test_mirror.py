@@ -0,0 +1,88 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the local Parquet table mirror in pfin_back_etl.mirror.
+    These tests run on a temporary SQLite database (no external DB, no API).
+"""
+
+import pytest
+import polars as pl
+import sqlalchemy as sqla
+from pfin_back_etl import mirror
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = sqla.create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    tab = sqla.Table(
+        "asset",
+        sqla.MetaData(),
+        sqla.Column("id", sqla.Integer, primary_key=True),
+        sqla.Column("symbol", sqla.String, nullable=False),
+        sqla.Column("currency", sqla.String),
+    )
+    tab.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(sqla.insert(tab), [{"symbol": "AAPL"}, {"symbol": "NVDA"}])
+    schema = {"id": pl.Int32, "symbol": pl.String, "currency": pl.String}
+    tm = mirror.TableMirror(str(tmp_path / "mirror"), engine)
+    return (engine, tab, schema, tm)
+
+
+class TestWhereToExpr:
+    """Tests for where_to_expr — sqlalchemy conditions as polars filters."""
+
+    @pytest.mark.unit
+    def test_in_and_comparisons(self):
+        tab = sqla.Table("t", sqla.MetaData(), sqla.Column("a", sqla.Integer))
+        df = pl.DataFrame({"a": [1, 2, 3, 4]})
+        expr = mirror.where_to_expr(tab.c.a.in_([1, 3, 4]))
+        assert df.filter(expr)["a"].to_list() == [1, 3, 4]
+        expr = mirror.where_to_expr(sqla.and_(tab.c.a > 1, tab.c.a <= 3))
+        assert df.filter(expr)["a"].to_list() == [2, 3]
+
+    @pytest.mark.unit
+    def test_unsupported_returns_none(self):
+        tab = sqla.Table("t", sqla.MetaData(), sqla.Column("a", sqla.Integer))
+        assert mirror.where_to_expr(sqla.or_(tab.c.a == 1, tab.c.a == 2)) is None
+        assert mirror.where_to_expr(tab.c.a.is_(None)) is None
+
+
+class TestTableMirror:
+    """Tests for validating, resyncing and writing through the mirror."""
+
+    @pytest.mark.unit
+    def test_resync_then_hit(self, db):
+        (engine, tab, schema, tm) = db
+        assert tm.fetch(tab, schema)["symbol"].to_list() == ["AAPL", "NVDA"]
+        df = tm.fetch(tab, schema, where=tab.c.id.in_([2]))
+        assert df["symbol"].to_list() == ["NVDA"]
+        assert (tm.stats["resyncs"], tm.stats["hits"]) == (1, 1)
+
+    @pytest.mark.unit
+    def test_write_through(self, db):
+        (engine, tab, schema, tm) = db
+        tm.fetch(tab, schema)
+        with engine.begin() as conn:
+            conn.execute(sqla.insert(tab), [{"symbol": "META"}])
+            conn.execute(sqla.update(tab).where(tab.c.id == 1).values(currency="USD"))
+        tm.apply_insert(tab, schema, pl.DataFrame({"symbol": ["META"]}))
+        tm.apply_update(tab, "id", pl.DataFrame({"id": [1], "currency": ["USD"]}))
+
+        df = tm.fetch(tab, schema).sort("id")
+        assert df["id"].to_list() == [1, 2, 3]
+        assert df["currency"].to_list() == ["USD", None, None]
+        assert (tm.stats["resyncs"], tm.stats["catch_ups"]) == (1, 1)
+
+    @pytest.mark.unit
+    def test_outside_delete_triggers_resync(self, db):
+        (engine, tab, schema, tm) = db
+        tm.fetch(tab, schema)
+        with engine.begin() as conn:
+            conn.execute(sqla.delete(tab).where(tab.c.id == 1))
+            conn.execute(sqla.insert(tab), [{"symbol": "META"}])
+        df = tm.fetch(tab, schema)
+        assert df["symbol"].to_list() == ["NVDA", "META"]
+        assert (tm.stats["resyncs"], tm.stats["catch_ups"]) == (2, 0)
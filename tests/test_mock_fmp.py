@@ -0,0 +1,69 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the local mock FMP server (pfin_back_etl.mock_fmp), with
+    PFinFMP pointed at it over real (loopback) HTTP.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import time
+import pytest
+import requests
+from pfin_back_etl import perf, synth
+from pfin_back_etl.core import PFinFMP
+from pfin_back_etl.mock_fmp import MockFMPServer
+
+
+@pytest.fixture
+def synth_fmp():
+    return synth.SynthFMP(n_symbols=5, years=1)
+
+
+class TestMockFMPServer:
+    """Tests for PFinFMP against the mock FMP server."""
+
+    @pytest.mark.unit
+    def test_fetch_json_and_bulk_csv(self, synth_fmp):
+        with MockFMPServer(synth_fmp) as server:
+            client = PFinFMP("test", base_url=server.base_url.rstrip("/"))
+            df_scr = client.get_screened_stocks(1000000000, 3)
+            df_prof = client.fetch_fmp_bulk_df(client.profile_bulk, part=0)
+            df_eod = client.fetch_fmp_df(
+                client.historical_full, symbol=synth_fmp.symbols[0]
+            )
+
+        assert df_scr["symbol"].to_list() == synth_fmp.symbols[:3]
+        assert len(df_prof) == 5
+        assert "company_name" in df_prof.columns
+        assert len(df_eod) > 200
+        assert server.stats["calls"] == 3
+
+    @pytest.mark.unit
+    def test_rate_limit_429_is_retried(self, synth_fmp):
+        perf.api_stats.reset()
+        with MockFMPServer(synth_fmp, rate_limit=2, rate_window=0.5) as server:
+            client = PFinFMP("test", base_url=server.base_url)
+            client._retry_backoff = 0.6  # outlasts the window
+            # the client side limiter stalls a minute after a 429 (bucket fill)
+            client.session.session.limit_statuses = ()
+            for sym in synth_fmp.symbols[:3]:
+                df = client.fetch_fmp_df(client.profile, symbol=sym)
+                assert df["symbol"].to_list() == [sym]
+
+        assert server.stats["status_429"] == 1
+        assert perf.api_stats.summary()["profile"]["retries"] == 1
+        perf.api_stats.reset()
+
+    @pytest.mark.unit
+    def test_latency_and_failures(self, synth_fmp):
+        with MockFMPServer(synth_fmp, latency=0.05, failure_rate=1.0) as server:
+            client = PFinFMP("test", base_url=server.base_url)
+            t_start = time.perf_counter()
+            with pytest.raises(requests.HTTPError, match="500"):
+                client.fetch_fmp_df(client.earnings, symbol=synth_fmp.symbols[0])
+            elapsed = time.perf_counter() - t_start
+
+        assert elapsed >= 0.05
+        assert server.stats["status_500"] == 1
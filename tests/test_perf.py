@@ -0,0 +1,244 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the run instrumentation in pfin_back_etl.perf.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import json
+import pytest
+import polars as pl
+import sqlalchemy as sqla
+from pfin_back_etl.perf import (
+    ApiStats,
+    Profiler,
+    RunReport,
+    SqlTracer,
+    normalize_sql,
+    run_report,
+    timed,
+)
+
+
+class TestRunReport:
+    """Tests for span recording and the per-stage summary."""
+
+    @pytest.mark.unit
+    def test_spans_attributed_to_sync_table(self):
+        report = RunReport()
+        with report.sync("eod_price"):
+            with report.span("fetch") as rec:
+                rec["rows"] = 10
+                rec["bytes"] = 2048
+            with report.span("fetch") as rec:
+                rec["rows"] = 5
+        with report.span("read"):
+            pass
+
+        tables = report.summary()
+        assert tables["eod_price"]["fetch"]["calls"] == 2
+        assert tables["eod_price"]["fetch"]["rows"] == 15
+        assert tables["eod_price"]["fetch"]["bytes"] == 2048
+        assert tables["eod_price"]["total"]["calls"] == 1
+        assert "read" in tables["-"]
+
+    @pytest.mark.unit
+    def test_spans_record_memory(self):
+        report = RunReport()
+        with report.sync("eod_price"):
+            with report.span("read"):
+                pass
+        agg = report.summary()["eod_price"]["read"]
+        assert agg["max_rss_bytes"] > 0
+        assert agg["process_peak_rss_bytes"] >= agg["max_rss_bytes"]
+
+    @pytest.mark.unit
+    def test_transform_is_remainder_of_total(self):
+        report = RunReport()
+        report.spans = [
+            {"table": "cpi", "stage": "total", "seconds": 10.0, "rows": 0, "bytes": 0},
+            {"table": "cpi", "stage": "fetch", "seconds": 6.0, "rows": 0, "bytes": 0},
+            {"table": "cpi", "stage": "read", "seconds": 1.5, "rows": 0, "bytes": 0},
+        ]
+        tables = report.summary()
+        assert tables["cpi"]["transform"]["seconds"] == pytest.approx(2.5)
+
+    @pytest.mark.unit
+    def test_no_transform_when_stages_overlap(self):
+        """Pipelined fetch and write spans don't leave a transform remainder."""
+        report = RunReport()
+        span = {"table": "eod_price", "rows": 0, "bytes": 0}
+        report.spans = [
+            {**span, "stage": "total", "seconds": 10.0, "start": 0.0, "thread": "M"},
+            {**span, "stage": "fetch", "seconds": 8.0, "start": 0.0, "thread": "F"},
+            {**span, "stage": "update", "seconds": 7.0, "start": 2.0, "thread": "M"},
+        ]
+        tables = report.summary()
+        assert "transform" not in tables["eod_price"]
+        report.spans[2]["start"] = 8.5
+        tables = report.summary()
+        assert tables["eod_price"]["transform"]["seconds"] == pytest.approx(0.0)
+
+    @pytest.mark.unit
+    def test_span_recorded_on_exception(self):
+        report = RunReport()
+        with pytest.raises(ValueError):
+            with report.sync("asset"):
+                raise ValueError("boom")
+        assert report.spans[0]["stage"] == "total"
+        assert report.current_table is None
+
+    @pytest.mark.unit
+    def test_write_json_and_prometheus(self, tmp_path):
+        report = RunReport()
+        report.add_section("extra", lambda: {"answer": 42})
+        with report.sync("cpi"):
+            with report.span("insert") as rec:
+                rec["rows"] = 3
+
+        json_file = str(tmp_path / "report.json")
+        report.write_json(json_file)
+        with open(json_file) as f:
+            data = json.load(f)
+        assert data["tables"]["cpi"]["insert"]["rows"] == 3
+        assert data["extra"] == {"answer": 42}
+
+        prom_file = str(tmp_path / "pfin.prom")
+        report.write_prometheus(prom_file)
+        with open(prom_file) as f:
+            text = f.read()
+        assert "# TYPE pfin_etl_stage_seconds gauge" in text
+        assert 'pfin_etl_stage_rows{table="cpi",stage="insert"} 3' in text
+
+
+class TestTimed:
+    """Tests for the timed() decorator."""
+
+    @pytest.mark.unit
+    def test_rows_and_bytes_from_dataframe(self):
+        run_report.reset()
+
+        @timed("read")
+        def read_table():
+            return pl.DataFrame({"a": [1, 2, 3]})
+
+        with run_report.sync("asset"):
+            df = read_table()
+
+        assert len(df) == 3
+        rec = run_report.spans[0]
+        assert rec["table"] == "asset"
+        assert rec["stage"] == "read"
+        assert rec["rows"] == 3
+        assert rec["bytes"] > 0
+        run_report.reset()
+
+
+class TestApiStats:
+    """Tests for the per-endpoint API call accounting."""
+
+    @pytest.mark.unit
+    def test_counts_bytes_and_percentiles(self):
+        stats = ApiStats()
+        for idx in range(1, 101):
+            stats.record("profile", idx / 100, nbytes=10)
+        stats.record("profile", 0.5, rate_limited=True)
+        stats.record_retry("profile")
+
+        agg = stats.summary()["profile"]
+        assert agg["calls"] == 101
+        assert agg["bytes"] == 1000
+        assert agg["errors"] == 1
+        assert agg["status_429"] == 1
+        assert agg["retries"] == 1
+        assert agg["p50"] == pytest.approx(0.5)
+        assert agg["p99"] == pytest.approx(0.99)
+
+    @pytest.mark.unit
+    def test_empty_endpoint_percentiles(self):
+        stats = ApiStats()
+        stats.record_retry("earnings")
+        agg = stats.summary()["earnings"]
+        assert agg["calls"] == 0
+        assert agg["p95"] == 0.0
+
+
+class TestSqlTracer:
+    """Tests for the SQL statement tracer (in-memory sqlite engine)."""
+
+    @pytest.mark.unit
+    def test_normalize_sql(self):
+        sql = normalize_sql(
+            "SELECT *\n  FROM pfin.asset\n WHERE id = 42 AND symbol = 'AAPL'"
+        )
+        assert sql == "SELECT * FROM pfin.asset WHERE id = ? AND symbol = ?"
+        sql = normalize_sql("INSERT INTO t (a) VALUES (%(a__0)s), (%(a__1)s)")
+        assert sql == "INSERT INTO t (a) VALUES (%(a__n)s), (%(a__n)s)"
+
+    @pytest.mark.unit
+    def test_traces_engine_statements(self):
+        tracer = SqlTracer(slow_seconds=0.0)
+        engine = sqla.create_engine("sqlite://")
+        tracer.attach(engine)
+        with engine.begin() as conn:
+            conn.execute(sqla.text("CREATE TABLE asset (id INTEGER, symbol TEXT)"))
+            conn.execute(
+                sqla.text("INSERT INTO asset VALUES (:id, :symbol)"),
+                [{"id": 1, "symbol": "AAPL"}, {"id": 2, "symbol": "NVDA"}],
+            )
+            conn.execute(sqla.text("UPDATE asset SET symbol = 'X' WHERE id = 1"))
+        tracer.detach(engine)
+
+        summary = tracer.summary()
+        inserts = [st for st in summary["statements"] if st["sql"].startswith("INSERT")]
+        assert inserts[0]["batch"] == 2
+        assert inserts[0]["rows"] == 2
+        assert summary["tables"]["asset"]["statements"] == 3
+        assert len(summary["slow"]) == 3
+
+    @pytest.mark.unit
+    def test_failed_statement_pops_start(self):
+        tracer = SqlTracer()
+        engine = sqla.create_engine("sqlite://")
+        tracer.attach(engine)
+        with engine.connect() as conn:
+            with pytest.raises(sqla.exc.OperationalError):
+                conn.execute(sqla.text("SELECT * FROM missing_table"))
+            assert conn.info["pfin_sql_start"] == []
+        tracer.detach(engine)
+
+
+class TestProfiler:
+    """Tests for the per-table profiling hooks."""
+
+    @pytest.mark.unit
+    def test_cpu_profile_selected_tables(self, tmp_path):
+        report = RunReport()
+        report.profiler = Profiler("cpu", str(tmp_path), tables=["eod_price"])
+        with report.sync("eod_price"):
+            sum(range(1000))
+        with report.sync("cpi"):
+            pass
+
+        assert (tmp_path / "eod_price.pstats").exists()
+        assert (tmp_path / "eod_price.cpu.txt").exists()
+        assert not (tmp_path / "cpi.pstats").exists()
+
+    @pytest.mark.unit
+    def test_mem_profile_top_allocations(self, tmp_path):
+        report = RunReport()
+        report.profiler = Profiler("mem", str(tmp_path))
+        with report.sync("asset"):
+            data = [str(idx) for idx in range(10000)]
+
+        assert len(data) == 10000
+        text = (tmp_path / "asset.mem.txt").read_text()
+        assert "Peak traced memory" in text
+        assert "test_perf.py" in text
+
+    @pytest.mark.unit
+    def test_unknown_mode_raises(self, tmp_path):
+        with pytest.raises(ValueError, match="Unknown profile mode"):
+            Profiler("gpu", str(tmp_path))
@@ -0,0 +1,59 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the fetch -> write batch pipeline in pfin_back_etl.pipeline.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import time
+import pytest
+from pfin_back_etl import pipeline
+
+
+class TestPipeline:
+    """Tests for overlapping, bounding and isolating the pipeline batches."""
+
+    @pytest.mark.unit
+    def test_writes_every_batch_in_order(self):
+        written = []
+        pl_run = pipeline.Pipeline(depth=2)
+        pl_run.run([1, 2, 3], lambda b: b * 10, lambda b, d: written.append((b, d)))
+        assert written == [(1, 10), (2, 20), (3, 30)]
+        assert pl_run.summary()["batches"] == 3
+
+    @pytest.mark.unit
+    def test_fetch_is_bounded_by_depth(self):
+        fetched = []
+        seen = []
+
+        def write(batch, data):
+            if batch == 0:
+                time.sleep(0.2)  # slow writer... the fetch thread runs ahead
+                seen.append(list(fetched))
+
+        pipeline.Pipeline(depth=1).run(list(range(6)), fetched.append, write)
+        # [richmosko]: batch 0 being written, 1 queued, 2 fetched and blocked
+        assert seen == [[0, 1, 2]]
+        assert fetched == list(range(6))
+
+    @pytest.mark.unit
+    def test_failed_batches_are_isolated(self):
+        written = []
+
+        def fetch(batch):
+            if batch == 2:
+                raise ValueError("boom")
+            return batch
+
+        def write(batch, data):
+            if batch == 3:
+                raise RuntimeError("db down")
+            written.append(batch)
+
+        pl_run = pipeline.Pipeline()
+        with pytest.raises(RuntimeError, match="2 of 4 batch"):
+            pl_run.run([1, 2, 3, 4], fetch, write)
+        assert written == [1, 4]
+        assert pl_run.summary()["failed"] == 2
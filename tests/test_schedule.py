@@ -0,0 +1,104 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the refresh staleness tracking in pfin_back_etl.schedule.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from pfin_back_etl.schedule import RefreshTracker
+
+NOW = datetime(2025, 3, 1, 3, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def tracker(tmp_path):
+    return RefreshTracker(str(tmp_path / "state.json"))
+
+
+class TestStaleness:
+    """Tests for per-table and per-asset staleness checks."""
+
+    @pytest.mark.unit
+    def test_never_refreshed_is_stale(self, tracker):
+        assert tracker.last_refreshed("cpi") is None
+        assert tracker.is_stale("cpi", now=NOW)
+        assert tracker.staleness("eod_price", "AAPL", now=NOW) == timedelta.max
+
+    @pytest.mark.unit
+    def test_policy_max_age(self, tracker):
+        tracker.mark_refreshed("equity_profile", ["AAPL"], now=NOW)
+        assert not tracker.is_stale("equity_profile", "AAPL", now=NOW)
+        # Weekly policy: still fresh after 3 days, stale after 7
+        assert not tracker.is_stale(
+            "equity_profile", "AAPL", now=NOW + timedelta(days=3)
+        )
+        assert tracker.is_stale("equity_profile", "AAPL", now=NOW + timedelta(days=7))
+
+    @pytest.mark.unit
+    def test_nightly_run_sees_previous_night_as_stale(self, tracker):
+        """A daily job that starts a little earlier still refreshes prices."""
+        tracker.mark_refreshed("eod_price", ["AAPL"], now=NOW)
+        later = NOW + timedelta(days=1) - timedelta(minutes=20)
+        assert tracker.is_stale("eod_price", "AAPL", now=later)
+
+    @pytest.mark.unit
+    def test_custom_policy(self, tmp_path):
+        tracker = RefreshTracker(
+            str(tmp_path / "state.json"), policy={"cpi": timedelta(days=1)}
+        )
+        tracker.mark_refreshed("cpi", now=NOW)
+        assert tracker.is_stale("cpi", now=NOW + timedelta(days=1))
+
+    @pytest.mark.unit
+    def test_state_persisted(self, tmp_path):
+        state_file = tmp_path / "state.json"
+        RefreshTracker(str(state_file)).mark_refreshed("asset", now=NOW)
+
+        assert json.loads(state_file.read_text())["asset"]["_table"]
+        assert RefreshTracker(str(state_file)).last_refreshed("asset") == NOW
+
+
+class TestSchedule:
+    """Tests for scheduling stale work within an API-call budget."""
+
+    @pytest.mark.unit
+    def test_only_stale_work_scheduled(self, tracker):
+        tracker.mark_refreshed("equity_profile", ["AAPL"], now=NOW)
+        candidates = {"equity_profile": (["AAPL", "NVDA"], 1)}
+
+        sched = tracker.schedule(candidates, now=NOW + timedelta(days=1))
+        assert sched == {"equity_profile": ["NVDA"]}
+
+    @pytest.mark.unit
+    def test_force_schedules_everything(self, tracker):
+        tracker.mark_refreshed("equity_profile", ["AAPL"], now=NOW)
+        candidates = {"equity_profile": (["AAPL", "NVDA"], 1)}
+
+        sched = tracker.schedule(candidates, force=True, now=NOW)
+        assert sched == {"equity_profile": ["AAPL", "NVDA"]}
+
+    @pytest.mark.unit
+    def test_budget_takes_most_stale_first(self, tracker):
+        tracker.mark_refreshed("eod_price", ["AAPL"], now=NOW - timedelta(days=2))
+        tracker.mark_refreshed("eod_price", ["NVDA"], now=NOW - timedelta(days=5))
+        tracker.mark_refreshed("equity_profile", ["AAPL"], now=NOW - timedelta(days=9))
+        candidates = {
+            "equity_profile": (["AAPL"], 1),
+            "eod_price": (["AAPL", "NVDA", "META"], 1),
+        }
+
+        sched = tracker.schedule(candidates, call_budget=2, now=NOW)
+        # META was never refreshed, NVDA is 4 days overdue, AAPL profile only 2
+        assert sched == {"equity_profile": [], "eod_price": ["NVDA", "META"]}
+
+    @pytest.mark.unit
+    def test_budget_accounts_for_call_cost(self, tracker):
+        candidates = {"reporting_period": (["AAPL", "NVDA"], 4)}
+
+        sched = tracker.schedule(candidates, call_budget=5, now=NOW)
+        assert sched == {"reporting_period": ["AAPL"]}
@@ -0,0 +1,133 @@
+"""
+Project:       pfin-back-etl
+Author:        Rich Mosko
+
+Description:
+    Unit tests for the synthetic API payloads (pfin_back_etl.synth) and the
+    pfin schema snapshot (pfin_back_etl.schema) used by the offline benchmarks.
+    These tests run without any external dependencies (no DB, no API).
+"""
+
+import io
+import json
+import pytest
+import polars as pl
+import sqlalchemy as sqla
+from datetime import date
+from sqlalchemy.dialects import postgresql
+from pfin_back_etl import schema, synth
+
+
+AS_OF = date(2026, 10, 19)
+
+
+def _payload(synth_fmp, path, **params):
+    (status, content_type, body) = synth_fmp.respond(path, params)
+    assert status == 200
+    if content_type == "text/csv":
+        return pl.read_csv(io.BytesIO(body)) if body else None
+    return json.loads(body)
+
+
+class TestSynthFMP:
+    """Tests for the synthetic FMP endpoint responses."""
+
+    @pytest.mark.unit
+    def test_deterministic_per_seed(self):
+        fmp_a = synth.SynthFMP(10, as_of=AS_OF)
+        fmp_b = synth.SynthFMP(10, as_of=AS_OF)
+        fmp_c = synth.SynthFMP(10, seed=1, as_of=AS_OF)
+        sym = fmp_a.symbols[3]
+        rows_a = _payload(fmp_a, "income-statement", symbol=sym, limit=4)
+        rows_b = _payload(fmp_b, "income-statement", symbol=sym, limit=4)
+        rows_c = _payload(fmp_c, "income-statement", symbol=sym, limit=4)
+        assert rows_a == rows_b
+        assert rows_a != rows_c
+        assert len(rows_a) == 4
+        assert rows_a[0]["date"] == "2026-06-30"
+        assert rows_a[0]["period"] == "Q2"
+
+    @pytest.mark.unit
+    def test_screener_and_unknown_endpoint(self):
+        fmp = synth.SynthFMP(25, as_of=AS_OF)
+        rows = _payload(fmp, "company-screener", limit=10)
+        assert [row["symbol"] for row in rows] == fmp.symbols[:10]
+        (status, _, _) = fmp.respond("no-such-endpoint", {})
+        assert status == 404
+
+    @pytest.mark.unit
+    def test_bulk_csv_matches_per_symbol(self):
+        fmp = synth.SynthFMP(5, as_of=AS_OF)
+        df_bulk = _payload(fmp, "balance-sheet-statement-bulk", year=2025, period="Q4")
+        assert len(df_bulk) == 5
+        rows = _payload(fmp, "balance-sheet-statement", symbol=fmp.symbols[0])
+        row = next(row for row in rows if row["date"] == "2025-12-31")
+        bulk = df_bulk.filter(pl.col("symbol") == fmp.symbols[0]).row(0, named=True)
+        assert bulk["totalAssets"] == row["totalAssets"]
+        assert _payload(fmp, "profile-bulk", part=1) is None
+
+    @pytest.mark.unit
+    def test_prices_stable_across_windows(self):
+        fmp = synth.SynthFMP(3, years=1, as_of=AS_OF)
+        fmp_next = synth.SynthFMP(3, years=1, as_of=date(2026, 10, 20))
+        sym = fmp.symbols[0]
+        rows = _payload(fmp, "historical-price-eod/full", symbol=sym)
+        rows_next = _payload(fmp_next, "historical-price-eod/full", symbol=sym)
+        window = _payload(
+            fmp,
+            "historical-price-eod/full",
+            symbol=sym,
+            **{"from": "2026-09-01", "to": "2026-09-30"},
+        )
+        assert rows[0]["date"] == "2026-10-19"
+        assert rows_next[0]["date"] == "2026-10-20"
+        assert rows_next[1] == rows[0]
+        assert len(window) == 22
+        assert window[0] in rows
+
+    @pytest.mark.unit
+    def test_bls_cpi_payload(self):
+        payload = synth.bls_cpi_payload(["CUUR0000SA0"], 2025, 2026, as_of=AS_OF)
+        data = payload["Results"]["series"][0]["data"]
+        assert payload["status"] == "REQUEST_SUCCEEDED"
+        assert len(data) == 12 + 9
+        assert (data[0]["year"], data[0]["period"]) == ("2026", "M09")
+
+
+class TestSchemaSnapshot:
+    """Tests for the pfin schema snapshot on a local SQLite database."""
+
+    @pytest.mark.unit
+    def test_create_pfin_schema_sqlite(self, tmp_path):
+        engine = sqla.create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+
+        @sqla.event.listens_for(engine, "connect")
+        def attach_pfin(dbapi_conn, conn_record):
+            dbapi_conn.execute(f"ATTACH DATABASE '{tmp_path / 'pfin.db'}' AS pfin")
+
+        schema.create_pfin_schema(engine)
+        schema.create_pfin_schema(engine)  # idempotent
+
+        tables = sqla.inspect(engine).get_table_names(schema="pfin")
+        assert "eod_price" in tables
+        assert "income_statement" in tables
+        with engine.connect() as conn:
+            rows = conn.execute(sqla.text("SELECT cat, sub_cat FROM pfin.asset_cat"))
+            assert rows.all() == [("Equity", "UNKNOWN")]
+
+    @pytest.mark.unit
+    def test_statement_types_match_ddl(self):
+        """Numeric amounts, bigint share counts and the period enum."""
+        metadata = schema.build_metadata()
+        dialect = postgresql.dialect()
+        tab_inc = metadata.tables["pfin.income_statement"]
+        tab_rp = metadata.tables["pfin.reporting_period"]
+
+        def ddl_type(col):
+            return col.type.compile(dialect=dialect)
+
+        assert ddl_type(tab_inc.c.revenue) == "NUMERIC"
+        assert ddl_type(tab_inc.c.eps) == "NUMERIC"
+        assert ddl_type(tab_inc.c.weighted_average_shs_out) == "BIGINT"
+        assert ddl_type(tab_rp.c.period) == "fiscal_period"
+        assert "NA" in tab_rp.c.period.type.enums
@@ -7,8 +7,11 @@ Description:
     These tests run without any external dependencies (no DB, no API).
 """
 
+import requests
 import pytest
 import polars as pl
+import sqlalchemy as sqla
+from sqlalchemy.dialects import postgresql
 from unittest.mock import patch, MagicMock
 from pfin_back_etl import utils
 
@@ -131,6 +134,69 @@ class TestApplySchemaDf:
         assert result.schema == df_src.schema
 
 
+# ===================================================================
+# sqla_to_pl_dtype
+# ===================================================================
+class TestSqlaToPlDtype:
+    """Tests for mapping reflected sqlalchemy column types to polars."""
+
+    @pytest.mark.unit
+    def test_integer_widths(self):
+        assert utils.sqla_to_pl_dtype(sqla.SmallInteger()) == pl.Int16
+        assert utils.sqla_to_pl_dtype(sqla.Integer()) == pl.Int32
+        assert utils.sqla_to_pl_dtype(sqla.BigInteger()) == pl.Int64
+
+    @pytest.mark.unit
+    def test_temporal(self):
+        assert utils.sqla_to_pl_dtype(sqla.Date()) == pl.Date
+        assert utils.sqla_to_pl_dtype(sqla.DateTime()) == pl.Datetime("us")
+        assert utils.sqla_to_pl_dtype(
+            postgresql.TIMESTAMP(timezone=True)
+        ) == pl.Datetime("us", "UTC")
+
+    @pytest.mark.unit
+    def test_numeric_and_text(self):
+        assert utils.sqla_to_pl_dtype(postgresql.NUMERIC(20, 2)) == pl.Float64
+        assert utils.sqla_to_pl_dtype(postgresql.DOUBLE_PRECISION()) == pl.Float64
+        assert utils.sqla_to_pl_dtype(sqla.Text()) == pl.String
+        assert utils.sqla_to_pl_dtype(sqla.Boolean()) == pl.Boolean
+
+    @pytest.mark.unit
+    def test_enum(self):
+        dtype = utils.sqla_to_pl_dtype(postgresql.ENUM("Q1", "Q2", name="period"))
+        assert dtype == pl.Enum(["Q1", "Q2"])
+
+    @pytest.mark.unit
+    def test_unmapped_type(self):
+        assert utils.sqla_to_pl_dtype(postgresql.JSONB()) is None
+
+
+# ===================================================================
+# estimate_row_bytes
+# ===================================================================
+class TestEstimateRowBytes:
+    """Tests for projecting the in-memory row size from a schema."""
+
+    @pytest.mark.unit
+    def test_fixed_width_columns(self):
+        schema = {
+            "id": pl.Int64,
+            "asset_id": pl.Int32,
+            "end_date": pl.Date,
+            "accepted_date": pl.Datetime("us", "UTC"),
+        }
+        assert utils.estimate_row_bytes(schema) == 24
+
+    @pytest.mark.unit
+    def test_strings_and_enums(self):
+        schema = {"symbol": pl.String, "period": pl.Enum(["Q1", "Q2"])}
+        assert utils.estimate_row_bytes(schema) == 36
+
+    @pytest.mark.unit
+    def test_empty_schema(self):
+        assert utils.estimate_row_bytes({}) == 1
+
+
 # ===================================================================
 # ldict_to_df
 # ===================================================================
@@ -168,7 +234,7 @@ class TestFetchCpiDf:
         mock_response = MagicMock()
         mock_response.text = json.dumps(sample_bls_cpi_json)
 
-        with patch("pfin_back_etl.utils.requests.post", return_value=mock_response):
+        with patch.object(utils.http_session(), "post", return_value=mock_response):
             df = utils.fetch_cpi_df("fake_key", 2024, 2024, ["CUUR0000SA0"])
 
         assert len(df) == 2
@@ -190,7 +256,7 @@ class TestFetchCpiDf:
         mock_response = MagicMock()
         mock_response.text = json.dumps(failed_json)
 
-        with patch("pfin_back_etl.utils.requests.post", return_value=mock_response):
+        with patch.object(utils.http_session(), "post", return_value=mock_response):
             with pytest.raises(Exception, match="unsuccessful"):
                 utils.fetch_cpi_df("fake_key", 2024, 2024, ["CUUR0000SA0"])
 
@@ -202,7 +268,7 @@ class TestFetchCpiDf:
         mock_response = MagicMock()
         mock_response.text = json.dumps(sample_bls_cpi_json)
 
-        with patch("pfin_back_etl.utils.requests.post", return_value=mock_response):
+        with patch.object(utils.http_session(), "post", return_value=mock_response):
             df = utils.fetch_cpi_df("fake_key", 2024, 2024, ["CUUR0000SA0"])
 
         months = sorted(df["month"].to_list())
@@ -278,3 +344,35 @@ class TestSqlaModuleNameForTable:
         mock_reflect.schema = None
         result = utils.sqla_modulename_for_table("some_table", None, mock_reflect)
         assert result == "public"
+
+
+# ===================================================================
+# Shared HTTP session
+# ===================================================================
+class TestHttpSession:
+    """Tests for the shared HTTP connection pool (BLS and FMP sessions)."""
+
+    @pytest.mark.unit
+    def test_sessions_share_one_pool(self):
+        session = utils.http_session()
+        assert utils.http_session() is session
+        other = requests.Session()  # ie: the fmpstab LimiterSession
+        utils.mount_http(other)
+        adapter = session.get_adapter("https://api.bls.gov/")
+        assert isinstance(adapter, utils.TimeoutHTTPAdapter)
+        assert other.get_adapter("https://financialmodelingprep.com/") is adapter
+        assert "gzip" in other.headers["Accept-Encoding"]
+
+    @pytest.mark.unit
+    def test_configure_pool_and_timeout(self):
+        defaults = (utils.HTTP_POOL_SIZE, utils.HTTP_TIMEOUT)
+        utils.configure_http(pool_size=4, timeout=5)
+        adapter = utils.http_session().get_adapter("https://api.bls.gov/")
+        assert (adapter._pool_maxsize, adapter.timeout) == (4, 5.0)
+
+        with patch.object(requests.adapters.HTTPAdapter, "send") as mock_send:
+            adapter.send(MagicMock())
+            assert mock_send.call_args.kwargs["timeout"] == 5.0
+            adapter.send(MagicMock(), timeout=1)
+            assert mock_send.call_args.kwargs["timeout"] == 1
+        utils.configure_http(*defaults)